@@ -4,19 +4,48 @@
 import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import classification_report, confusion_matrix
+from sklearn.metrics import classification_report, confusion_matrix, precision_recall_fscore_support
+from sklearn.model_selection import train_test_split
+import argparse
+import copy
 import joblib
 import os
+import time
+from forest_inference import default_forest_dir, export_forest
+from model_registry import current_model_dir, default_registry_dir, publish_model, read_model_info
+from preprocessing import TYPED_COLUMNS
 
-def train_model(data_path, model_path):
-    df = pd.read_csv(data_path)
+DEFAULT_PARAMS = {'n_estimators': 100, 'random_state': 42}
+# Arbres entraînés sur tous les cœurs : sans effet sur le modèle obtenu (random_state fixé)
+N_JOBS = -1
+# Rafraîchissement incrémental : arbres ajoutés par lot étiqueté, taille maximale de la forêt, part du lot en évaluation
+TREES_PER_BATCH = 25
+MAX_TREES = 200
+HOLDOUT_FRACTION = 0.2
+
+def training_matrix(df, feature_names=None):
+    # Features numériques de l'entraînement ; avec feature_names, colonnes imposées dans cet ordre.
+    # Une feature absente est une erreur : la remplir de zéros fausserait silencieusement les arbres ajoutés.
+    if feature_names is None:
+        exclude_cols = ['label', 'timestamp', 'No.', 'Length', 'src_ip', 'dst_ip'] + TYPED_COLUMNS
+        X = df.drop([col for col in exclude_cols if col in df.columns], axis=1)
+        X = X.select_dtypes(include=[np.number])
+    else:
+        missing = [col for col in feature_names if col not in df.columns]
+        if missing:
+            raise ValueError(f"features du modèle absentes des données : {', '.join(missing)}")
+        X = df[list(feature_names)]
+    return X, df['label']
+
+def train_model(data_path, model_path, df=None, params=None):
+    # df : données prétraitées déjà en mémoire (évite de relire data_path)
+    if df is None:
+        df = pd.read_csv(data_path)
     if df.empty:
         print("Erreur : le jeu de données est vide après prétraitement. Vérifiez vos fichiers d'entrée.")
         return None
     # Ne garder que les colonnes numériques pertinentes pour l'entraînement
-    exclude_cols = ['label', 'timestamp', 'No.', 'Length', 'src_ip', 'dst_ip']
-    X = df.drop([col for col in exclude_cols if col in df.columns], axis=1)
-    X = X.select_dtypes(include=[np.number])
+    X, y = training_matrix(df)
     feature_names = list(X.columns)
     # Sauvegarder la liste des features
     features_path = os.path.abspath(os.path.join(os.path.dirname(data_path), 'features.txt'))
@@ -24,17 +53,27 @@ def train_model(data_path, model_path):
     with open(features_path, 'w') as f:
         for feat in feature_names:
             f.write(feat + '\n')
-    y = df['label']
-    model = RandomForestClassifier(n_estimators=100, random_state=42)
+    model = RandomForestClassifier(n_jobs=N_JOBS, **(params or DEFAULT_PARAMS))
+    start = time.perf_counter()
     model.fit(X, y)
+    train_seconds = time.perf_counter() - start
     joblib.dump(model, model_path)
-    print('Modèle entraîné et sauvegardé.')
+    # Artefact compact (tableaux NumPy) pour une inférence rapide sans scikit-learn
+    export_forest(model, default_forest_dir(model_path), model_path)
+    # Version publiée dans le registre, base des rafraîchissements incrémentaux
+    batch = {'mode': 'full', 'trees': len(model.estimators_), 'rows': len(X)}
+    publish_model(model, feature_names, default_registry_dir(os.path.dirname(features_path)),
+                  {'mode': 'full', 'parent': None, 'batches': [batch], 'train_rows': len(X),
+                   'train_seconds': train_seconds, 'full_train_seconds': train_seconds}, source_path=model_path)
+    print(f'Modèle entraîné et sauvegardé en {train_seconds:.2f} s.')
     print(f'Features utilisées : {feature_names}')
     return model
 
-def predict(model_path, data_path):
-    model = joblib.load(model_path)
-    df = pd.read_csv(data_path)
+def predict(model_path, data_path, df=None, model=None):
+    if model is None:
+        model = joblib.load(model_path)
+    if df is None:
+        df = pd.read_csv(data_path)
     # Charger la liste des features utilisées à l'entraînement
     features_path = os.path.abspath(os.path.join(os.path.dirname(data_path), 'features.txt'))
     if not os.path.exists(features_path):
@@ -52,6 +91,137 @@ def predict(model_path, data_path):
     print(confusion_matrix(y_true, y_pred))
     return y_pred
 
+def load_current_model(data_dir):
+    # Version active du registre, sinon modèle historique de data/ ; retourne (modèle, features, infos, dossier)
+    version_dir = current_model_dir(default_registry_dir(data_dir))
+    model_dir = version_dir or data_dir
+    features_path = os.path.join(model_dir, 'features.txt')
+    model_path = os.path.join(model_dir, 'rf_model.joblib')
+    if not os.path.exists(features_path) or not os.path.exists(model_path):
+        raise FileNotFoundError(f"Aucun modèle à rafraîchir dans {model_dir}.\n\nLancez d'abord un entraînement complet avec auto_main.py.")
+    with open(features_path, 'r') as f:
+        feature_names = [line.strip() for line in f.readlines()]
+    model = joblib.load(model_path)
+    info = read_model_info(version_dir) if version_dir else {}
+    if not info.get('batches'):
+        info['batches'] = [{'mode': 'full', 'trees': len(model.estimators_), 'rows': None}]
+    return model, feature_names, info, version_dir
+
+def holdout_scores(model, X, y):
+    # Détection des anomalies (classe 1) sur le jeu d'évaluation
+    y_pred = model.predict(X)
+    precision, recall, f1, _ = precision_recall_fscore_support(y, y_pred, labels=[1], zero_division=0)
+    return {'precision': float(precision[0]), 'recall': float(recall[0]), 'f1': float(f1[0]),
+            'accuracy': float((y_pred == y.to_numpy()).mean())}
+
+def grow_forest(model, new_trees, batches, batch, max_trees):
+    # Forêt existante + nouveaux arbres ; au-delà de max_trees, les arbres les plus anciens sont retirés
+    estimators = list(model.estimators_) + list(new_trees.estimators_)
+    batches = [dict(b) for b in batches] + [batch]
+    excess = max(0, len(estimators) - max_trees)
+    estimators = estimators[excess:]
+    while excess > 0:
+        removed = min(excess, batches[0]['trees'])
+        batches[0]['trees'] -= removed
+        excess -= removed
+        if batches[0]['trees'] == 0:
+            batches.pop(0)
+    refreshed = copy.copy(model)
+    refreshed.estimators_ = estimators
+    refreshed.n_estimators = len(estimators)
+    return refreshed, batches
+
+def refresh_model(batch_path, data_dir, df=None, trees_per_batch=TREES_PER_BATCH, max_trees=MAX_TREES,
+                  holdout=HOLDOUT_FRACTION, compare_path=None):
+    # Rafraîchissement sans réentraînement complet : nouveaux arbres entraînés sur un lot étiqueté
+    # (format de preprocessed.csv), ajoutés à la forêt active puis publiés comme nouvelle version.
+    # compare_path : données de l'entraînement complet (preprocessed.csv) pour mesurer un réentraînement
+    # sur ces données + le lot, à titre de comparaison (durée et métriques sur le même jeu d'évaluation).
+    if df is None:
+        df = pd.read_csv(batch_path)
+    if df.empty:
+        print("Erreur : le lot étiqueté est vide.")
+        return None
+    model, feature_names, info, version_dir = load_current_model(data_dir)
+    try:
+        X, y = training_matrix(df, feature_names)
+    except ValueError as e:
+        print(f"Erreur : lot incompatible avec le modèle actif, {e}.")
+        return None
+    if set(y.unique()) != set(model.classes_):
+        print(f"Erreur : le lot doit contenir toutes les classes du modèle ({list(model.classes_)}), trouvé {sorted(y.unique())}.")
+        return None
+    if holdout > 0:
+        X_fit, X_eval, y_fit, y_eval = train_test_split(X, y, test_size=holdout, stratify=y, random_state=DEFAULT_PARAMS['random_state'])
+    else:
+        X_fit, y_fit, X_eval, y_eval = X, y, None, None
+    # Mêmes hyperparamètres que la forêt existante, graine différente à chaque rafraîchissement
+    refreshes = info.get('refreshes', 0) + 1
+    params = dict(model.get_params(), n_estimators=trees_per_batch, n_jobs=N_JOBS,
+                  random_state=DEFAULT_PARAMS['random_state'] + refreshes)
+    start = time.perf_counter()
+    new_trees = RandomForestClassifier(**params).fit(X_fit, y_fit)
+    train_seconds = time.perf_counter() - start
+    batch = {'mode': 'refresh', 'trees': trees_per_batch, 'rows': len(X_fit)}
+    refreshed, batches = grow_forest(model, new_trees, info['batches'], batch, max_trees)
+    print(f"Rafraîchissement : {trees_per_batch} arbres entraînés sur {len(X_fit)} lignes en {train_seconds:.2f} s, "
+          f"forêt de {len(refreshed.estimators_)} arbres (plafond {max_trees}).")
+    full_train_seconds = info.get('full_train_seconds')
+    report = {}
+    if X_eval is not None:
+        report['previous'] = holdout_scores(model, X_eval, y_eval)
+        report['refreshed'] = holdout_scores(refreshed, X_eval, y_eval)
+    if compare_path is not None:
+        # Réentraînement complet de référence, non publié
+        try:
+            X_base, y_base = training_matrix(pd.read_csv(compare_path), feature_names)
+        except ValueError as e:
+            print(f"Erreur : {compare_path} incompatible avec le modèle actif, {e}.")
+            return None
+        start = time.perf_counter()
+        full = RandomForestClassifier(**dict(params, n_estimators=len(refreshed.estimators_), random_state=DEFAULT_PARAMS['random_state']))
+        full.fit(pd.concat([X_base, X_fit]), pd.concat([y_base, y_fit]))
+        full_train_seconds = time.perf_counter() - start
+        if X_eval is not None:
+            report['full_retrain'] = holdout_scores(full, X_eval, y_eval)
+    if full_train_seconds:
+        print(f"Réentraînement complet : {full_train_seconds:.2f} s, soit {full_train_seconds - train_seconds:.2f} s gagnées "
+              f"({full_train_seconds / max(train_seconds, 1e-9):.1f}x)" + ('' if compare_path else ' (dernier entraînement complet enregistré)'))
+    else:
+        # Modèle historique de data/ (hors registre) : aucun entraînement complet n'a été chronométré
+        print("Aucune durée d'entraînement complet de référence pour ce modèle : relancez avec --compare pour mesurer le gain.")
+    if report:
+        print(f"Évaluation sur {len(X_eval)} lignes du lot (classe 1) :")
+        for name, scores in report.items():
+            print(f"  {name:<13} précision {scores['precision']:.4f}  rappel {scores['recall']:.4f}  F1 {scores['f1']:.4f}  exactitude {scores['accuracy']:.4f}")
+        reference = report.get('full_retrain', report['previous'])
+        print(f"  écart F1 du modèle rafraîchi : {report['refreshed']['f1'] - reference['f1']:+.4f} (par rapport à {'full_retrain' if 'full_retrain' in report else 'previous'})")
+    parent = os.path.basename(version_dir) if version_dir else None
+    publish_model(refreshed, feature_names, default_registry_dir(data_dir),
+                  {'mode': 'refresh', 'parent': parent, 'refreshes': refreshes, 'batches': batches, 'train_rows': len(X_fit),
+                   'train_seconds': train_seconds, 'full_train_seconds': full_train_seconds, 'holdout': report})
+    return refreshed
+
 if __name__ == "__main__":
-    train_model('../data/preprocessed.csv', '../data/rf_model.joblib')
-    predict('../data/rf_model.joblib', '../data/preprocessed.csv')
+    # python anomaly_detection.py                       : entraînement complet puis évaluation
+    # python anomaly_detection.py --refresh lot.csv      : rafraîchissement incrémental avec un lot étiqueté
+    parser = argparse.ArgumentParser(description="Entraînement et rafraîchissement du modèle IA-Sentinel.")
+    parser.add_argument('--refresh', type=str, default=None, help='Lot étiqueté (format de preprocessed.csv) pour ajouter des arbres à la forêt active')
+    parser.add_argument('--normal', type=str, default=None, help='Avec --malicious : lot à prétraiter (trafic normal) au lieu de --refresh')
+    parser.add_argument('--malicious', type=str, default=None, help='Avec --normal : lot à prétraiter (trafic malveillant)')
+    parser.add_argument('--trees', type=int, default=TREES_PER_BATCH, help='Nombre d\'arbres ajoutés par rafraîchissement')
+    parser.add_argument('--max-trees', type=int, default=MAX_TREES, help='Taille maximale de la forêt (les arbres les plus anciens sont retirés)')
+    parser.add_argument('--holdout', type=float, default=HOLDOUT_FRACTION, help='Part du lot réservée à l\'évaluation')
+    parser.add_argument('--compare', action='store_true', help='Mesurer aussi un réentraînement complet (preprocessed.csv + lot), non publié')
+    args = parser.parse_args()
+    data_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../data'))
+    if args.refresh or (args.normal and args.malicious):
+        batch_df = None
+        if args.refresh is None:
+            from preprocessing import preprocess
+            batch_df = preprocess(args.normal, args.malicious)
+        compare_path = os.path.join(data_dir, 'preprocessed.csv') if args.compare else None
+        refresh_model(args.refresh, data_dir, batch_df, args.trees, args.max_trees, args.holdout, compare_path)
+    else:
+        train_model('../data/preprocessed.csv', '../data/rf_model.joblib')
+        predict('../data/rf_model.joblib', '../data/preprocessed.csv')
@@ -4,8 +4,7 @@
 import time
 import os
 import sys
-from preprocessing import preprocess
-from anomaly_detection import train_model, predict
+from stage_cache import StageCache, code_hashes, file_sha256, stage_key
 
 def main():
     # Chemin absolu basé sur le dossier du script
@@ -15,6 +14,8 @@ def main():
     malicious_path = os.path.join(data_dir, 'malicious.csv')
     preprocessed_path = os.path.join(data_dir, 'preprocessed.csv')
     model_path = os.path.join(data_dir, 'rf_model.joblib')
+    features_path = os.path.join(data_dir, 'features.txt')
+    forest_meta_path = os.path.join(data_dir, 'rf_model.forest', 'meta.json')
     # Vérification explicite des fichiers d'entrée
     if not os.path.exists(normal_path):
         print(f"Erreur : Le fichier normal.csv est introuvable à l'emplacement : {normal_path}")
@@ -22,17 +23,41 @@ def main():
     if not os.path.exists(malicious_path):
         print(f"Erreur : Le fichier malicious.csv est introuvable à l'emplacement : {malicious_path}")
         sys.exit(1)
+    start = time.perf_counter()
+    # Les clés d'étape dépendent du contenu des entrées et du code qui les traite : le module de l'étape et
+    # tous les modules locaux qu'il importe (les hyperparamètres, DEFAULT_PARAMS, sont dans anomaly_detection.py)
+    cache = StageCache(os.path.join(data_dir, '.cache', 'stages.json'))
+    preprocess_key = stage_key(file_sha256(normal_path), file_sha256(malicious_path), code_hashes(base_dir, 'preprocessing'))
+    train_key = stage_key(preprocess_key, code_hashes(base_dir, 'anomaly_detection'))
+    train_outputs = [model_path, features_path, forest_meta_path]
+    df = None
+    model = None
     # Prétraitement
-    print('Prétraitement...')
-    df = preprocess(normal_path, malicious_path)
-    df.to_csv(preprocessed_path, index=False)
+    if cache.is_fresh('preprocess', preprocess_key, [preprocessed_path]):
+        print('Prétraitement : entrées inchangées, étape ignorée.')
+    else:
+        print('Prétraitement...')
+        from preprocessing import preprocess
+        df = preprocess(normal_path, malicious_path)
+        df.to_csv(preprocessed_path, index=False)
+        cache.record('preprocess', preprocess_key, [preprocessed_path])
     # Entraînement
-    print('Entraînement du modèle...')
-    train_model(preprocessed_path, model_path)
+    if cache.is_fresh('train', train_key, train_outputs):
+        print('Entraînement : données et paramètres inchangés, étape ignorée.')
+    else:
+        print('Entraînement du modèle...')
+        from anomaly_detection import train_model
+        # Le DataFrame prétraité est transmis en mémoire, sans relire preprocessed.csv
+        model = train_model(preprocessed_path, model_path, df=df)
+        cache.record('train', train_key, train_outputs)
     # Prédiction
-    print('Prédiction sur les données...')
-    predict(model_path, preprocessed_path)
-    print('Pipeline terminé.')
+    if model is None:
+        print('Prédiction : modèle inchangé, évaluation déjà effectuée lors d\'une exécution précédente.')
+    else:
+        print('Prédiction sur les données...')
+        from anomaly_detection import predict
+        predict(model_path, preprocessed_path, df=df, model=model)
+    print(f'Pipeline terminé en {time.perf_counter() - start:.2f} s.')
 
 if __name__ == "__main__":
     main()
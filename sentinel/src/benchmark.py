@@ -0,0 +1,223 @@
+# benchmark.py
+# Banc d'essai IA-Sentinel : trafic synthétique reproductible et mesure de chaque étape du pipeline
+#
+# Pour chaque taille (10k à 10M lignes) on génère un capture.csv (schéma Wireshark) mêlant trafic normal,
+# inondation depuis des IP source aléatoires et inondation du port 80, puis on mesure pour chaque étape
+# (lecture, clean_and_format, extract_features, prédiction, export_all_logs) : durée, lignes/s et pic de RSS.
+# Les résultats peuvent être comparés à une référence enregistrée : l'exécution échoue (code 1) si une
+# étape régresse au-delà du seuil.
+#
+# python3 benchmark.py --sizes 10000,100000,1000000 --save-baseline
+# python3 benchmark.py --sizes 10000,100000,1000000 --threshold 0.25
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+import pandas as pd
+from metrics import current_rss_mb
+
+DEFAULT_SIZES = [10000, 100000, 1000000]
+DEFAULT_BASELINE = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../data/benchmark_baseline.json'))
+GENERATION_CHUNK = 500000
+# Écarts absolus en dessous desquels une variation est considérée comme du bruit de mesure
+NOISE_FLOOR = {'seconds': 0.05, 'peak_rss_mb': 16.0}
+STAGES = ['lecture', 'clean_and_format', 'extract_features', 'prediction', 'export_all_logs']
+
+def format_ipv4(values):
+    values = values.astype(np.uint32)
+    return pd.Series(values >> 24).astype(str) + '.' + pd.Series((values >> 16) & 255).astype(str) + '.' \
+        + pd.Series((values >> 8) & 255).astype(str) + '.' + pd.Series(values & 255).astype(str)
+
+def generate_chunk(rng, n, start_ns, flood_ratio, port80_ratio, empty_ratio):
+    # Trafic normal : hôtes internes 10.74.16.0/22 <-> pool de serveurs externes sur quelques ports
+    internal = (10 << 24) | (74 << 16) | (16 << 8)
+    hosts = internal + rng.integers(1, 1024, n)
+    servers = np.array([0x22243650, 0x346D4404, 0x8EFA4A2E, 0x0D6B2AFE, 0x14BE9A88, 0x68103C25], dtype=np.uint32)
+    server = servers[rng.integers(0, len(servers), n)]
+    outbound = rng.random(n) < 0.5
+    src = np.where(outbound, hosts, server).astype(np.uint32)
+    dst = np.where(outbound, server, hosts).astype(np.uint32)
+    service = rng.choice(np.array([443, 80, 53, 22]), n, p=[0.7, 0.15, 0.1, 0.05])
+    ephemeral = rng.integers(32768, 61000, n)
+    src_port = np.where(outbound, ephemeral, service)
+    dst_port = np.where(outbound, service, ephemeral)
+    proto = np.where(service == 53, 17, 6)
+    # Inondation depuis des IP source aléatoires vers une cible interne, ports aléatoires
+    kind = rng.random(n)
+    flood = kind < flood_ratio
+    src[flood] = rng.integers(1 << 24, 223 << 24, flood.sum(), dtype=np.uint32)
+    dst[flood] = internal + 53
+    dst_port[flood] = rng.integers(1, 65535, flood.sum())
+    # Inondation du port 80 depuis des IP source aléatoires
+    port80 = (kind >= flood_ratio) & (kind < flood_ratio + port80_ratio)
+    src[port80] = rng.integers(1 << 24, 223 << 24, port80.sum(), dtype=np.uint32)
+    dst[port80] = internal + 80
+    dst_port[port80] = 80
+    proto[flood | port80] = 6
+    # Horodatage au format Wireshark ("Jul 10, 2025 10:38:51.554784702 CEST")
+    ts_ns = start_ns + np.cumsum(rng.integers(1000, 2000000, n))
+    seconds = ts_ns // 1000000000
+    timestamps = 'Jul 10, 2025 ' + pd.Series((10 + seconds // 3600) % 24).astype(str).str.zfill(2) + ':' \
+        + pd.Series(seconds // 60 % 60).astype(str).str.zfill(2) + ':' + pd.Series(seconds % 60).astype(str).str.zfill(2) \
+        + '.' + pd.Series(ts_ns % 1000000000).astype(str).str.zfill(9) + ' CEST'
+    df = pd.DataFrame({
+        'frame.time': timestamps,
+        'ip.src': format_ipv4(src),
+        'ip.dst': format_ipv4(dst),
+        'ip.proto': proto.astype(float),
+        'tcp.srcport': src_port.astype(float),
+        'tcp.dstport': dst_port.astype(float),
+    })
+    # Trames non IP (ARP...) : champs vides comme dans les exports tshark
+    empty = rng.random(n) < empty_ratio
+    df.loc[empty, ['ip.src', 'ip.dst', 'ip.proto', 'tcp.srcport', 'tcp.dstport']] = np.nan
+    return df, int(ts_ns[-1])
+
+def generate_capture(path, n_rows, seed=42, flood_ratio=0.05, port80_ratio=0.03, empty_ratio=0.05):
+    rng = np.random.default_rng(seed)
+    start_ns = 0
+    written = 0
+    with open(path, 'w') as f:
+        while written < n_rows:
+            n = min(GENERATION_CHUNK, n_rows - written)
+            df, start_ns = generate_chunk(rng, n, start_ns, flood_ratio, port80_ratio, empty_ratio)
+            df.to_csv(f, index=False, header=written == 0)
+            written += n
+    return path
+
+class PeakRSS:
+    # Échantillonnage du RSS dans un thread pendant l'étape mesurée
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = 0.0
+        self.stop_event = threading.Event()
+
+    def sample(self):
+        while not self.stop_event.is_set():
+            self.peak = max(self.peak, current_rss_mb())
+            self.stop_event.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = current_rss_mb()
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop_event.set()
+        self.thread.join()
+        self.peak = max(self.peak, current_rss_mb())
+
+def measure(results, stage, n_rows, func, *args):
+    with PeakRSS() as rss, contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        value = func(*args)
+        elapsed = time.perf_counter() - start
+    results[stage] = {
+        'seconds': round(elapsed, 4),
+        'rows_per_s': round(n_rows / elapsed, 1) if elapsed > 0 else None,
+        'peak_rss_mb': round(rss.peak, 1),
+    }
+    return value
+
+def run_size(n_rows, workdir, seed):
+    # Import tardif : export_results change le répertoire courant à l'import
+    from preprocessing import clean_and_format, extract_features
+    from export_results import export_all_logs, load_model, score_features
+    capture = generate_capture(os.path.join(workdir, f'capture_{n_rows}.csv'), n_rows, seed)
+    output = os.path.join(workdir, f'result_{n_rows}', 'final_result.csv')
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        model, feature_names = load_model(None)
+    results = {}
+    df = measure(results, 'lecture', n_rows, pd.read_csv, capture)
+    df = measure(results, 'clean_and_format', n_rows, clean_and_format, df)
+    df = measure(results, 'extract_features', len(df), extract_features, df)
+    df_pred = measure(results, 'prediction', len(df), score_features, df, model, feature_names)
+    measure(results, 'export_all_logs', len(df_pred), export_all_logs, df_pred, output)
+    results['anomalies'] = int(df_pred['anomalie'].sum())
+    os.remove(capture)
+    return results
+
+def compare(report, baseline, threshold):
+    # Régression : durée ou pic mémoire au-delà de (1 + seuil) x la référence (et au-delà du bruit de mesure)
+    regressions = []
+    for size, stages in report.items():
+        for stage in STAGES:
+            current, reference = stages.get(stage), baseline.get(size, {}).get(stage)
+            if not current or not reference:
+                continue
+            for metric in ['seconds', 'peak_rss_mb']:
+                limit = max(reference[metric] * (1 + threshold), reference[metric] + NOISE_FLOOR[metric])
+                if current[metric] > limit:
+                    regressions.append(f"{size} lignes, {stage} : {metric} {current[metric]} > {reference[metric]} (+{threshold:.0%})")
+    return regressions
+
+def print_report(report):
+    print(f"{'lignes':>10} {'étape':<18} {'durée (s)':>10} {'lignes/s':>14} {'pic RSS (Mo)':>13}")
+    for size, stages in report.items():
+        for stage in STAGES:
+            r = stages[stage]
+            print(f"{size:>10} {stage:<18} {r['seconds']:>10.3f} {r['rows_per_s'] or 0:>14,.0f} {r['peak_rss_mb']:>13.1f}")
+        print(f"{size:>10} {'anomalies':<18} {stages['anomalies']:>10}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc d'essai du pipeline IA-Sentinel sur trafic synthétique.")
+    parser.add_argument('--sizes', type=str, default=','.join(str(s) for s in DEFAULT_SIZES), help='Tailles à mesurer (lignes), séparées par des virgules')
+    parser.add_argument('--seed', type=int, default=42, help='Graine du générateur de trafic')
+    parser.add_argument('--baseline', type=str, default=DEFAULT_BASELINE, help='Fichier JSON de référence')
+    parser.add_argument('--save-baseline', action='store_true', help='Enregistrer les résultats comme nouvelle référence')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Régression tolérée par rapport à la référence (0.25 = +25 %%)')
+    parser.add_argument('--workdir', type=str, default=None, help='Dossier de travail (temporaire par défaut)')
+    parser.add_argument('--output', type=str, default=None, help='Écrire le rapport JSON dans ce fichier')
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(',') if s]
+    workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix='sentinel-bench-')
+    baseline_path = os.path.abspath(args.baseline)
+    output_path = os.path.abspath(args.output) if args.output else None
+    report = {}
+    try:
+        for n_rows in sizes:
+            print(f"Mesure sur {n_rows} lignes...")
+            report[str(n_rows)] = run_size(n_rows, workdir, args.seed)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    print_report(report)
+    if output_path:
+        with open(output_path, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(baseline_path):
+            with open(baseline_path, 'r') as f:
+                baseline = json.load(f)
+        baseline.update(report)
+        with open(baseline_path, 'w') as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Référence enregistrée dans {baseline_path}")
+        return 0
+    if not os.path.exists(baseline_path):
+        print(f"Aucune référence ({baseline_path}) : relancer avec --save-baseline pour en créer une.")
+        return 0
+    with open(baseline_path, 'r') as f:
+        baseline = json.load(f)
+    regressions = compare(report, baseline, args.threshold)
+    if regressions:
+        print('Régressions détectées :')
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print('Aucune régression par rapport à la référence.')
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,116 +2,265 @@
 # Export et formatage des résultats IA-Sentinel
 
 import pandas as pd
+import numpy as np
 import datetime
+import glob
+import multiprocessing
 import os
-from preprocessing import clean_and_format, extract_features
+from preprocessing import TYPED_COLUMNS, clean_and_format, extract_features
+from pcap_reader import is_pcap, read_pcap
+from incremental import default_checkpoint_path, read_new_logs, save_checkpoint
+from streaming import stream_features
+from result_store import append_results
+from seen_store import DEFAULT_TTL, SeenSnapshot, SeenStore, default_seen_path
+from windows import WindowState, default_window_path
+from forest_inference import load_compact_forest
+from ip_lists import IpLists
+from model_registry import current_model_dir, default_registry_dir
+from metrics import RunMetrics, debug, is_debug, set_debug
+from timestamps import format_dates, format_timestamps
 import joblib
 import argparse
+import sys
 
 # Changer le répertoire de travail pour fiabiliser les chemins lors de l'exécution automatisée
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
+# Modèle, listes d'autorisation / de blocage et mémoire des sources vues, chargés par le processus parent
+# avant le fork : les processus de calcul les partagent en copie sur écriture, sans les recharger
+SHARED = {}
+
+# Évaluation de la forêt : modèle scikit-learn ou forêt compacte (forest_inference.py, NumPy seul).
+# La forêt compacte évite l'import de scikit-learn (environ 1,4 s) mais prédit environ 3 fois moins vite :
+# 'auto' ne la retient que pour une exécution ponctuelle de moins de COMPACT_MAX_ROWS lignes.
+EVALUATORS = ['auto', 'compact', 'sklearn']
+COMPACT_MAX_ROWS = 500000
+
 def export_alerts(df, output_path):
     alerts = df[df['label'] == 1]
     alerts['timestamp'] = datetime.datetime.now().isoformat()
     alerts.to_csv(output_path, index=False)
     print(f'Alertes exportées vers {output_path}')
 
-def export_all_logs(df, output_path):
-    export_timestamp = datetime.datetime.now().isoformat()
-    df['export_timestamp'] = export_timestamp
-    df = df.fillna('')
-    if os.path.exists(output_path):
-        try:
-            old_df = pd.read_csv(output_path)
-        except Exception as e:
-            print(f"Erreur de lecture du fichier existant : {e}. On repart de zéro.")
-            old_df = pd.DataFrame(columns=df.columns)
-        old_df = old_df.fillna('')
-        for col in df.columns:
-            if col not in old_df.columns:
-                old_df[col] = ''
-        for col in old_df.columns:
-            if col not in df.columns:
-                df[col] = ''
-        old_df = old_df[df.columns]
-        df = df[old_df.columns]
-        id_cols = [col for col in df.columns if col != 'export_timestamp']
-        for col in id_cols:
-            df[col] = df[col].astype(str)
-            old_df[col] = old_df[col].astype(str)
-        if not id_cols:
-            print('Aucune colonne commune pour identifier les doublons, export annulé.')
-            return
-        merged = pd.merge(df, old_df, on=id_cols, how='left', indicator=True)
-        # Correction : on récupère les colonnes d'identification + export_timestamp depuis df
-        new_rows = merged[merged['_merge'] == 'left_only'].copy()
-        # On doit réinjecter la colonne export_timestamp depuis df (car elle n'est pas jointe)
-        if 'export_timestamp' not in new_rows.columns:
-            # On récupère la valeur depuis df en utilisant les index
-            new_rows['export_timestamp'] = export_timestamp
-        # Réordonner les colonnes
-        new_rows = new_rows[df.columns]
-        result_df = pd.concat([new_rows, old_df], ignore_index=True)
-        result_df.to_csv(output_path, index=False)
-        print(f'Nouvelles logs ajoutées en haut de {output_path} (sans doublons)')
-    else:
-        df.to_csv(output_path, index=False)
-        print(f'Logs complets exportés vers {output_path} (premier export)')
+def export_all_logs(df, output_path, metrics=None):
+    # Ajout des seules nouvelles lignes dans la partition du jour (voir result_store.py)
+    if metrics is None:
+        metrics = RunMetrics()
+    with metrics.stage('export_all_logs', len(df)) as stage:
+        df = df.copy()
+        if 'timestamp' in df.columns:
+            # Timestamps int64 -> texte ISO 8601 UTC dans le CSV
+            df['timestamp'] = format_timestamps(df['timestamp'])
+        df['export_timestamp'] = datetime.datetime.now().isoformat()
+        nb_new = append_results(df, output_path)
+        stage.rows_out = nb_new
+    print(f'{nb_new} nouvelles logs ajoutées à {output_path} (sans doublons)')
+
+def export_anomalies(df_pred, output_path, metrics=None):
+    # Export anomalies dans un CSV dédié (timestamp, src_ip, dst_ip, date_log), cumulé comme final_result :
+    # partition du jour en ajout seul, dédoublonnée, et lien symbolique anomalies_only.csv (voir result_store.py).
+    # Un lot (scrutation du démon, exécution incrémentale) ajoute ses anomalies sans effacer les précédentes.
+    anomalies_csv = os.path.join(os.path.dirname(output_path), 'anomalies_only.csv')
+    if metrics is None:
+        metrics = RunMetrics()
+    if 'anomalie' in df_pred.columns:
+        with metrics.stage('export_anomalies', len(df_pred)) as stage:
+            anomalies = df_pred[df_pred['anomalie'] == 1].copy()
+            # Date (UTC) de la log à partir du timestamp int64
+            if 'timestamp' in anomalies.columns:
+                anomalies['date_log'] = format_dates(anomalies['timestamp'])
+                anomalies['timestamp'] = format_timestamps(anomalies['timestamp'])
+            else:
+                anomalies['date_log'] = ''
+            anomalies_export = anomalies[['timestamp', 'src_ip', 'dst_ip', 'date_log']] if not anomalies.empty else pd.DataFrame(columns=['timestamp', 'src_ip', 'dst_ip', 'date_log'])
+            nb_new = append_results(anomalies_export, anomalies_csv)
+            stage.rows_out = nb_new
+        print(f"{nb_new} nouvelles anomalies ajoutées à {anomalies_csv}.")
 
-def predict_on_new_logs(input_path, model_path):
+def predict_on_new_logs(input_path, model_path, seen_store=None, metrics=None, ip_lists=None, evaluator='auto'):
     print(f"Lecture du fichier : {input_path}")
     if not os.path.exists(input_path):
         raise FileNotFoundError(f"Fichier d'entrée introuvable : {input_path}")
-    df = pd.read_csv(input_path)
+    if metrics is None:
+        metrics = RunMetrics()
+    with metrics.stage('lecture') as stage:
+        # Capture pcap / pcapng lue directement (pcap_reader.py), sinon export CSV de tshark
+        df = read_pcap(input_path) if is_pcap(input_path) else pd.read_csv(input_path)
+        stage.rows_out = len(df)
     print(f"Nombre de lignes lues : {len(df)}")
-    df = clean_and_format(df)
-    print(f"Après clean_and_format : {len(df)} lignes")
-    df = extract_features(df)
-    print(f"Après extract_features : {len(df)} lignes")
+    return predict_on_df(df, model_path, seen_store, metrics, ip_lists, evaluator=evaluator)
+
+def predict_on_new_logs_chunked(input_path, model_path, chunksize, seen_store=None, metrics=None, ip_lists=None, evaluator='sklearn'):
+    # Variante à mémoire bornée : les features et la prédiction sont calculées bloc par bloc
+    print(f"Lecture par blocs de {chunksize} lignes : {input_path}")
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"Fichier d'entrée introuvable : {input_path}")
+    if metrics is None:
+        metrics = RunMetrics()
+    with metrics.stage('chargement_modele'):
+        model, feature_names = load_model(model_path, resolve_evaluator(evaluator))
+    if ip_lists is None:
+        ip_lists = IpLists.load()
+    chunks = stream_features([(input_path, None)], chunksize, seen_store)
+    while True:
+        # Lecture, nettoyage et features d'un bloc (les deux passes de streaming.py sont comptées ici)
+        with metrics.stage('stream_features') as stage:
+            chunk = next(chunks, None)
+            stage.rows_out = len(chunk) if chunk is not None else 0
+        if chunk is None:
+            return
+        yield score_features_measured(chunk, model, feature_names, metrics, ip_lists)
+
+def list_input_files(pattern):
+    # Répertoire ou motif glob -> fichiers triés par nom ; None pour un fichier unique
+    if os.path.isdir(pattern):
+        paths = [os.path.join(pattern, name) for name in os.listdir(pattern) if not name.startswith('.')]
+    elif glob.has_magic(pattern):
+        paths = glob.glob(pattern)
+    else:
+        return None
+    return sorted(path for path in paths if os.path.isfile(path))
+
+def score_shared_file(path):
+    # Exécuté dans un processus de calcul : lecture, features et prédiction d'un fichier avec le modèle partagé.
+    # La fenêtre glissante démarre au début du fichier ; la mémoire des sources vues est celle du lancement.
+    metrics = RunMetrics()
+    model, feature_names = SHARED['model']
+    seen = SeenSnapshot(SHARED['seen_store']) if SHARED['seen_store'] is not None else None
+    try:
+        with metrics.stage('lecture') as stage:
+            df = read_pcap(path) if is_pcap(path) else pd.read_csv(path)
+            stage.rows_out = len(df)
+        df_pred = predict_with_model(df, model, feature_names, seen, metrics, SHARED['ip_lists'])
+    except Exception as e:
+        return path, None, None, metrics.summary()['stages'], e
+    return path, df_pred, seen.keys() if seen is not None else None, metrics.summary()['stages'], None
+
+def predict_files_parallel(paths, model_path, workers, seen_store, metrics=None, ip_lists=None, failures=None, evaluator='sklearn'):
+    # Générateur de (chemin, prédictions) dans l'ordre des fichiers, calculés par un pool de processus.
+    # failures : liste complétée par les (chemin, erreur) des fichiers non analysés
+    if metrics is None:
+        metrics = RunMetrics()
+    with metrics.stage('chargement_modele'):
+        SHARED['model'] = load_model(model_path, resolve_evaluator(evaluator))
+    SHARED['ip_lists'] = ip_lists if ip_lists is not None else IpLists.load()
+    SHARED['seen_store'] = seen_store
+    workers = max(1, min(workers, len(paths)))
+    print(f"{len(paths)} fichiers à analyser avec {workers} processus.")
+    pool = multiprocessing.get_context('fork').Pool(workers) if workers > 1 else None
+    seen_keys = []
+    try:
+        results = pool.imap(score_shared_file, paths) if pool is not None else map(score_shared_file, paths)
+        for path, df_pred, keys, stages, error in results:
+            metrics.merge(stages)
+            if error is not None:
+                print(f"Erreur sur {path} : {error}")
+                if failures is not None:
+                    failures.append((path, error))
+                continue
+            if keys is not None:
+                seen_keys.append(keys)
+            yield path, df_pred
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        SHARED.clear()
+    # Couples vus ajoutés une fois tous les fichiers traités : résultat indépendant du nombre de processus
+    if seen_keys:
+        seen_store.add(np.concatenate(seen_keys))
+
+def predict_on_df(df, model_path, seen_store=None, metrics=None, ip_lists=None, window_state=None, evaluator='auto'):
+    if metrics is None:
+        metrics = RunMetrics()
+    with metrics.stage('chargement_modele'):
+        model, feature_names = load_model(model_path, resolve_evaluator(evaluator, len(df)))
+    return predict_with_model(df, model, feature_names, seen_store, metrics, ip_lists, window_state)
+
+def predict_with_model(df, model, feature_names, seen_store=None, metrics=None, ip_lists=None, window_state=None):
+    # Prédiction avec un modèle déjà chargé (utilisé par le démon)
+    # window_state : agrégats de fenêtre des lots précédents (mode incrémental), sinon fenêtre limitée à ce lot
+    if metrics is None:
+        metrics = RunMetrics()
+    # Une capture lue par pcap_reader a déjà le format de sortie de clean_and_format
+    if not set(TYPED_COLUMNS).issubset(df.columns):
+        with metrics.stage('clean_and_format', len(df)) as stage:
+            df = clean_and_format(df)
+            stage.rows_out = len(df)
+    with metrics.stage('extract_features', len(df)) as stage:
+        df = extract_features(df, seen_store, window_state)
+        stage.rows_out = len(df)
+    return score_features_measured(df, model, feature_names, metrics, ip_lists)
+
+def score_features_measured(df, model, feature_names, metrics, ip_lists=None):
+    with metrics.stage('prediction', len(df)) as stage:
+        df_pred = score_features(df, model, feature_names, ip_lists, stage)
+        stage.rows_out = len(df_pred)
+        stage.anomalies = int((df_pred['anomalie'] == 1).sum())
+    return df_pred
+
+def model_paths():
     # Correction : chemin absolu du features.txt et du modèle dans le dossier ../data/ par rapport à ce script
     data_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../data'))
-    features_path = os.path.join(data_dir, 'features.txt')
-    model_path_abs = os.path.join(data_dir, 'rf_model.joblib')
+    # Version active du registre (data/models/current) si un modèle y a été publié
+    version_dir = current_model_dir(default_registry_dir(data_dir))
+    if version_dir is not None:
+        return os.path.join(version_dir, 'features.txt'), os.path.join(version_dir, 'rf_model.joblib')
+    return os.path.join(data_dir, 'features.txt'), os.path.join(data_dir, 'rf_model.joblib')
+
+def resolve_evaluator(evaluator, n_rows=None):
+    # 'auto' : forêt compacte pour un lot unique de moins de COMPACT_MAX_ROWS lignes, scikit-learn sinon
+    # (démon, mode parallèle ou par blocs : nombre de lignes inconnu ou grand, l'import n'est payé qu'une fois)
+    if evaluator != 'auto':
+        return evaluator
+    return 'compact' if n_rows is not None and n_rows < COMPACT_MAX_ROWS else 'sklearn'
+
+def load_model(model_path, evaluator='sklearn'):
+    features_path, model_path_abs = model_paths()
     if not os.path.exists(features_path):
         raise FileNotFoundError(f"Le fichier des features est introuvable : {features_path}.\n\nVérifiez que l'entraînement a bien été effectué et que le fichier existe dans le dossier data.\nSi besoin, relancez l'entraînement avec auto_main.py.")
     with open(features_path, 'r') as f:
         feature_names = [line.strip() for line in f.readlines()]
-    print(f"Features utilisées pour la prédiction : {feature_names}")
+    debug("Features utilisées pour la prédiction :", feature_names)
     print(f"Chargement du modèle : {model_path_abs}")
     if not os.path.exists(model_path_abs):
         raise FileNotFoundError(f"Le modèle entraîné est introuvable : {model_path_abs}.\n\nVérifiez que l'entraînement a bien été effectué et que le fichier existe dans le dossier data.\nSi besoin, relancez l'entraînement avec auto_main.py.")
-    model = joblib.load(model_path_abs)
+    # Forêt compacte (NumPy seul) si elle est demandée et correspond au modèle, sinon modèle scikit-learn
+    model = load_compact_forest(model_path_abs) if evaluator == 'compact' else None
+    if model is not None:
+        print("Évaluation par la forêt compacte (NumPy seul).")
+    else:
+        model = joblib.load(model_path_abs)
+    return model, feature_names
+
+def score_features(df, model, feature_names, ip_lists=None, stage=None):
     # S'assurer que toutes les features sont présentes (ajouter des colonnes vides si besoin)
     for feat in feature_names:
         if feat not in df.columns:
             df[feat] = 0
-    X = df[feature_names]
-    print(f"Shape X pour prédiction : {X.shape}")
+    # Lignes couvertes par les listes d'autorisation / de blocage : décidées sans passer par le modèle
+    if ip_lists is None:
+        ip_lists = IpLists.load()
+    allowed, denied = ip_lists.match(df)
+    to_score = ~(allowed | denied)
+    X = df.loc[to_score, feature_names]
+    debug("Shape X pour prédiction :", X.shape)
     # Prédire l'anomalie (0/1)
-    df['anomalie'] = model.predict(X)
-    print(f"Nombre de prédictions : {len(df['anomalie'])}")
-    print("Aperçu des adresses IP source :")
-    if 'src_ip' in df.columns:
-        # Exclure les IP non suspectes de l'affichage
-        ip_exclues = ['10.74.16.1', '10.74.19.255']
-        src_ip_affiche = df['src_ip'][~df['src_ip'].astype(str).isin(ip_exclues)]
-        print(src_ip_affiche.head(10))
-    else:
-        print("Colonne src_ip absente du DataFrame.")
-    # Forcer l'IP 10.74.16.1 et 10.74.19.255 à ne jamais être considérées comme suspectes
-    if 'src_ip' in df.columns and 'anomalie' in df.columns:
-        mask = df['src_ip'].astype(str).isin(['10.74.16.1', '10.74.19.255'])
-        df.loc[mask, 'anomalie'] = 0
-    # Forcer toutes les IP source commençant par 10.74 à ne jamais être considérées comme anomalies
-    if 'src_ip' in df.columns and 'anomalie' in df.columns:
-        mask_1074 = df['src_ip'].astype(str).str.startswith('10.74')
-        df.loc[mask_1074, 'anomalie'] = 0
-    # Supprimer ces IP des aperçus d'anomalies
-    if 'src_ip' in df.columns and 'anomalie' in df.columns:
-        df_anomalies = df[(df['anomalie'] == 1) & (~df['src_ip'].astype(str).isin(['10.74.16.1', '10.74.19.255']))]
-    else:
-        df_anomalies = df[df['anomalie'] == 1] if 'anomalie' in df.columns else df
+    anomalie = np.zeros(len(df), dtype=int)
+    if len(X) > 0:
+        anomalie[to_score] = model.predict(X)
+    anomalie[denied] = 1
+    df['anomalie'] = anomalie
+    debug("Nombre de prédictions :", len(X), "- lignes autorisées :", int(allowed.sum()), "- lignes bloquées :", int(denied.sum()))
+    if stage is not None:
+        stage.skipped = {'allowlist': int(allowed.sum()), 'denylist': int(denied.sum())}
+    if is_debug():
+        print("Aperçu des adresses IP source :")
+        if 'src_ip' in df.columns:
+            # Exclure les IP autorisées de l'affichage
+            print(df.loc[~allowed, 'src_ip'].head(10))
+        else:
+            print("Colonne src_ip absente du DataFrame.")
     # Exporter un CSV simple pour Grafana (timestamp, src_ip, dst_ip, proto, src_port, dst_port, anomalie)
     export_cols = []
     for col in ['timestamp', 'src_ip', 'dst_ip', 'proto', 'src_port', 'dst_port', 'anomalie']:
@@ -122,27 +271,81 @@ def predict_on_new_logs(input_path, model_path):
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Détection d'anomalies IA-Sentinel sur un fichier de log.")
-    parser.add_argument('--input', type=str, default='/var/log/wireshark/logs/capture.csv', help='Chemin du fichier de log à tester')
+    parser.add_argument('--input', type=str, default='/var/log/wireshark/logs/capture.csv', help='Chemin du fichier de log à tester, ou répertoire / motif glob de fichiers à analyser en parallèle')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Nombre de processus pour un répertoire ou un motif de fichiers (défaut : nombre de cœurs)')
     parser.add_argument('--output', type=str, default='/var/log/wireshark/result-script/final_result.csv', help='Chemin du fichier de sortie avec résultats')
     parser.add_argument('--model', type=str, default='rf_model.joblib', help='Chemin du modèle Random Forest')
+    parser.add_argument('--evaluator', choices=EVALUATORS, default='auto', help='Évaluation de la forêt : compact (NumPy seul), sklearn, ou auto (compact pour un fichier unique de moins de 500 000 lignes)')
+    parser.add_argument('--chunksize', type=int, default=None, help='Traiter le fichier par blocs de N lignes (mémoire bornée)')
+    parser.add_argument('--incremental', action='store_true', help='Ne traiter que les lignes ajoutées depuis la dernière exécution')
+    parser.add_argument('--checkpoint', type=str, default=None, help='Chemin du checkpoint d\'offset (mode --incremental)')
+    parser.add_argument('--seen-state', type=str, default=None, help='Chemin de la mémoire des couples (src_ip, dst_port) déjà vus')
+    parser.add_argument('--seen-ttl', type=int, default=DEFAULT_TTL, help='Durée de rétention (secondes) des couples déjà vus')
+    parser.add_argument('--window-state', type=str, default=None, help='Chemin de l\'état des fenêtres glissantes (mode --incremental)')
+    parser.add_argument('--ip-lists', type=str, default=None, help='Fichier des listes d\'autorisation / de blocage (CIDR et ports)')
+    parser.add_argument('--debug', action='store_true', help='Afficher les aperçus de débogage (colonnes, premières lignes...)')
     args = parser.parse_args()
+    if args.debug:
+        set_debug(True)
     try:
-        df_pred = predict_on_new_logs(args.input, args.model)
-        print(f"[DEBUG] Colonnes du DataFrame exporté : {list(df_pred.columns)}")
-        print(f"[DEBUG] Nombre de lignes à exporter : {len(df_pred)}")
-        export_all_logs(df_pred, args.output)
-        # Export anomalies dans un CSV dédié (timestamp, src_ip, dst_ip, date_log)
-        anomalies_csv = os.path.join(os.path.dirname(args.output), 'anomalies_only.csv')
-        if 'anomalie' in df_pred.columns:
-            anomalies = df_pred[df_pred['anomalie'] == 1].copy()
-            # Extraire la date de la log à partir du timestamp (si possible)
-            if 'timestamp' in anomalies.columns:
-                anomalies['date_log'] = anomalies['timestamp'].astype(str).str[:10]
-            else:
-                anomalies['date_log'] = ''
-            anomalies_export = anomalies[['timestamp', 'src_ip', 'dst_ip', 'date_log']] if not anomalies.empty else pd.DataFrame(columns=['timestamp', 'src_ip', 'dst_ip', 'date_log'])
-            anomalies_export.to_csv(anomalies_csv, index=False)
-            print(f"Export des anomalies vers {anomalies_csv} terminé.")
+        new_state = None
+        ip_lists = IpLists.load(args.ip_lists)
+        seen_path = args.seen_state or default_seen_path(args.output)
+        seen_store = SeenStore.load(seen_path, ttl=args.seen_ttl)
+        exported = False
+        failures = []
+        input_files = list_input_files(args.input)
+        metrics = RunMetrics(args.output, 'parallel' if input_files is not None else 'incremental' if args.incremental else 'chunked' if args.chunksize else 'batch')
+        if args.incremental and is_pcap(args.input):
+            print('Le mode --incremental ne prend en charge que les exports CSV de tshark, pas les fichiers pcap / pcapng.')
+            sys.exit(1)
+        if input_files is not None and (args.incremental or args.chunksize):
+            print('Les options --incremental et --chunksize ne s\'appliquent qu\'à un fichier unique, pas à un répertoire ou un motif.')
+            sys.exit(1)
+        if input_files is not None:
+            if not input_files:
+                print(f"Aucun fichier à analyser : {args.input}")
+                sys.exit(1)
+            # Résultats fusionnés dans le stockage au fil de l'eau, dans l'ordre des fichiers
+            anomalies_parts = []
+            for path, df_file in predict_files_parallel(input_files, args.model, args.workers, seen_store, metrics, ip_lists, failures, args.evaluator):
+                export_all_logs(df_file, args.output, metrics)
+                # Parties vides écartées : un fichier sans timestamp ferait passer la colonne int64 en float au concat
+                anomalies = df_file[df_file['anomalie'] == 1]
+                if not anomalies.empty:
+                    anomalies_parts.append(anomalies)
+            df_pred = pd.concat(anomalies_parts, ignore_index=True) if anomalies_parts else pd.DataFrame(columns=['anomalie'])
+            exported = True
+        elif args.incremental:
+            checkpoint_path = args.checkpoint or default_checkpoint_path(args.output)
+            # Les fenêtres glissantes se poursuivent d'une exécution à l'autre
+            window_path = args.window_state or default_window_path(args.output)
+            window_state = WindowState.load(window_path)
+            with metrics.stage('lecture') as stage:
+                df_new, new_state = read_new_logs(args.input, checkpoint_path)
+                stage.rows_out = len(df_new)
+            if df_new.empty:
+                if new_state is not None:
+                    save_checkpoint(checkpoint_path, new_state)
+                print('Aucune nouvelle ligne à analyser.')
+                metrics.write()
+                sys.exit(0)
+            df_pred = predict_on_df(df_new, args.model, seen_store, metrics, ip_lists, window_state, args.evaluator)
+        elif args.chunksize:
+            # Chaque bloc est exporté dès qu'il est prêt, seules les anomalies sont conservées
+            anomalies_parts = []
+            for chunk in predict_on_new_logs_chunked(args.input, args.model, args.chunksize, seen_store, metrics, ip_lists, args.evaluator):
+                export_all_logs(chunk, args.output, metrics)
+                anomalies_parts.append(chunk[chunk['anomalie'] == 1])
+            df_pred = pd.concat(anomalies_parts, ignore_index=True) if anomalies_parts else pd.DataFrame(columns=['anomalie'])
+            exported = True
+        else:
+            df_pred = predict_on_new_logs(args.input, args.model, seen_store, metrics, ip_lists, args.evaluator)
+        if not exported:
+            debug("[DEBUG] Colonnes du DataFrame exporté :", list(df_pred.columns))
+            debug("[DEBUG] Nombre de lignes à exporter :", len(df_pred))
+            export_all_logs(df_pred, args.output, metrics)
+        export_anomalies(df_pred, args.output, metrics)
         # Exclure les IP non suspectes de l'affichage des anomalies
         if 'src_ip' in df_pred.columns and 'anomalie' in df_pred.columns:
             df_anomalies = df_pred[(df_pred['anomalie'] == 1)]
@@ -150,11 +353,26 @@ if __name__ == "__main__":
             df_anomalies = df_pred[df_pred['anomalie'] == 1] if 'anomalie' in df_pred.columns else df_pred
         nb_anomalies = len(df_anomalies)
         print(f"Nombre d'anomalies détectées : {nb_anomalies}")
+        skipped = metrics.stages.get('prediction', {}).get('skipped', {})
+        if any(skipped.values()):
+            print(f"Lignes décidées sans le modèle : {skipped.get('allowlist', 0)} autorisées, {skipped.get('denylist', 0)} bloquées")
         if nb_anomalies > 0:
-            print('Aperçu des anomalies détectées :')
-            print(df_anomalies.head(10))
+            debug('Aperçu des anomalies détectées :')
+            debug(df_anomalies.head(10))
         else:
             print('Aucune anomalie détectée.')
+        # La mémoire des sources vues, les fenêtres et le checkpoint n'avancent qu'une fois l'export réussi
+        seen_store.save(seen_path)
+        if new_state is not None:
+            window_state.save(window_path)
+            save_checkpoint(checkpoint_path, new_state)
+        metrics.write()
+        if failures:
+            # Les fichiers analysés sont exportés, mais l'exécution est signalée en échec pour être relancée
+            print(f"Export partiel : {len(failures)} fichier(s) sur {len(input_files)} non analysé(s) :")
+            for path, error in failures:
+                print(f"  {path} : {error}")
+            sys.exit(1)
         print('Export terminé avec succès.')
     except Exception as e:
         print(f"Erreur lors du traitement : {e}")
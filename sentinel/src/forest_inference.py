@@ -0,0 +1,306 @@
+# forest_inference.py
+# Forêt aléatoire "à plat" : inférence vectorisée avec NumPy seul, sans importer scikit-learn
+#
+# Évaluation par masques de bits (principe de QuickScorer) : les feuilles de chaque arbre sont numérotées
+# de gauche à droite et représentées par des bits (mots de 64 bits). Pour chaque nœud dont la condition
+# X[f] <= seuil est fausse, les feuilles de son sous-arbre gauche sont éliminées par un ET binaire.
+# La feuille de sortie est le bit à 1 de poids le plus faible. Toutes les comparaisons sont faites
+# colonne par colonne, sans parcours d'arbre nœud par nœud. Efficace pour des arbres peu profonds.
+# Pour des arbres profonds (beaucoup de nœuds), on descend plutôt tous les arbres niveau par niveau :
+# les enfants d'un nœud sont numérotés côte à côte (droit = gauche + 1) et les feuilles bouclent sur elles-mêmes.
+# La méthode la moins coûteuse est choisie au chargement.
+#
+# Tableaux contigus (un fichier .npy chacun, ouverts en mmap) :
+#  node_feature, node_threshold     : condition de chaque nœud interne
+#  entry_node, entry_word, entry_mask : masques à appliquer (triés par mot) quand la condition est fausse
+#  tree_word, tree_n_words          : premier mot et nombre de mots de chaque arbre
+#  leaf_value, tree_leaf_offset     : probabilités normalisées par feuille (64 emplacements par mot)
+#  tree_root, walk_feature, walk_threshold, walk_left, walk_leaf : parcours niveau par niveau
+#  classes
+
+import json
+import os
+import sys
+import time
+import numpy as np
+from stage_cache import file_sha256
+
+FOREST_ARRAYS = ['node_feature', 'node_threshold', 'entry_node', 'entry_word', 'entry_mask',
+                 'tree_word', 'tree_n_words', 'leaf_value', 'tree_leaf_offset',
+                 'tree_root', 'walk_feature', 'walk_threshold', 'walk_left', 'walk_leaf', 'classes']
+ALL_ONES = np.uint64(0xFFFFFFFFFFFFFFFF)
+# Taille maximale (octets) de la matrice de masques d'un lot, qui fixe le nombre de lignes par lot
+BATCH_BYTES = 4 * 1024 * 1024
+MAX_BATCH_ROWS = 256
+
+def default_forest_dir(model_path):
+    return os.path.splitext(model_path)[0] + '.forest'
+
+def flatten_tree(tree, n_classes):
+    # Numérotation des feuilles de gauche à droite et intervalle de feuilles du sous-arbre gauche de chaque nœud
+    left, right = tree.children_left, tree.children_right
+    leaves = []
+    leaf_range = {}
+    stack = [(0, False)]
+    while stack:
+        node, visited = stack.pop()
+        if left[node] == -1:
+            leaves.append(node)
+            leaf_range[node] = (len(leaves) - 1, len(leaves))
+        elif visited:
+            leaf_range[node] = (leaf_range[left[node]][0], leaf_range[right[node]][1])
+        else:
+            stack.extend([(node, True), (right[node], False), (left[node], False)])
+    internal = [node for node in range(tree.node_count) if left[node] != -1]
+    # Même calcul que DecisionTreeClassifier.predict_proba : scikit-learn >= 1.4 stocke déjà des proportions,
+    # les versions antérieures stockent des effectifs qui sont normalisés à la prédiction
+    proba = tree.value[leaves, 0, :n_classes].astype(np.float64)
+    normalizer = proba.sum(axis=1)[:, np.newaxis]
+    if not np.allclose(normalizer, 1.0):
+        normalizer[normalizer == 0.0] = 1.0
+        proba = proba / normalizer
+    return internal, [leaf_range[left[node]] for node in internal], proba, leaves
+
+def walk_arrays(tree, leaves):
+    # Renumérotation en largeur avec enfants adjacents : droit = gauche + 1
+    left, right = tree.children_left, tree.children_right
+    order = [0]
+    new_id = {0: 0}
+    for node in order:
+        if left[node] != -1:
+            new_id[left[node]] = len(order)
+            new_id[right[node]] = len(order) + 1
+            order.extend([left[node], right[node]])
+    leaf_number = {node: i for i, node in enumerate(leaves)}
+    feature = np.zeros(len(order), dtype=np.int32)
+    threshold = np.full(len(order), np.inf)
+    child = np.arange(len(order), dtype=np.int32)
+    leaf = np.full(len(order), -1, dtype=np.int64)
+    for i, node in enumerate(order):
+        if left[node] == -1:
+            leaf[i] = leaf_number[node]
+        else:
+            feature[i] = tree.feature[node]
+            threshold[i] = tree.threshold[node]
+            child[i] = new_id[left[node]]
+    return feature, threshold, child, leaf
+
+def export_forest(model, forest_dir, model_path=None):
+    # Aplatissement d'un RandomForestClassifier (sortie unique) entraîné
+    node_feature, node_threshold = [], []
+    entry_node, entry_word, entry_mask = [], [], []
+    tree_word, tree_n_words, leaf_values, tree_leaf_offset = [], [], [], []
+    tree_root, walk_feature, walk_threshold, walk_left, walk_leaf = [], [], [], [], []
+    n_words = 0
+    n_leaf_slots = 0
+    n_walk_nodes = 0
+    max_depth = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        internal, left_ranges, proba, leaves = flatten_tree(tree, model.n_classes_)
+        feature, threshold, child, leaf = walk_arrays(tree, leaves)
+        tree_root.append(n_walk_nodes)
+        walk_feature.append(feature)
+        walk_threshold.append(threshold)
+        walk_left.append(child + n_walk_nodes)
+        walk_leaf.append(np.where(leaf >= 0, leaf + n_leaf_slots, -1))
+        n_walk_nodes += len(feature)
+        max_depth = max(max_depth, int(tree.max_depth))
+        words = (len(proba) + 63) // 64
+        for node, (first, last) in zip(internal, left_ranges):
+            node_id = len(node_feature)
+            node_feature.append(tree.feature[node])
+            node_threshold.append(tree.threshold[node])
+            for word in range(first // 64, (last - 1) // 64 + 1):
+                low = max(first, word * 64) - word * 64
+                high = min(last, (word + 1) * 64) - word * 64
+                bits = ((1 << high) - 1) ^ ((1 << low) - 1)
+                entry_node.append(node_id)
+                entry_word.append(n_words + word)
+                entry_mask.append(~bits & 0xFFFFFFFFFFFFFFFF)
+        padded = np.zeros((words * 64, model.n_classes_), dtype=np.float64)
+        padded[:len(proba)] = proba
+        leaf_values.append(padded)
+        tree_word.append(n_words)
+        tree_n_words.append(words)
+        tree_leaf_offset.append(n_leaf_slots)
+        n_words += words
+        n_leaf_slots += len(padded)
+    order = np.argsort(np.array(entry_word, dtype=np.int64), kind='stable')
+    arrays = {
+        'node_feature': np.array(node_feature, dtype=np.int32),
+        'node_threshold': np.array(node_threshold, dtype=np.float64),
+        'entry_node': np.array(entry_node, dtype=np.int32)[order],
+        'entry_word': np.array(entry_word, dtype=np.int32)[order],
+        'entry_mask': np.array(entry_mask, dtype=np.uint64)[order],
+        'tree_word': np.array(tree_word, dtype=np.int32),
+        'tree_n_words': np.array(tree_n_words, dtype=np.int32),
+        # Disposition classe par classe pour des lectures contiguës à l'inférence
+        'leaf_value': np.ascontiguousarray(np.concatenate(leaf_values).T),
+        'tree_leaf_offset': np.array(tree_leaf_offset, dtype=np.int64),
+        'tree_root': np.array(tree_root, dtype=np.int32),
+        'walk_feature': np.concatenate(walk_feature),
+        'walk_threshold': np.concatenate(walk_threshold),
+        'walk_left': np.concatenate(walk_left).astype(np.int32),
+        'walk_leaf': np.concatenate(walk_leaf),
+        'classes': np.asarray(model.classes_),
+    }
+    meta = {
+        'n_trees': len(tree_word),
+        'n_nodes': len(node_feature),
+        'n_words': n_words,
+        'max_depth': max_depth,
+        'n_features': int(model.n_features_in_),
+        'feature_names': [str(name) for name in getattr(model, 'feature_names_in_', [])],
+        'model_sha256': file_sha256(model_path) if model_path and os.path.exists(model_path) else None,
+    }
+    # Écriture dans un dossier temporaire puis renommage, pour ne jamais exposer un artefact incomplet
+    tmp_dir = forest_dir + '.tmp'
+    os.makedirs(tmp_dir, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_dir, name + '.npy'), array)
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+    if os.path.isdir(forest_dir):
+        old_dir = forest_dir + '.old'
+        os.replace(forest_dir, old_dir)
+        os.replace(tmp_dir, forest_dir)
+        for name in os.listdir(old_dir):
+            os.remove(os.path.join(old_dir, name))
+        os.rmdir(old_dir)
+    else:
+        os.replace(tmp_dir, forest_dir)
+    print(f"Forêt compacte exportée vers {forest_dir} ({len(node_feature)} nœuds internes, {len(tree_word)} arbres)")
+    return forest_dir
+
+class CompactForest:
+    def __init__(self, forest_dir, mmap=True):
+        with open(os.path.join(forest_dir, 'meta.json'), 'r') as f:
+            self.meta = json.load(f)
+        mode = 'r' if mmap else None
+        for name in FOREST_ARRAYS:
+            setattr(self, name, np.load(os.path.join(forest_dir, name + '.npy'), mmap_mode=mode))
+        self.classes_ = np.asarray(self.classes)
+        self.n_words = self.meta['n_words']
+        # Début de chaque groupe de masques portant sur un même mot
+        if len(self.entry_word):
+            self.word_starts = np.flatnonzero(np.r_[True, self.entry_word[1:] != self.entry_word[:-1]])
+        else:
+            self.word_starts = np.array([], dtype=np.int64)
+        self.masked_words = np.asarray(self.entry_word)[self.word_starts]
+        self.multi_word_trees = np.flatnonzero(np.asarray(self.tree_n_words) > 1)
+        # Coût par ligne des deux méthodes : nombre de masques contre nombre d'arbres x profondeur
+        self.use_bitmask = len(self.entry_node) + self.n_words <= 2 * len(self.tree_word) * self.meta['max_depth']
+        if self.use_bitmask:
+            self.batch_rows = max(1, min(MAX_BATCH_ROWS, BATCH_BYTES // (8 * max(1, len(self.entry_node)))))
+        else:
+            self.batch_rows = max(1, BATCH_BYTES // (8 * len(self.tree_word)))
+
+    def to_matrix(self, X):
+        # scikit-learn évalue les arbres en float32 : même conversion pour des décisions identiques
+        if hasattr(X, 'to_numpy'):
+            X = X.to_numpy()
+        return np.ascontiguousarray(np.asarray(X, dtype=np.float32).T)
+
+    def leaf_indices(self, XT):
+        # Indice global de la feuille atteinte, forme (n_arbres, n_lignes)
+        n_rows = XT.shape[1]
+        go_right = XT[self.node_feature] > self.node_threshold[:, np.newaxis]
+        bitmask = np.full((self.n_words, n_rows), ALL_ONES)
+        if len(self.entry_node):
+            masks = np.where(go_right[self.entry_node], self.entry_mask[:, np.newaxis], ALL_ONES)
+            bitmask[self.masked_words] = np.bitwise_and.reduceat(masks, self.word_starts, axis=0)
+        # Position du bit de poids faible : exposant du flottant égal à la puissance de deux isolée
+        lowest = bitmask & (~bitmask + np.uint64(1))
+        bit = (lowest.astype(np.float64).view(np.uint64) >> np.uint64(52)).astype(np.int64) - 1023
+        leaves = bit[self.tree_word]
+        for tree in self.multi_word_trees:
+            # Arbres de plus de 64 feuilles : premier mot non nul
+            first, count = self.tree_word[tree], self.tree_n_words[tree]
+            word = np.argmax(bitmask[first:first + count] != 0, axis=0)
+            leaves[tree] = bit[first + word, np.arange(n_rows)] + 64 * word
+        return leaves + self.tree_leaf_offset[:, np.newaxis]
+
+    def walk_leaf_indices(self, XT):
+        # Descente simultanée de tous les arbres, un niveau par itération
+        n_rows = XT.shape[1]
+        flat = XT.ravel()
+        columns = np.arange(n_rows)
+        nodes = np.repeat(np.asarray(self.tree_root)[:, np.newaxis], n_rows, axis=1)
+        for _ in range(self.meta['max_depth']):
+            go_right = flat[self.walk_feature[nodes] * n_rows + columns] > self.walk_threshold[nodes]
+            nodes = self.walk_left[nodes] + go_right
+        return self.walk_leaf[nodes]
+
+    def predict_proba(self, X):
+        XT = self.to_matrix(X)
+        n_rows = XT.shape[1]
+        proba = np.empty((n_rows, len(self.classes_)), dtype=np.float64)
+        for start in range(0, n_rows, self.batch_rows):
+            batch = np.ascontiguousarray(XT[:, start:start + self.batch_rows])
+            leaves = self.leaf_indices(batch) if self.use_bitmask else self.walk_leaf_indices(batch)
+            for c in range(len(self.classes_)):
+                # Somme arbre par arbre (axe 0), dans le même ordre que RandomForestClassifier
+                proba[start:start + self.batch_rows, c] = np.take(self.leaf_value[c], leaves).sum(axis=0)
+        proba /= len(self.tree_word)
+        return proba
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+def load_compact_forest(model_path):
+    # Retourne la forêt compacte si elle existe et correspond bien au modèle joblib, sinon None
+    forest_dir = default_forest_dir(model_path)
+    if not os.path.exists(os.path.join(forest_dir, 'meta.json')):
+        return None
+    forest = CompactForest(forest_dir)
+    if os.path.exists(model_path) and forest.meta.get('model_sha256') != file_sha256(model_path):
+        print(f"Forêt compacte {forest_dir} périmée par rapport à {model_path}, utilisation du modèle joblib.")
+        return None
+    return forest
+
+def benchmark(model_path, data_path, features_path, repeat=1):
+    # Comparaison scikit-learn / forêt compacte : import, chargement, débit et égalité des prédictions
+    import pandas as pd
+    with open(features_path, 'r') as f:
+        feature_names = [line.strip() for line in f.readlines()]
+    X = pd.concat([pd.read_csv(data_path)[feature_names]] * repeat, ignore_index=True)
+    t0 = time.perf_counter()
+    import joblib
+    import sklearn.ensemble  # noqa: F401
+    t_import = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    model = joblib.load(model_path)
+    t_load = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    proba_sklearn = model.predict_proba(X)
+    t_predict = time.perf_counter() - t0
+    forest_dir = default_forest_dir(model_path)
+    if load_compact_forest(model_path) is None:
+        export_forest(model, forest_dir, model_path)
+    t0 = time.perf_counter()
+    forest = CompactForest(forest_dir)
+    t_load_compact = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    proba_compact = forest.predict_proba(X)
+    t_predict_compact = time.perf_counter() - t0
+    identical = np.array_equal(proba_sklearn, proba_compact) and np.array_equal(model.predict(X), forest.predict(X))
+    print(f"Lignes : {len(X)}")
+    print(f"scikit-learn : import {t_import:.3f} s, chargement {t_load:.4f} s, {len(X) / t_predict:,.0f} lignes/s")
+    print(f"forêt compacte : import numpy seul, chargement {t_load_compact:.4f} s, {len(X) / t_predict_compact:,.0f} lignes/s")
+    print(f"Prédictions identiques : {identical}")
+    return identical
+
+if __name__ == "__main__":
+    # python forest_inference.py export [modèle]
+    # python forest_inference.py bench [modèle] [données] [répétitions]
+    data_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../data'))
+    command = sys.argv[1] if len(sys.argv) > 1 else 'bench'
+    model_path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(data_dir, 'rf_model.joblib')
+    if command == 'export':
+        import joblib
+        export_forest(joblib.load(model_path), default_forest_dir(model_path), model_path)
+    else:
+        data_path = sys.argv[3] if len(sys.argv) > 3 else os.path.join(data_dir, 'preprocessed.csv')
+        repeat = int(sys.argv[4]) if len(sys.argv) > 4 else 1
+        benchmark(model_path, data_path, os.path.join(data_dir, 'features.txt'), repeat)
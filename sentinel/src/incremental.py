@@ -0,0 +1,129 @@
+# incremental.py
+# Lecture incrémentale (façon "tail -f") du fichier de capture avec checkpoint d'offset
+
+import hashlib
+import io
+import json
+import os
+import pandas as pd
+
+# Longueur maximale du début de fichier haché dans le checkpoint (empreinte du fichier suivi)
+FINGERPRINT_BYTES = 4096
+
+def default_checkpoint_path(output_path):
+    # Le checkpoint est rangé à côté des résultats
+    return os.path.join(os.path.dirname(os.path.abspath(output_path)), 'capture.offset.json')
+
+def load_checkpoint(checkpoint_path):
+    if not os.path.exists(checkpoint_path):
+        return None
+    try:
+        with open(checkpoint_path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Checkpoint illisible ({e}), relecture depuis le début du fichier.")
+        return None
+
+def save_checkpoint(checkpoint_path, state):
+    # Écriture atomique : fichier temporaire puis renommage
+    tmp_path = checkpoint_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, checkpoint_path)
+
+def file_fingerprint(f, length):
+    # Haché des premiers octets du fichier : détecte un fichier remplacé sur place (copytruncate puis réécriture)
+    f.seek(0)
+    return hashlib.sha256(f.read(length)).hexdigest()
+
+def resume_offset(state, st, f):
+    # Offset de reprise et indicateur "fichier remplacé" (rotation, troncature ou contenu réécrit depuis le début)
+    if state is None:
+        return 0, False
+    if state.get('inode') != st.st_ino or state.get('dev') != st.st_dev:
+        print("Rotation du fichier de capture détectée, lecture depuis le début.")
+        return 0, True
+    if st.st_size < state.get('offset', 0) or st.st_size < state.get('size', 0):
+        print("Troncature du fichier de capture détectée, lecture depuis le début.")
+        return 0, True
+    # Anciens checkpoints sans empreinte : identité et taille seules
+    if 'fingerprint' in state and file_fingerprint(f, state['fingerprint_len']) != state['fingerprint']:
+        print("Début du fichier de capture modifié (copytruncate), lecture depuis le début.")
+        return 0, True
+    return state.get('offset', 0), False
+
+def find_rotated(input_path, state):
+    # Ancienne version du fichier suivi : renommée par la rotation (même inode, ex. capture.csv.1)
+    # ou copiée avant troncature (copytruncate : mêmes premiers octets)
+    directory, base = os.path.split(os.path.abspath(input_path))
+    candidates = sorted(entry for entry in os.scandir(directory)
+                        if entry.name.startswith(base) and entry.name != base and entry.is_file())
+    for entry in candidates:
+        st = entry.stat()
+        if st.st_ino == state.get('inode') and st.st_dev == state.get('dev'):
+            return entry.path
+    if 'fingerprint' in state:
+        for entry in candidates:
+            if entry.stat().st_size >= state['fingerprint_len']:
+                with open(entry.path, 'rb') as f:
+                    if file_fingerprint(f, state['fingerprint_len']) == state['fingerprint']:
+                        return entry.path
+    return None
+
+def read_rotated_tail(input_path, state):
+    # Lignes de l'ancienne version non lues avant la rotation (b'' si elle est introuvable ou déjà lue)
+    rotated = find_rotated(input_path, state)
+    if rotated is None:
+        if state.get('offset', 0) < state.get('size', 0):
+            print("Ancienne version du fichier de capture introuvable, sa fin non lue est perdue.")
+        return b''
+    with open(rotated, 'rb') as f:
+        f.seek(state.get('offset', 0))
+        tail = f.read()
+    if tail and not tail.endswith(b'\n'):
+        # Le fichier n'est plus écrit : sa dernière ligne est complète même sans retour à la ligne
+        tail += b'\n'
+    if tail:
+        print(f"Fin de {rotated} lue avant la nouvelle version ({len(tail)} octets).")
+    return tail
+
+def read_new_logs(input_path, checkpoint_path):
+    # Retourne (DataFrame des nouvelles lignes complètes, nouvel état du checkpoint)
+    # Le checkpoint n'est pas écrit ici : l'appelant le sauvegarde une fois l'export réussi
+    return read_logs_after(input_path, load_checkpoint(checkpoint_path))
+
+def read_logs_after(input_path, state):
+    # Même lecture à partir d'un état déjà chargé (le démon garde son checkpoint en mémoire entre deux sauvegardes)
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"Fichier d'entrée introuvable : {input_path}")
+    with open(input_path, 'rb') as f:
+        st = os.fstat(f.fileno())
+        offset, replaced = resume_offset(state, st, f)
+        f.seek(0)
+        header = f.readline()
+        if not header.endswith(b'\n'):
+            # En-tête pas encore écrit entièrement ; la fin de l'ancienne version sera lue au prochain passage
+            return pd.DataFrame(), state
+        # Fin de l'ancienne version d'abord, puis la nouvelle depuis son début
+        tail = read_rotated_tail(input_path, state) if replaced else b''
+        if offset < len(header):
+            offset = len(header)
+        f.seek(offset)
+        chunk = f.read(st.st_size - offset)
+        # On ne consomme que les lignes terminées, la dernière ligne peut être en cours d'écriture
+        end = chunk.rfind(b'\n') + 1
+        chunk = chunk[:end]
+        fingerprint_len = min(FINGERPRINT_BYTES, offset + end)
+        new_state = {
+            'inode': st.st_ino,
+            'dev': st.st_dev,
+            'size': st.st_size,
+            'offset': offset + end,
+            'fingerprint': file_fingerprint(f, fingerprint_len),
+            'fingerprint_len': fingerprint_len,
+        }
+    if not chunk and not tail:
+        return pd.DataFrame(columns=pd.read_csv(io.BytesIO(header)).columns), new_state
+    df = pd.read_csv(io.BytesIO(header + tail + chunk))
+    print(f"Lecture incrémentale : {len(df)} nouvelles lignes (octets {offset} à {offset + end})")
+    return df, new_state
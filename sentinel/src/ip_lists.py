@@ -0,0 +1,105 @@
+# ip_lists.py
+# Listes d'autorisation / de blocage (CIDR et ports) appliquées avant l'inférence
+#
+# Format du fichier (une règle par ligne, "#" pour les commentaires) :
+#   allow 10.74.0.0/16      IP source dans le réseau -> jamais anomalie, non évaluée par le modèle
+#   allow 10.74.16.1        IP seule (équivalent /32)
+#   deny 198.51.100.0/24    IP source dans le réseau -> toujours anomalie, non évaluée par le modèle
+#   allow port 5353         port de destination (ou plage : port 6000-6010)
+# Une ligne à la fois autorisée et bloquée est bloquée.
+# Les CIDR sont compilés en intervalles [début, fin] triés et fusionnés : l'appartenance d'une colonne
+# entière se teste par une recherche dichotomique vectorisée. Les ports utilisent une table de 65536 booléens.
+
+import os
+import numpy as np
+from preprocessing import ipv4_columns, ipv4_to_int
+
+# Règles appliquées si aucun fichier n'est présent (ancien comportement : IP internes 10.74.x.x jamais suspectes)
+DEFAULT_RULES = ['allow 10.74.0.0/16']
+
+def default_ip_lists_path():
+    return os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../data/ip_lists.txt'))
+
+def parse_cidr(text):
+    # "a.b.c.d/n" ou "a.b.c.d" -> (début, fin) en entiers 32 bits
+    address, _, prefix = text.partition('/')
+    start = ipv4_to_int(address)
+    prefix_len = int(prefix) if prefix else 32
+    if start is None or not 0 <= prefix_len <= 32:
+        raise ValueError(f"CIDR invalide : {text}")
+    mask = (0xFFFFFFFF << (32 - prefix_len)) & 0xFFFFFFFF
+    start &= mask
+    return start, start | (~mask & 0xFFFFFFFF)
+
+def parse_ports(text):
+    first, _, last = text.partition('-')
+    first, last = int(first), int(last or first)
+    if not 0 <= first <= last <= 65535:
+        raise ValueError(f"Port invalide : {text}")
+    return first, last
+
+class CidrIndex:
+    def __init__(self, intervals):
+        # Tri puis fusion des intervalles qui se chevauchent ou se touchent
+        starts, ends = [], []
+        for start, end in sorted(intervals):
+            if ends and start <= ends[-1] + 1:
+                ends[-1] = max(ends[-1], end)
+            else:
+                starts.append(start)
+                ends.append(end)
+        self.starts = np.array(starts, dtype=np.uint32)
+        self.ends = np.array(ends, dtype=np.uint32)
+
+    def contains(self, values, valid):
+        if len(self.starts) == 0:
+            return np.zeros(len(values), dtype=bool)
+        # Intervalle candidat : le dernier dont le début est <= à l'adresse
+        idx = np.searchsorted(self.starts, values, side='right') - 1
+        return valid & (idx >= 0) & (values <= self.ends[np.maximum(idx, 0)])
+
+class IpLists:
+    def __init__(self, rules):
+        cidrs = {'allow': [], 'deny': []}
+        self.ports = {'allow': np.zeros(65536, dtype=bool), 'deny': np.zeros(65536, dtype=bool)}
+        for line_no, rule in rules:
+            parts = rule.split('#', 1)[0].split()
+            if not parts:
+                continue
+            try:
+                action = parts[0].lower()
+                if action not in cidrs:
+                    raise ValueError(f"action inconnue : {parts[0]}")
+                if len(parts) == 3 and parts[1].lower() == 'port':
+                    first, last = parse_ports(parts[2])
+                    self.ports[action][first:last + 1] = True
+                elif len(parts) == 2:
+                    cidrs[action].append(parse_cidr(parts[1]))
+                else:
+                    raise ValueError('règle incomplète')
+            except ValueError as e:
+                print(f"Règle ignorée (ligne {line_no}) : {rule.strip()} ({e})")
+        self.allow_cidrs = CidrIndex(cidrs['allow'])
+        self.deny_cidrs = CidrIndex(cidrs['deny'])
+
+    @classmethod
+    def load(cls, path=None):
+        path = path or default_ip_lists_path()
+        if not os.path.exists(path):
+            return cls(list(enumerate(DEFAULT_RULES, 1)))
+        with open(path, 'r') as f:
+            return cls(list(enumerate(f, 1)))
+
+    def match(self, df):
+        # (autorisées, bloquées) : masques booléens calculés en une passe vectorisée
+        allowed = np.zeros(len(df), dtype=bool)
+        denied = np.zeros(len(df), dtype=bool)
+        if 'src_ip' in df.columns:
+            values, valid = ipv4_columns(df, 'src_ip')
+            allowed |= self.allow_cidrs.contains(values, valid)
+            denied |= self.deny_cidrs.contains(values, valid)
+        if 'dst_port' in df.columns:
+            ports = df['dst_port'].to_numpy().astype(np.int64) & 0xFFFF
+            allowed |= self.ports['allow'][ports]
+            denied |= self.ports['deny'][ports]
+        return allowed & ~denied, denied
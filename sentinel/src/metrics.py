@@ -0,0 +1,159 @@
+# metrics.py
+# Instrumentation du pipeline IA-Sentinel : durée, lignes en entrée / sortie, anomalies et mémoire par étape
+#
+# Les mesures d'une exécution sont écrites à côté de final_result.csv :
+# - sentinel_metrics.prom : fichier texte Prometheus (collecteur "textfile" de node_exporter), réécrit à chaque exécution
+# - sentinel_metrics.jsonl : une ligne JSON par exécution, pour l'historique ; au-delà de MAX_JSONL_BYTES, le fichier
+#   est renommé en sentinel_metrics.jsonl.1 (remplaçant le précédent) et un nouveau est commencé
+# L'affichage de débogage (aperçus de DataFrame, listes de colonnes) ne se fait que si le mode debug est activé
+# (option --debug ou variable d'environnement SENTINEL_DEBUG=1).
+
+import json
+import os
+import resource
+import time
+
+DEBUG = os.environ.get('SENTINEL_DEBUG', '') not in ('', '0')
+MAX_JSONL_BYTES = 10 * 1024 * 1024
+
+def set_debug(enabled):
+    global DEBUG
+    DEBUG = bool(enabled)
+
+def is_debug():
+    return DEBUG
+
+def debug(*args):
+    # Les objets sont passés tels quels : leur mise en forme n'a lieu que si le mode debug est actif
+    if DEBUG:
+        print(*args)
+
+def default_metrics_paths(output_path):
+    # Les métriques sont rangées à côté des résultats
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    return os.path.join(output_dir, 'sentinel_metrics.prom'), os.path.join(output_dir, 'sentinel_metrics.jsonl')
+
+def current_rss_mb():
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1048576
+    except (OSError, ValueError):
+        # Hors Linux : pic depuis le démarrage du processus
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+class Stage:
+    # Mesure d'une étape ; rows_out, anomalies et skipped sont renseignés par l'appelant dans le bloc "with"
+    def __init__(self, run_metrics, name, rows_in):
+        self.run_metrics = run_metrics
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.anomalies = None
+        # Lignes écartées, par motif (ex. {'allowlist': 120})
+        self.skipped = {}
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.rss_before = current_rss_mb()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.run_metrics.add(self, time.perf_counter() - self.started, current_rss_mb())
+        return False
+
+class RunMetrics:
+    def __init__(self, output_path=None, mode='batch'):
+        self.output_path = output_path
+        self.mode = mode
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        # Étapes dans l'ordre d'exécution ; une étape répétée (mode par blocs) est cumulée
+        self.stages = {}
+
+    def stage(self, name, rows_in=None):
+        return Stage(self, name, rows_in)
+
+    def entry(self, name):
+        return self.stages.setdefault(name, {'calls': 0, 'seconds': 0.0, 'rows_in': None, 'rows_out': None, 'anomalies': None, 'rss_mb': 0.0, 'rss_delta_mb': 0.0})
+
+    def add(self, stage, seconds, rss_mb):
+        entry = self.entry(stage.name)
+        entry['calls'] += 1
+        entry['seconds'] += seconds
+        for key in ['rows_in', 'rows_out', 'anomalies']:
+            value = getattr(stage, key)
+            if value is not None:
+                entry[key] = (entry[key] or 0) + int(value)
+        for reason, count in stage.skipped.items():
+            entry.setdefault('skipped', {})
+            entry['skipped'][reason] = entry['skipped'].get(reason, 0) + int(count)
+        entry['rss_mb'] = max(entry['rss_mb'], rss_mb)
+        entry['rss_delta_mb'] = max(entry['rss_delta_mb'], rss_mb - stage.rss_before)
+
+    def merge(self, stages):
+        # Étapes mesurées dans un autre processus (summary()['stages']) : durées et lignes cumulées, mémoire maximale
+        for name, other in stages.items():
+            entry = self.entry(name)
+            entry['calls'] += other['calls']
+            entry['seconds'] += other['seconds']
+            for key in ['rows_in', 'rows_out', 'anomalies']:
+                if other[key] is not None:
+                    entry[key] = (entry[key] or 0) + other[key]
+            for reason, count in other.get('skipped', {}).items():
+                entry.setdefault('skipped', {})
+                entry['skipped'][reason] = entry['skipped'].get(reason, 0) + count
+            entry['rss_mb'] = max(entry['rss_mb'], other['rss_mb'])
+            entry['rss_delta_mb'] = max(entry['rss_delta_mb'], other['rss_delta_mb'])
+
+    def summary(self):
+        return {
+            'timestamp': self.started_at,
+            'mode': self.mode,
+            'seconds': round(time.perf_counter() - self.started, 4),
+            'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            'stages': {name: {key: round(value, 4) if isinstance(value, float) else dict(value) if isinstance(value, dict) else value for key, value in entry.items()}
+                       for name, entry in self.stages.items()},
+        }
+
+    def prometheus_text(self, summary):
+        lines = []
+        def metric(name, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in samples:
+                lines.append(f"{name}{labels} {value}")
+        stages = summary['stages']
+        def per_stage(key):
+            return [(f'{{stage="{name}"}}', entry[key]) for name, entry in stages.items() if entry[key] is not None]
+        metric('sentinel_last_run_timestamp_seconds', "Début de la dernière exécution (epoch)", [('', summary['timestamp'])])
+        metric('sentinel_run_duration_seconds', "Durée totale de la dernière exécution", [('', summary['seconds'])])
+        metric('sentinel_peak_rss_megabytes', "Pic de mémoire résidente du processus", [('', summary['peak_rss_mb'])])
+        metric('sentinel_stage_duration_seconds', "Durée de chaque étape", per_stage('seconds'))
+        metric('sentinel_stage_rows_in', "Lignes en entrée de chaque étape", per_stage('rows_in'))
+        metric('sentinel_stage_rows_out', "Lignes en sortie de chaque étape", per_stage('rows_out'))
+        metric('sentinel_stage_anomalies', "Anomalies détectées par étape", per_stage('anomalies'))
+        metric('sentinel_stage_rows_skipped', "Lignes écartées de l'étape, par motif",
+               [(f'{{stage="{name}",reason="{reason}"}}', count) for name, entry in stages.items() for reason, count in entry.get('skipped', {}).items()])
+        metric('sentinel_stage_rss_megabytes', "Mémoire résidente en fin d'étape", per_stage('rss_mb'))
+        metric('sentinel_stage_rss_delta_megabytes', "Variation de mémoire résidente pendant l'étape", per_stage('rss_delta_mb'))
+        return '\n'.join(lines) + '\n'
+
+    def write(self, history=True):
+        # history=False : fichier Prometheus seul (scrutation sans nouvelle ligne du démon), sans ligne d'historique
+        if self.output_path is None:
+            return None
+        summary = self.summary()
+        prom_path, jsonl_path = default_metrics_paths(self.output_path)
+        os.makedirs(os.path.dirname(prom_path), exist_ok=True)
+        # Écriture atomique : node_exporter ne doit jamais lire un fichier à moitié écrit
+        tmp_path = prom_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(self.prometheus_text(summary))
+        os.replace(tmp_path, prom_path)
+        if not history:
+            return summary
+        if os.path.exists(jsonl_path) and os.path.getsize(jsonl_path) >= MAX_JSONL_BYTES:
+            os.replace(jsonl_path, jsonl_path + '.1')
+        with open(jsonl_path, 'a') as f:
+            f.write(json.dumps(summary) + '\n')
+        return summary
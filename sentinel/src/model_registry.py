@@ -0,0 +1,85 @@
+# model_registry.py
+# Versions publiées du modèle : un dossier par version, activé par un pointeur remplacé atomiquement
+#
+# data/models/
+#   v0001/ rf_model.joblib, rf_model.forest/, features.txt, model.json (origine, arbres, lots, métriques)
+#   v0002/ ...
+#   current  -> nom de la version active ("v0002"), remplacé par os.replace
+# Une version est écrite entièrement dans un dossier temporaire, renommée, puis le pointeur est basculé :
+# un lecteur (export_results, le démon) voit toujours un modèle et une liste de features cohérents.
+# Les dossiers de version ne sont jamais modifiés après publication ; seules les plus récentes sont gardées.
+
+import datetime
+import json
+import os
+import shutil
+import joblib
+from forest_inference import default_forest_dir, export_forest
+
+KEEP_VERSIONS = 5
+
+def default_registry_dir(data_dir):
+    return os.path.join(data_dir, 'models')
+
+def list_versions(registry_dir):
+    if not os.path.isdir(registry_dir):
+        return []
+    return sorted(name for name in os.listdir(registry_dir) if name.startswith('v') and name[1:].isdigit())
+
+def current_version(registry_dir):
+    try:
+        with open(os.path.join(registry_dir, 'current'), 'r') as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return version if os.path.isdir(os.path.join(registry_dir, version)) else None
+
+def current_model_dir(registry_dir):
+    version = current_version(registry_dir)
+    return os.path.join(registry_dir, version) if version is not None else None
+
+def read_model_info(version_dir):
+    path = os.path.join(version_dir, 'model.json')
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def publish_model(model, feature_names, registry_dir, info, keep=KEEP_VERSIONS, source_path=None):
+    # Écriture d'une nouvelle version puis bascule du pointeur ; retourne le nom de la version.
+    # source_path : modèle déjà sérialisé avec sa forêt compacte, copié au lieu d'être réécrit
+    os.makedirs(registry_dir, exist_ok=True)
+    versions = list_versions(registry_dir)
+    version = f"v{int(versions[-1][1:]) + 1 if versions else 1:04d}"
+    tmp_dir = os.path.join(registry_dir, version + '.tmp')
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    model_path = os.path.join(tmp_dir, 'rf_model.joblib')
+    if source_path is not None:
+        shutil.copyfile(source_path, model_path)
+        shutil.copytree(default_forest_dir(source_path), default_forest_dir(model_path))
+    else:
+        joblib.dump(model, model_path)
+        export_forest(model, default_forest_dir(model_path), model_path)
+    with open(os.path.join(tmp_dir, 'features.txt'), 'w') as f:
+        for feat in feature_names:
+            f.write(feat + '\n')
+    info = dict(info, version=version, created_at=datetime.datetime.now().isoformat(timespec='seconds'),
+                n_trees=len(model.estimators_), feature_names=list(feature_names))
+    with open(os.path.join(tmp_dir, 'model.json'), 'w') as f:
+        json.dump(info, f, indent=2)
+    os.replace(tmp_dir, os.path.join(registry_dir, version))
+    pointer_tmp = os.path.join(registry_dir, 'current.tmp')
+    with open(pointer_tmp, 'w') as f:
+        f.write(version + '\n')
+    os.replace(pointer_tmp, os.path.join(registry_dir, 'current'))
+    print(f"Modèle publié : version {version} ({len(model.estimators_)} arbres)")
+    prune_versions(registry_dir, keep)
+    return version
+
+def prune_versions(registry_dir, keep=KEEP_VERSIONS):
+    # Suppression des versions les plus anciennes (jamais la version active)
+    active = current_version(registry_dir)
+    old = [version for version in list_versions(registry_dir) if version != active]
+    for version in old[:max(0, len(old) - (keep - 1))]:
+        shutil.rmtree(os.path.join(registry_dir, version), ignore_errors=True)
@@ -0,0 +1,230 @@
+# pcap_reader.py
+# Lecture directe des captures pcap / pcapng, sans export CSV par tshark
+#
+# Le fichier est projeté en mémoire (mmap). Seul le parcours des en-têtes d'enregistrement se fait en Python
+# (leur longueur est variable) ; le décodage Ethernet / IPv4 / TCP est ensuite vectorisé avec NumPy, par lots.
+# Le résultat a les colonnes et la représentation typée de la sortie de clean_and_format, avec les mêmes
+# conventions que l'export CSV de tshark : seules les trames IPv4 sont gardées (ip.src / ip.dst renseignés),
+# et les ports ne sont lus que pour TCP (champs tcp.srcport / tcp.dstport), 0 sinon.
+# Le timestamp est directement en int64 (nanosecondes depuis l'epoch, UTC), comme après normalize_timestamps.
+
+import mmap
+import struct
+import numpy as np
+import pandas as pd
+from preprocessing import int_to_ipv4
+
+DEFAULT_BATCH_SIZE = 1000000
+
+# Magic pcap -> (boutisme, facteur vers la nanoseconde de la partie fractionnaire)
+PCAP_MAGICS = {
+    b'\xd4\xc3\xb2\xa1': ('<', 1000),
+    b'\xa1\xb2\xc3\xd4': ('>', 1000),
+    b'\x4d\x3c\xb2\xa1': ('<', 1),
+    b'\xa1\xb2\x3c\x4d': ('>', 1),
+}
+PCAPNG_MAGIC = b'\x0a\x0d\x0d\x0a'
+
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+LINKTYPE_LINUX_SLL2 = 276
+
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_VLAN = (0x8100, 0x88A8)
+
+def is_pcap(path):
+    try:
+        with open(path, 'rb') as f:
+            magic = f.read(4)
+    except OSError:
+        return False
+    return magic in PCAP_MAGICS or magic == PCAPNG_MAGIC
+
+def scan_pcap(buf, arr, batch_size):
+    # Générateur de lots (positions des données, longueurs capturées, timestamps ns, linktypes)
+    endian, frac_to_ns = PCAP_MAGICS[buf[:4]]
+    if len(buf) < 24:
+        return
+    linktype = struct.unpack_from(endian + 'I', buf, 20)[0] & 0xFFFF
+    read_len = struct.Struct(endian + 'I').unpack_from
+    header = np.dtype(endian + 'u4')
+    size = len(buf)
+    pos = 24
+    positions = []
+    # Boucle minimale (une lecture de longueur par enregistrement), le reste de l'en-tête est lu par lots
+    append = positions.append
+    while pos + 16 <= size:
+        next_pos = pos + 16 + read_len(buf, pos + 8)[0]
+        if next_pos > size:
+            # Dernier enregistrement incomplet (capture en cours d'écriture) : ignoré
+            break
+        append(pos)
+        pos = next_pos
+        if len(positions) >= batch_size:
+            yield pcap_batch(arr, positions, header, frac_to_ns, linktype)
+            positions = []
+            append = positions.append
+    if positions:
+        yield pcap_batch(arr, positions, header, frac_to_ns, linktype)
+
+def pcap_batch(arr, positions, header, frac_to_ns, linktype):
+    # Lecture vectorisée des en-têtes d'enregistrement (ts_sec, ts_frac, incl_len, orig_len)
+    positions = np.array(positions, dtype=np.int64)
+    fields = arr[positions[:, None] + np.arange(16)].copy().view(header)
+    ts_ns = fields[:, 0].astype(np.int64) * 1000000000 + fields[:, 1].astype(np.int64) * frac_to_ns
+    linktypes = np.full(len(positions), linktype, dtype=np.int64)
+    return positions + 16, fields[:, 2].astype(np.int64), ts_ns, linktypes
+
+def tsresol_to_ns(options, endian):
+    # Option if_tsresol (code 9) d'un bloc IDB : 10^-n ou 2^-n seconde, microseconde par défaut
+    pos = 0
+    while pos + 4 <= len(options):
+        code, length = struct.unpack_from(endian + 'HH', options, pos)
+        if code == 0:
+            break
+        if code == 9 and length >= 1:
+            resol = options[pos + 4]
+            if resol & 0x80:
+                return 1e9 / (1 << (resol & 0x7F))
+            return 10 ** (9 - resol) if resol <= 9 else 1 / 10 ** (resol - 9)
+        pos += 4 + (length + 3) // 4 * 4
+    return 1000
+
+def scan_pcapng(buf, arr, batch_size):
+    # Blocs gérés : SHB (section), IDB (interface), EPB et SPB (paquets) ; les autres sont ignorés
+    size = len(buf)
+    endian = '<'
+    interfaces = []
+    positions, caplens, timestamps, linktypes = [], [], [], []
+    pos = 0
+    while pos + 12 <= size:
+        block_type = struct.unpack_from(endian + 'I', buf, pos)[0]
+        if block_type == 0x0A0D0D0A:
+            # Nouvelle section : boutisme donné par le magic 0x1A2B3C4D, interfaces remises à zéro
+            endian = '<' if buf[pos + 8:pos + 12] == b'\x4d\x3c\x2b\x1a' else '>'
+            interfaces = []
+        block_len = struct.unpack_from(endian + 'I', buf, pos + 4)[0]
+        if block_len < 12 or pos + block_len > size:
+            break
+        if block_type == 1:
+            linktype = struct.unpack_from(endian + 'H', buf, pos + 8)[0]
+            interfaces.append((linktype, tsresol_to_ns(buf[pos + 16:pos + block_len - 4], endian)))
+        elif block_type == 6:
+            iface, ts_high, ts_low, cap_len = struct.unpack_from(endian + 'IIII', buf, pos + 8)
+            if iface < len(interfaces):
+                linktype, ts_to_ns = interfaces[iface]
+                positions.append(pos + 28)
+                caplens.append(cap_len)
+                timestamps.append(int(((ts_high << 32) | ts_low) * ts_to_ns))
+                linktypes.append(linktype)
+        elif block_type == 3 and interfaces:
+            # Paquet simplifié : pas de timestamp, longueur capturée bornée par la taille du bloc
+            orig_len = struct.unpack_from(endian + 'I', buf, pos + 8)[0]
+            positions.append(pos + 12)
+            caplens.append(min(orig_len, block_len - 16))
+            timestamps.append(0)
+            linktypes.append(interfaces[0][0])
+        pos += block_len
+        if len(positions) == batch_size:
+            yield (np.array(positions, dtype=np.int64), np.array(caplens, dtype=np.int64),
+                   np.array(timestamps, dtype=np.int64), np.array(linktypes, dtype=np.int64))
+            positions, caplens, timestamps, linktypes = [], [], [], []
+    if positions:
+        yield (np.array(positions, dtype=np.int64), np.array(caplens, dtype=np.int64),
+               np.array(timestamps, dtype=np.int64), np.array(linktypes, dtype=np.int64))
+
+def decode_batch(arr, data_pos, caplen, linktypes):
+    # Décodage vectorisé des en-têtes : renvoie le masque IPv4 et les champs utiles
+    last = len(arr) - 1
+    end = data_pos + caplen
+    def u8(pos):
+        return arr[np.clip(pos, 0, last)].astype(np.int64)
+    def u16(pos):
+        return (u8(pos) << 8) | u8(pos + 1)
+    def u32(pos):
+        return (u16(pos) << 16) | u16(pos + 2)
+    # Couche liaison : type de protocole et début de l'en-tête IP
+    ethernet = linktypes == LINKTYPE_ETHERNET
+    sll = linktypes == LINKTYPE_LINUX_SLL
+    sll2 = linktypes == LINKTYPE_LINUX_SLL2
+    raw = (linktypes == LINKTYPE_RAW) | (linktypes == LINKTYPE_IPV4)
+    ethertype = np.select([ethernet, sll, sll2, raw], [u16(data_pos + 12), u16(data_pos + 14), u16(data_pos), ETHERTYPE_IPV4], -1)
+    l3 = np.select([ethernet, sll, sll2], [data_pos + 14, data_pos + 16, data_pos + 20], data_pos)
+    # Étiquettes VLAN (802.1Q / 802.1ad, deux niveaux au plus)
+    for _ in range(2):
+        vlan = ethernet & np.isin(ethertype, ETHERTYPE_VLAN)
+        ethertype = np.where(vlan, u16(l3 + 2), ethertype)
+        l3 = np.where(vlan, l3 + 4, l3)
+    first = u8(l3)
+    ihl = (first & 0x0F) * 4
+    ipv4 = (ethertype == ETHERTYPE_IPV4) & (l3 + 20 <= end) & (first >> 4 == 4) & (ihl >= 20)
+    proto = u8(l3 + 9)
+    l4 = l3 + ihl
+    # Ports : TCP uniquement (comme tcp.srcport / tcp.dstport), premier fragment seulement
+    tcp = ipv4 & (proto == 6) & (u16(l3 + 6) & 0x1FFF == 0) & (l4 + 4 <= end)
+    return {
+        'ipv4': ipv4,
+        'proto': proto,
+        'src': u32(l3 + 12),
+        'dst': u32(l3 + 16),
+        'src_port': np.where(tcp, u16(l4), 0),
+        'dst_port': np.where(tcp, u16(l4 + 2), 0),
+    }
+
+def ip_categorical(values):
+    # Catégorielle construite à partir des entiers : une seule mise en forme texte par IP distincte
+    uniques, codes = np.unique(values, return_inverse=True)
+    return pd.Categorical.from_codes(codes.reshape(-1), [int_to_ipv4(value) for value in uniques])
+
+def build_frame(index, ts_ns, fields):
+    src = fields['src'].astype(np.uint32)
+    dst = fields['dst'].astype(np.uint32)
+    return pd.DataFrame({
+        'timestamp': ts_ns.astype(np.int64),
+        'src_ip': ip_categorical(src),
+        'dst_ip': ip_categorical(dst),
+        'proto': pd.Categorical(fields['proto'].astype(float)),
+        'src_port': fields['src_port'].astype(np.uint16),
+        'dst_port': fields['dst_port'].astype(np.uint16),
+        'src_ip_v4': src,
+        'src_ip_is_v4': np.ones(len(src), dtype=bool),
+        'dst_ip_v4': dst,
+        'dst_ip_is_v4': np.ones(len(dst), dtype=bool),
+    }, index=index)
+
+def iter_pcap_batches(path, batch_size=DEFAULT_BATCH_SIZE):
+    # Générateur de DataFrames (format de sortie de clean_and_format), index = numéro de trame dans la capture,
+    # à partir de 1 comme la colonne No. de tshark / Wireshark (les trames non IPv4 écartées laissent un trou)
+    with open(path, 'rb') as f:
+        if f.seek(0, 2) == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            arr = np.frombuffer(buf, dtype=np.uint8)
+            scan = scan_pcapng if buf[:4] == PCAPNG_MAGIC else scan_pcap
+            batches = scan(buf, arr, batch_size)
+            frame_no = 1
+            try:
+                for data_pos, caplen, ts_ns, linktypes in batches:
+                    fields = decode_batch(arr, data_pos, caplen, linktypes)
+                    keep = fields['ipv4']
+                    index = pd.RangeIndex(frame_no, frame_no + len(keep))[keep]
+                    frame_no += len(keep)
+                    yield build_frame(index, ts_ns[keep], {key: value[keep] for key, value in fields.items()})
+            finally:
+                # Les vues NumPy sur le mmap doivent être libérées avant sa fermeture
+                batches.close()
+                del batches, arr
+
+def read_pcap(path, batch_size=DEFAULT_BATCH_SIZE):
+    batches = list(iter_pcap_batches(path, batch_size))
+    if not batches:
+        return build_frame(pd.RangeIndex(0), np.array([], dtype=np.int64), {key: np.array([], dtype=np.int64) for key in ['proto', 'src', 'dst', 'src_port', 'dst_port']})
+    if len(batches) == 1:
+        return batches[0]
+    df = pd.concat(batches)
+    # pd.concat ne conserve les catégorielles que si les catégories de tous les lots sont identiques
+    for col in ['src_ip', 'dst_ip', 'proto']:
+        df[col] = df[col].astype('category')
+    return df
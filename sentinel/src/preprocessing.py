@@ -5,6 +5,13 @@ import pandas as pd
 import numpy as np
 import socket
 from collections import Counter
+from metrics import debug
+from timestamps import normalize_timestamps
+from windows import WINDOW_FEATURES, WindowState
+
+# Représentation typée construite en fin de clean_and_format : IPv4 en uint32 + masque de validité.
+# Les colonnes texte src_ip / dst_ip sont conservées en catégorielles (adresses MAC, IPv6, "Broadcast"...).
+TYPED_COLUMNS = ['src_ip_v4', 'src_ip_is_v4', 'dst_ip_v4', 'dst_ip_is_v4']
 
 def is_multicast_or_broadcast(ip):
     try:
@@ -26,7 +33,7 @@ def is_multicast_or_broadcast(ip):
         return False
 
 def clean_and_format(df):
-    print(f"Colonnes lues : {list(df.columns)}")
+    debug("Colonnes lues :", list(df.columns))
     # Renommer les colonnes pour uniformiser (Wireshark: Source/Destination)
     df = df.rename(columns={
         'ip.src': 'src_ip',
@@ -40,28 +47,58 @@ def clean_and_format(df):
         'Protocol': 'proto',
         'Time': 'timestamp'
     })
-    print(f"Après renommage colonnes : {len(df)} lignes")
-    print(df.head(10))  # Affichage des 10 premières lignes pour debug
+    debug(f"Après renommage colonnes : {len(df)} lignes")
+    # Timestamp en int64 (nanosecondes depuis l'epoch, UTC), voir timestamps.py
+    if 'timestamp' in df.columns:
+        df['timestamp'] = normalize_timestamps(df['timestamp'])
+    debug(df.head(10))  # Affichage des 10 premières lignes pour debug
     # Vérifier la présence des colonnes avant dropna
     for col in ['src_ip', 'dst_ip']:
         if col not in df.columns:
             df[col] = None
     # Supprimer les lignes incomplètes (au moins src_ip et dst_ip doivent exister)
     df = df.dropna(subset=['src_ip', 'dst_ip'])
-    print(f"Après dropna src_ip/dst_ip : {len(df)} lignes")
+    debug(f"Après dropna src_ip/dst_ip : {len(df)} lignes")
     # Remplacer les ports manquants par 0
     for port_col in ['src_port', 'dst_port']:
         if port_col not in df.columns:
             df[port_col] = 0
         df[port_col] = pd.to_numeric(df[port_col], errors='coerce').fillna(0).astype(int)
+    df = add_typed_columns(df)
     # Désactivation du filtre broadcast/multicast pour voir toutes les IP
-    # if 'src_ip' in df.columns:
-    #     df = df[~df['src_ip'].apply(is_multicast_or_broadcast)]
-    # if 'dst_ip' in df.columns:
-    #     df = df[~df['dst_ip'].apply(is_multicast_or_broadcast)]
-    print(f"Après filtre broadcast/multicast (désactivé) : {len(df)} lignes")
+    # df = df[~multicast_or_broadcast_mask(df, 'src_ip') & ~multicast_or_broadcast_mask(df, 'dst_ip')]
+    debug(f"Après filtre broadcast/multicast (désactivé) : {len(df)} lignes")
+    return df
+
+def add_typed_columns(df):
+    # IP en catégorielles + vue uint32, ports en uint16, protocole en catégorie
+    for col in ['src_ip', 'dst_ip']:
+        df[col] = df[col].astype('category')
+        values, valid = ipv4_to_uint32(df[col])
+        df[f'{col}_v4'] = values
+        df[f'{col}_is_v4'] = valid
+    for port_col in ['src_port', 'dst_port']:
+        df[port_col] = df[port_col].clip(0, 65535).astype(np.uint16)
+    if 'proto' in df.columns:
+        df['proto'] = df['proto'].astype('category')
     return df
 
+def ipv4_columns(df, col):
+    # (valeurs uint32, masque IPv4) : colonnes typées si présentes, sinon conversion de la colonne texte
+    if f'{col}_v4' in df.columns:
+        return df[f'{col}_v4'].to_numpy(), df[f'{col}_is_v4'].to_numpy()
+    return ipv4_to_uint32(df[col])
+
+def in_ipv4_network(values, valid, network, prefix_len):
+    # Test de préfixe CIDR sur les entiers : (ip & masque) == réseau
+    mask = (0xFFFFFFFF << (32 - prefix_len)) & 0xFFFFFFFF
+    return valid & ((values & np.uint32(mask)) == np.uint32(ipv4_to_int(network) & mask))
+
+def multicast_or_broadcast_mask(df, col):
+    # Équivalent vectorisé de is_multicast_or_broadcast : multicast 224.0.0.0/4 et au-delà, IP manquante
+    values, valid = ipv4_columns(df, col)
+    return (valid & (values >= np.uint32(224 << 24))) | df[col].isna().to_numpy()
+
 def load_dataset(normal_path, malicious_path):
     normal = pd.read_csv(normal_path)
     # Pour malicious.csv, label = 1 pour toutes les lignes
@@ -71,6 +108,10 @@ def load_dataset(normal_path, malicious_path):
     normal = clean_and_format(normal)
     normal['label'] = 0
     data = pd.concat([normal, malicious], ignore_index=True)
+    # pd.concat ne conserve les catégorielles que si les catégories des deux fichiers sont identiques
+    for col in ['src_ip', 'dst_ip', 'proto']:
+        if col in data.columns:
+            data[col] = data[col].astype('category')
     return data
 
 def entropy(ip):
@@ -81,9 +122,54 @@ def entropy(ip):
 def ip_entropy(ip_series):
     if ip_series is None or len(ip_series) == 0:
         return 0
-    return ip_series.astype(str).apply(lambda ip: 0 if pd.isna(ip) else entropy(ip))
+    # Entropie calculée une seule fois par IP distincte puis reportée sur chaque ligne
+    if isinstance(ip_series.dtype, pd.CategoricalDtype):
+        # Catégorielle : une entropie par catégorie, reportée via les codes (code -1 = valeur manquante, "nan")
+        entropies = np.array([entropy(ip) for ip in ip_series.cat.categories.astype(str)] + [entropy('nan')])
+        return pd.Series(entropies[ip_series.cat.codes.to_numpy()], index=ip_series.index)
+    ips = ip_series.astype(str)
+    uniques = pd.unique(ips)
+    entropies = pd.Series([0 if pd.isna(ip) else entropy(ip) for ip in uniques], index=uniques, dtype=float)
+    return ips.map(entropies)
 
-def extract_features(df):
+def is_rare_key(df, cols):
+    # 1 si la combinaison de colonnes n'apparaît qu'une fois (équivalent à groupby(cols).size() < 2)
+    # Les clés contenant une valeur manquante sont ignorées par groupby, donc toujours rares
+    rare = ~df.duplicated(subset=cols, keep=False)
+    return (rare | df[cols].isna().any(axis=1)).astype(int)
+
+def ipv4_to_int(ip):
+    # Conversion d'une IPv4 texte en entier 32 bits, None si l'adresse n'est pas une IPv4
+    parts = str(ip).split('.')
+    if len(parts) != 4 or not all(part.isdigit() and int(part) < 256 for part in parts):
+        return None
+    return int.from_bytes(socket.inet_aton(str(ip)), 'big')
+
+def int_to_ipv4(value):
+    # Conversion inverse : entier 32 bits -> IPv4 texte
+    return socket.inet_ntoa(int(value).to_bytes(4, 'big'))
+
+def ipv4_to_uint32(ip_series):
+    # Conversion vectorisée (une fois par IP distincte) : (valeurs uint32, masque de validité IPv4)
+    if isinstance(ip_series.dtype, pd.CategoricalDtype):
+        converted = [ipv4_to_int(ip) for ip in ip_series.cat.categories]
+        valid_categories = np.array([ip is not None for ip in converted] + [False])
+        values_categories = np.array([ip or 0 for ip in converted] + [0], dtype=np.uint32)
+        codes = ip_series.cat.codes.to_numpy()
+        return values_categories[codes], valid_categories[codes]
+    ips = ip_series.astype(str).fillna('')
+    uniques = pd.unique(ips)
+    converted = pd.Series([ipv4_to_int(ip) for ip in uniques], index=uniques, dtype=object)
+    values = ips.map(converted)
+    valid = values.notna().to_numpy()
+    return values.fillna(0).to_numpy(dtype=np.uint32), valid
+
+def is_10_74(ip_series):
+    # IPv4 dans 10.74.0.0/16
+    values, valid = ipv4_to_uint32(ip_series)
+    return pd.Series(in_ipv4_network(values, valid, '10.74.0.0', 16), index=ip_series.index)
+
+def extract_features(df, seen_store=None, window_state=None):
     # Entropie sur les IP
     if 'src_ip' in df.columns:
         df['src_ip_entropy'] = ip_entropy(df['src_ip'])
@@ -93,7 +179,8 @@ def extract_features(df):
         df['dst_ip_entropy'] = ip_entropy(df['dst_ip'])
     else:
         df['dst_ip_entropy'] = 0
-    # Variabilité des ports sur la fenêtre (ici, par ligne)
+    # Valeur du port de la ligne (conservée pour les modèles déjà entraînés) ; les agrégats
+    # sur fenêtre temporelle sont calculés plus bas (windows.py)
     if 'src_port' in df.columns:
         df['src_port_var'] = df['src_port']
     else:
@@ -106,78 +193,59 @@ def extract_features(df):
     if 'src_ip' in df.columns and 'dst_ip' in df.columns and 'dst_port' in df.columns:
         mask_port80 = df['dst_port'] == 80
         # Pour chaque dst_ip sur le port 80, compter le nombre d'IP source distinctes
-        src_ip_count_by_dst = df[mask_port80].groupby('dst_ip')['src_ip'].nunique()
+        src_ip_count_by_dst = df[mask_port80].groupby('dst_ip', observed=True)['src_ip'].nunique()
         # Seuil : si une dst_ip reçoit sur le port 80 des paquets de plus de 5 IP source différentes, c'est suspect
         seuil = 5
         dst_ip_suspectes = src_ip_count_by_dst[src_ip_count_by_dst > seuil].index
         # Nouvelle feature binaire : 1 si la ligne est un envoi vers une dst_ip suspecte sur le port 80
-        df['is_ip_aleatoire_80'] = df.apply(
-            lambda row: 1 if row['dst_port'] == 80 and row['dst_ip'] in dst_ip_suspectes else 0, axis=1)
+        df['is_ip_aleatoire_80'] = (mask_port80 & df['dst_ip'].isin(dst_ip_suspectes)).astype(int)
         # Feature globale (pour compatibilité) : ratio d'IP source uniques sur le port 80
-        unique_src_ip_80 = df[mask_port80]['src_ip'].nunique()
+        unique_src_ip_80 = df.loc[mask_port80, 'src_ip'].nunique()
         total_80 = mask_port80.sum()
-        ratio_ip_aleatoire_80 = unique_src_ip_80 / total_80 if total_80 > 0 else 0
-        df['ip_aleatoire_80'] = ratio_ip_aleatoire_80
+        df['ip_aleatoire_80'] = unique_src_ip_80 / total_80 if total_80 > 0 else 0
     else:
         df['ip_aleatoire_80'] = 0
         df['is_ip_aleatoire_80'] = 0
     # Détection d'attaque par IP source aléatoire sur tous les ports (IP source rare pour chaque couple dst_ip/dst_port)
     if 'src_ip' in df.columns and 'dst_ip' in df.columns and 'dst_port' in df.columns:
-        # Compter le nombre d'occurrences de chaque (src_ip, dst_ip, dst_port)
-        src_dst_port_counts = df.groupby(['src_ip', 'dst_ip', 'dst_port']).size()
-        # Pour chaque ligne, vérifier si src_ip est rare pour ce couple (dst_ip, dst_port)
-        def is_rare(row):
-            count = src_dst_port_counts.get((row['src_ip'], row['dst_ip'], row['dst_port']), 0)
-            return 1 if count < 2 else 0
-        df['is_ip_aleatoire_port'] = df.apply(is_rare, axis=1)
-        # Pour compatibilité, on garde la feature globale sur le port 80
-        mask_port80 = df['dst_port'] == 80
-        unique_src_ip_80 = df[mask_port80]['src_ip'].nunique()
-        total_80 = mask_port80.sum()
-        ratio_ip_aleatoire_80 = unique_src_ip_80 / total_80 if total_80 > 0 else 0
-        df['ip_aleatoire_80'] = ratio_ip_aleatoire_80
+        df['is_ip_aleatoire_port'] = is_rare_key(df, ['src_ip', 'dst_ip', 'dst_port'])
     else:
         df['ip_aleatoire_80'] = 0
         df['is_ip_aleatoire_port'] = 0
     # Détection d'IP source qui n'envoie qu'un seul paquet (tous ports et destinations confondus)
     if 'src_ip' in df.columns:
-        src_ip_counts = df['src_ip'].value_counts()
-        unique_src_ips = src_ip_counts[src_ip_counts == 1].index
-        df['is_ip_source_unique'] = df['src_ip'].apply(lambda ip: 1 if ip in unique_src_ips else 0)
+        df['is_ip_source_unique'] = (~df['src_ip'].duplicated(keep=False) & df['src_ip'].notna()).astype(int)
     else:
         df['is_ip_source_unique'] = 0
     # Détection d'IP source rare sur chaque port (tous dst_ip confondus)
     if 'src_ip' in df.columns and 'dst_port' in df.columns:
-        src_ip_port_counts = df.groupby(['src_ip', 'dst_port']).size()
-        def is_rare_on_port(row):
-            count = src_ip_port_counts.get((row['src_ip'], row['dst_port']), 0)
-            return 1 if count < 2 else 0
-        df['is_ip_source_rare_on_port'] = df.apply(is_rare_on_port, axis=1)
+        df['is_ip_source_rare_on_port'] = is_rare_key(df, ['src_ip', 'dst_port'])
     else:
         df['is_ip_source_rare_on_port'] = 0
     # Détection d'une nouvelle IP source jamais vue auparavant sur un port donné (pour dst_ip dans 10.74.0.0/16)
     if 'src_ip' in df.columns and 'dst_ip' in df.columns and 'dst_port' in df.columns:
         # On ne considère que les lignes où dst_ip est dans 10.74.0.0/16
-        def is_10_74(ip):
-            try:
-                parts = str(ip).split('.')
-                return len(parts) == 4 and parts[0] == '10' and parts[1] == '74'
-            except:
-                return False
-        mask_10_74 = df['dst_ip'].apply(is_10_74)
+        mask_10_74 = pd.Series(in_ipv4_network(*ipv4_columns(df, 'dst_ip'), '10.74.0.0', 16), index=df.index)
         # Pour chaque port, on marque comme suspecte la première apparition d'une src_ip
-        seen = set()
-        def is_new_src(row):
-            key = (row['src_ip'], row['dst_port'])
-            if not mask_10_74.loc[row.name]:
-                return 0
-            if key in seen:
-                return 0
-            seen.add(key)
-            return 1
-        df['is_new_src_ip_on_port_10_74'] = df.apply(is_new_src, axis=1)
+        first_seen = ~df[mask_10_74].duplicated(subset=['src_ip', 'dst_port'], keep='first').to_numpy()
+        if seen_store is not None:
+            # Mémoire persistante entre les exécutions (voir seen_store.py)
+            first_seen &= seen_store.check_and_add(df.loc[mask_10_74, 'src_ip'], df.loc[mask_10_74, 'dst_port'])
+        is_new = np.zeros(len(df), dtype=int)
+        is_new[mask_10_74.to_numpy()] = first_seen
+        df['is_new_src_ip_on_port_10_74'] = is_new
     else:
         df['is_new_src_ip_on_port_10_74'] = 0
+    # Agrégats sur fenêtre glissante en temps d'événement : débit et ports distincts par IP source,
+    # IP source distinctes par couple (dst_ip, dst_port). Sans état fourni, la fenêtre démarre avec ce lot.
+    if all(col in df.columns for col in ['timestamp', 'src_ip', 'dst_ip', 'dst_port']):
+        if window_state is None:
+            window_state = WindowState()
+        for name, values in window_state.update(df).items():
+            df[name] = values
+    else:
+        for name in WINDOW_FEATURES:
+            df[name] = 0
     # Ajoutez d'autres features selon besoin
     return df
 
@@ -0,0 +1,166 @@
+# result_store.py
+# Stockage des résultats en ajout seul (append-only), découpé par jour, avec index des lignes déjà exportées
+#
+# final_result.csv         -> lien symbolique vers la partition du jour (vue CSV pour Grafana)
+# final_result-AAAA-MM-JJ.csv  -> lignes exportées ce jour-là, dans l'ordre d'arrivée
+# .index/final_result-AAAA-MM-JJ.u64 -> hachés 64 bits des derniers exports de la partition (ajout seul, non triés)
+# .index/final_result-AAAA-MM-JJ.sorted.u64 -> hachés triés et uniques, fusionnés depuis le précédent
+#
+# Le dédoublonnage ne porte que sur les DEDUP_DAYS derniers jours : le coût d'un export
+# dépend du volume récent et non de tout l'historique. L'index trié est projeté en mémoire et
+# interrogé par dichotomie (np.searchsorted) : seules les pages visitées sont lues. Le journal
+# non trié est borné à INDEX_DELTA_MAX hachés, au-delà il est fusionné dans l'index trié.
+
+import csv
+import datetime
+import os
+import numpy as np
+import pandas as pd
+
+DEDUP_DAYS = 2
+INDEX_DELTA_MAX = 1 << 18
+
+def partition_path(output_path, day):
+    base, ext = os.path.splitext(output_path)
+    return f"{base}-{day}{ext or '.csv'}"
+
+def index_path(output_path, day):
+    directory, name = os.path.split(os.path.abspath(output_path))
+    base = os.path.splitext(name)[0]
+    return os.path.join(directory, '.index', f"{base}-{day}.u64")
+
+def text_column(col):
+    # Représentation texte d'une colonne. Pour les colonnes catégorielles ou numériques, la conversion
+    # n'est faite qu'une fois par valeur distincte ; le haché obtenu est identique à celui du texte ligne à ligne.
+    if isinstance(col.dtype, pd.CategoricalDtype) or pd.api.types.is_numeric_dtype(col.dtype):
+        codes, uniques = pd.factorize(col)
+        labels = pd.Index(uniques).astype(str).append(pd.Index(['']))
+        if labels.is_unique:
+            return pd.Categorical.from_codes(np.where(codes < 0, len(labels) - 1, codes), labels)
+    return col.fillna('').astype(str)
+
+def row_hashes(df, id_cols):
+    # Comparaison sur la représentation texte, comme l'ancien dédoublonnage par merge
+    text = pd.DataFrame({col: text_column(df[col]) for col in id_cols})
+    return pd.util.hash_pandas_object(text, index=False).to_numpy(dtype=np.uint64)
+
+def fill_missing(df):
+    # fillna('') sans convertir les colonnes catégorielles en objets ('' ajouté aux catégories si besoin)
+    df = df.copy()
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype) and df[col].isna().any():
+            if '' not in df[col].cat.categories:
+                df[col] = df[col].cat.add_categories([''])
+            df[col] = df[col].fillna('')
+        elif not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].fillna('')
+    return df
+
+def append_index(output_path, day, hashes):
+    path = index_path(output_path, day)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'ab') as f:
+        f.write(np.ascontiguousarray(hashes, dtype=np.uint64).tobytes())
+
+def sorted_index_path(output_path, day):
+    return index_path(output_path, day)[:-len('.u64')] + '.sorted.u64'
+
+def load_sorted_index(path):
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return np.array([], dtype=np.uint64)
+    return np.memmap(path, dtype=np.uint64, mode='r')
+
+def sorted_contains(keys, hashes):
+    if len(keys) == 0:
+        return np.zeros(len(hashes), dtype=bool)
+    pos = np.minimum(np.searchsorted(keys, hashes), len(keys) - 1)
+    return np.asarray(keys[pos]) == hashes
+
+def compact_index(output_path, day):
+    # Fusion du journal non trié dans l'index trié (écriture atomique), puis suppression du journal.
+    # Un arrêt entre les deux laisse des hachés dans les deux fichiers, sans conséquence.
+    delta_path = index_path(output_path, day)
+    sorted_path = sorted_index_path(output_path, day)
+    delta = np.unique(np.fromfile(delta_path, dtype=np.uint64))
+    keys = np.fromfile(sorted_path, dtype=np.uint64) if os.path.exists(sorted_path) else np.array([], dtype=np.uint64)
+    delta = delta[~sorted_contains(keys, delta)]
+    tmp_path = sorted_path + '.tmp'
+    np.insert(keys, np.searchsorted(keys, delta), delta).tofile(tmp_path)
+    os.replace(tmp_path, sorted_path)
+    os.remove(delta_path)
+
+def in_recent_index(output_path, today, hashes, dedup_days=DEDUP_DAYS):
+    # Masque des hachés déjà exportés sur les dedup_days derniers jours
+    found = np.zeros(len(hashes), dtype=bool)
+    for delta in range(dedup_days):
+        day = (today - datetime.timedelta(days=delta)).isoformat()
+        delta_path = index_path(output_path, day)
+        if os.path.exists(delta_path) and os.path.getsize(delta_path) > INDEX_DELTA_MAX * 8:
+            compact_index(output_path, day)
+        found |= sorted_contains(load_sorted_index(sorted_index_path(output_path, day)), hashes)
+        if os.path.exists(delta_path):
+            found |= np.isin(hashes, np.fromfile(delta_path, dtype=np.uint64))
+    return found
+
+def read_header(path):
+    with open(path, 'r', newline='') as f:
+        return next(csv.reader(f), [])
+
+def update_view(output_path, partition):
+    # Remplacement atomique du lien symbolique final_result.csv -> partition du jour
+    tmp_link = output_path + '.tmp'
+    if os.path.lexists(tmp_link):
+        os.remove(tmp_link)
+    os.symlink(os.path.basename(partition), tmp_link)
+    os.replace(tmp_link, output_path)
+
+def migrate_legacy(output_path, today):
+    # Ancien format : final_result.csv réécrit entièrement à chaque exécution.
+    # Il est renommé et ses lignes sont indexées pour continuer à dédoublonner.
+    if not os.path.isfile(output_path) or os.path.islink(output_path):
+        return
+    base, ext = os.path.splitext(output_path)
+    legacy_path = f"{base}-legacy{ext or '.csv'}"
+    try:
+        legacy = pd.read_csv(output_path, dtype=str, keep_default_na=False)
+    except Exception as e:
+        print(f"Erreur de lecture du fichier existant : {e}. Il est conservé sans indexation.")
+        legacy = None
+    if legacy is not None and not legacy.empty:
+        id_cols = [col for col in legacy.columns if col != 'export_timestamp']
+        append_index(output_path, today.isoformat(), row_hashes(legacy, id_cols))
+    os.replace(output_path, legacy_path)
+    print(f"Ancien fichier de résultats conservé sous {legacy_path}")
+
+def append_results(df, output_path, dedup_days=DEDUP_DAYS, today=None):
+    # Ajoute les lignes jamais exportées à la partition du jour, retourne le nombre de lignes ajoutées
+    today = today or datetime.date.today()
+    day = today.isoformat()
+    migrate_legacy(output_path, today)
+    partition = partition_path(output_path, day)
+    df = fill_missing(df)
+    if os.path.exists(partition) and os.path.getsize(partition) > 0:
+        header = read_header(partition)
+        dropped = [col for col in df.columns if col not in header]
+        if dropped:
+            print(f"Colonnes absentes de {partition}, ignorées : {dropped}")
+        for col in header:
+            if col not in df.columns:
+                df[col] = ''
+        df = df[header]
+        write_header = False
+    else:
+        write_header = True
+    id_cols = [col for col in df.columns if col != 'export_timestamp']
+    if not id_cols:
+        print('Aucune colonne commune pour identifier les doublons, export annulé.')
+        return 0
+    hashes = row_hashes(df, id_cols)
+    is_new = ~in_recent_index(output_path, today, hashes, dedup_days)
+    new_rows = df[is_new]
+    if not new_rows.empty or write_header:
+        # CSV d'abord, index ensuite : un arrêt entre les deux donne au pire un doublon, jamais une perte
+        new_rows.to_csv(partition, mode='a', header=write_header, index=False)
+        append_index(output_path, day, np.unique(hashes[is_new]))
+    update_view(output_path, partition)
+    return len(new_rows)
@@ -0,0 +1,116 @@
+# seen_store.py
+# Mémoire persistante des couples (src_ip, dst_port) déjà vus, pour is_new_src_ip_on_port_10_74
+#
+# Chaque couple est codé sur un entier 64 bits :
+#  - IPv4 : (ip sur 32 bits << 16) | port, soit une clé exacte sur 48 bits
+#  - autre adresse (MAC, "Broadcast"...) : haché 64 bits avec le bit de poids fort à 1
+# Les clés sont conservées triées avec la date de dernière vue (12 octets par couple),
+# ce qui permet des recherches vectorisées par searchsorted.
+# La mémoire est bornée par un TTL et par un nombre maximum de couples (les plus anciens sont évincés).
+
+import os
+import time
+import numpy as np
+import pandas as pd
+from preprocessing import ipv4_to_uint32
+
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 5000000
+HASH_FLAG = np.uint64(1 << 63)
+
+def default_seen_path(output_path):
+    return os.path.join(os.path.dirname(os.path.abspath(output_path)), 'seen_src_port.npz')
+
+def pack_keys(src_ips, ports):
+    src_ips = pd.Series(src_ips).reset_index(drop=True)
+    ports = pd.to_numeric(pd.Series(ports).reset_index(drop=True), errors='coerce').fillna(0).to_numpy(dtype=np.uint64) & np.uint64(0xFFFF)
+    ip_values, valid = ipv4_to_uint32(src_ips)
+    keys = (ip_values.astype(np.uint64) << np.uint64(16)) | ports
+    if not valid.all():
+        others = pd.DataFrame({'src_ip': src_ips[~valid].astype(str).to_numpy(), 'dst_port': ports[~valid]})
+        keys[~valid] = pd.util.hash_pandas_object(others, index=False).to_numpy(dtype=np.uint64) | HASH_FLAG
+    return keys
+
+class SeenStore:
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.keys = np.array([], dtype=np.uint64)
+        self.last_seen = np.array([], dtype=np.uint32)
+
+    @classmethod
+    def load(cls, path, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        store = cls(ttl, max_entries)
+        if os.path.exists(path):
+            try:
+                with np.load(path) as data:
+                    store.keys = data['keys']
+                    store.last_seen = data['last_seen']
+            except (OSError, ValueError, KeyError) as e:
+                print(f"État des sources vues illisible ({e}), on repart de zéro.")
+        store.evict()
+        return store
+
+    def save(self, path):
+        # Écriture atomique : fichier temporaire puis renommage
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, keys=self.keys, last_seen=self.last_seen)
+        os.replace(tmp_path, path)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def contains(self, keys):
+        if len(self.keys) == 0:
+            return np.zeros(len(keys), dtype=bool)
+        pos = np.searchsorted(self.keys, keys)
+        pos_clipped = np.minimum(pos, len(self.keys) - 1)
+        return self.keys[pos_clipped] == keys
+
+    def add(self, keys, now=None):
+        now = np.uint32(now if now is not None else time.time())
+        keys = np.unique(keys)
+        found = self.contains(keys)
+        # Rafraîchir la date des couples connus, insérer les nouveaux en conservant l'ordre
+        self.last_seen[np.searchsorted(self.keys, keys[found])] = now
+        new_keys = keys[~found]
+        pos = np.searchsorted(self.keys, new_keys)
+        self.keys = np.insert(self.keys, pos, new_keys)
+        self.last_seen = np.insert(self.last_seen, pos, np.full(len(new_keys), now, dtype=np.uint32))
+        self.evict(now)
+
+    def check_and_add(self, src_ips, ports, now=None):
+        # Retourne True pour les couples jamais vus (avant cet appel), puis les mémorise
+        keys = pack_keys(src_ips, ports)
+        is_new = ~self.contains(keys)
+        self.add(keys, now)
+        return is_new
+
+    def evict(self, now=None):
+        now = now if now is not None else time.time()
+        keep = self.last_seen.astype(np.int64) >= int(now) - self.ttl
+        if not keep.all():
+            self.keys = self.keys[keep]
+            self.last_seen = self.last_seen[keep]
+        if len(self.keys) > self.max_entries:
+            # Garder les couples vus le plus récemment
+            recent = np.argpartition(self.last_seen, len(self.keys) - self.max_entries)[len(self.keys) - self.max_entries:]
+            recent.sort()
+            self.keys = self.keys[recent]
+            self.last_seen = self.last_seen[recent]
+
+class SeenSnapshot:
+    # Vue en lecture seule d'un SeenStore pour le traitement parallèle de plusieurs fichiers : chaque fichier est
+    # comparé à la mémoire telle qu'au lancement, les couples vus sont collectés puis ajoutés par le processus parent
+    def __init__(self, store):
+        self.store = store
+        self.seen = []
+
+    def check_and_add(self, src_ips, ports, now=None):
+        keys = pack_keys(src_ips, ports)
+        self.seen.append(keys)
+        return ~self.store.contains(keys)
+
+    def keys(self):
+        return np.concatenate(self.seen) if self.seen else np.array([], dtype=np.uint64)
@@ -0,0 +1,163 @@
+# sentinel_daemon.py
+# Démon IA-Sentinel : modèle chargé une seule fois, analyse continue des nouvelles lignes de capture
+
+import argparse
+import os
+import signal
+import threading
+import time
+from export_results import export_all_logs, export_anomalies, load_model, model_paths, predict_with_model
+from incremental import default_checkpoint_path, load_checkpoint, read_logs_after, save_checkpoint
+from seen_store import DEFAULT_TTL, SeenStore, default_seen_path
+from windows import WindowState, default_window_path
+from forest_inference import default_forest_dir
+from metrics import RunMetrics, set_debug
+from ip_lists import IpLists, default_ip_lists_path
+
+# Intervalle minimal entre deux sauvegardes de l'état (checkpoint, sources vues, fenêtres), en secondes
+DEFAULT_SAVE_INTERVAL = 60.0
+
+def file_signature(path):
+    # Identité d'un fichier : un changement d'inode, de taille ou de date signale une nouvelle version
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+class SentinelDaemon:
+    def __init__(self, input_path, output_path, checkpoint_path=None, seen_path=None, seen_ttl=DEFAULT_TTL, interval=5.0, ip_lists_path=None, window_path=None, save_interval=DEFAULT_SAVE_INTERVAL, evaluator='sklearn'):
+        self.input_path = input_path
+        self.output_path = output_path
+        self.checkpoint_path = checkpoint_path or default_checkpoint_path(output_path)
+        self.seen_path = seen_path or default_seen_path(output_path)
+        self.window_path = window_path or default_window_path(output_path)
+        self.interval = interval
+        self.save_interval = save_interval
+        # scikit-learn par défaut : l'import n'est payé qu'au démarrage, la prédiction est plus rapide
+        self.evaluator = evaluator
+        self.ip_lists_path = ip_lists_path or default_ip_lists_path()
+        self.ip_lists = None
+        self.ip_lists_signature = None
+        self.reload_ip_lists_if_changed()
+        self.stop_event = threading.Event()
+        self.seen_store = SeenStore.load(self.seen_path, ttl=seen_ttl)
+        self.window_state = WindowState.load(self.window_path)
+        # Checkpoint tenu en mémoire : il n'est écrit qu'avec la mémoire des sources vues et les fenêtres
+        self.checkpoint = load_checkpoint(self.checkpoint_path)
+        self.state_dirty = False
+        self.last_save = time.monotonic()
+        self.model_bundle = None
+        self.model_signature = None
+        self.reload_model_if_changed()
+        if self.model_bundle is None:
+            raise RuntimeError("Impossible de charger le modèle au démarrage du démon.")
+
+    def current_model_signature(self):
+        features_path, model_path = model_paths()
+        forest_meta = os.path.join(default_forest_dir(model_path), 'meta.json')
+        return tuple(file_signature(path) for path in (features_path, model_path, forest_meta))
+
+    def reload_model_if_changed(self):
+        signature = self.current_model_signature()
+        if signature == self.model_signature:
+            return
+        try:
+            model, feature_names = load_model(None, self.evaluator)
+        except Exception as e:
+            # Fichier en cours d'écriture ou absent : on garde l'ancien modèle et on réessaiera
+            print(f"Rechargement du modèle impossible ({e}), modèle précédent conservé.")
+            return
+        # Remplacement atomique : le modèle et sa liste de features changent ensemble
+        self.model_bundle = (model, feature_names)
+        self.model_signature = signature
+        print(f"Modèle chargé ({len(feature_names)} features).")
+
+    def reload_ip_lists_if_changed(self):
+        signature = file_signature(self.ip_lists_path)
+        if self.ip_lists is not None and signature == self.ip_lists_signature:
+            return
+        self.ip_lists = IpLists.load(self.ip_lists_path)
+        self.ip_lists_signature = signature
+        print(f"Listes d'autorisation / de blocage chargées ({self.ip_lists_path}).")
+
+    def save_state(self):
+        # Checkpoint, sources vues et fenêtres sont écrits ensemble : après un arrêt brutal, la reprise relit les lignes
+        # depuis le dernier checkpoint sauvegardé avec l'état correspondant, et l'index des résultats écarte les doublons
+        if self.state_dirty:
+            self.seen_store.save(self.seen_path)
+            self.window_state.save(self.window_path)
+            save_checkpoint(self.checkpoint_path, self.checkpoint)
+            self.state_dirty = False
+        self.last_save = time.monotonic()
+
+    def save_state_if_due(self):
+        if time.monotonic() - self.last_save >= self.save_interval:
+            self.save_state()
+
+    def process_new_logs(self):
+        metrics = RunMetrics(self.output_path, 'daemon')
+        with metrics.stage('lecture') as stage:
+            df_new, new_state = read_logs_after(self.input_path, self.checkpoint)
+            stage.rows_out = len(df_new)
+        if df_new.empty:
+            if new_state is not None and new_state != self.checkpoint:
+                self.checkpoint = new_state
+                self.state_dirty = True
+            self.save_state_if_due()
+            # Fichier Prometheus rafraîchi même sans nouvelle ligne : un pipeline calme n'a pas l'air arrêté
+            metrics.write(history=False)
+            return 0
+        model, feature_names = self.model_bundle
+        df_pred = predict_with_model(df_new, model, feature_names, self.seen_store, metrics, self.ip_lists, self.window_state)
+        export_all_logs(df_pred, self.output_path, metrics)
+        export_anomalies(df_pred, self.output_path, metrics)
+        # Le checkpoint n'avance qu'une fois l'export réussi ; l'état n'est écrit sur disque que toutes les save_interval secondes
+        self.checkpoint = new_state
+        self.state_dirty = True
+        self.save_state_if_due()
+        metrics.write()
+        nb_anomalies = int((df_pred['anomalie'] == 1).sum()) if 'anomalie' in df_pred.columns else 0
+        print(f"{len(df_pred)} lignes analysées, {nb_anomalies} anomalies détectées.")
+        return len(df_pred)
+
+    def stop(self, signum=None, frame=None):
+        print(f"Signal {signum} reçu, arrêt du démon après le lot en cours.")
+        self.stop_event.set()
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        print(f"Démon IA-Sentinel démarré : surveillance de {self.input_path} toutes les {self.interval} s.")
+        while not self.stop_event.is_set():
+            started = time.monotonic()
+            try:
+                self.reload_model_if_changed()
+                self.reload_ip_lists_if_changed()
+                if os.path.exists(self.input_path):
+                    self.process_new_logs()
+            except Exception as e:
+                print(f"Erreur lors du traitement : {e}")
+            # Attente interruptible par SIGTERM
+            self.stop_event.wait(max(0.0, self.interval - (time.monotonic() - started)))
+        self.save_state()
+        print('Démon IA-Sentinel arrêté.')
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Démon de détection d'anomalies IA-Sentinel.")
+    parser.add_argument('--input', type=str, default='/var/log/wireshark/logs/capture.csv', help='Chemin du fichier de log à surveiller')
+    parser.add_argument('--output', type=str, default='/var/log/wireshark/result-script/final_result.csv', help='Chemin du fichier de sortie avec résultats')
+    parser.add_argument('--interval', type=float, default=5.0, help='Intervalle de scrutation du fichier de capture (secondes)')
+    parser.add_argument('--save-interval', type=float, default=DEFAULT_SAVE_INTERVAL, help='Intervalle minimal entre deux sauvegardes de l\'état (secondes)')
+    parser.add_argument('--evaluator', choices=['sklearn', 'compact'], default='sklearn', help='Évaluation de la forêt : sklearn ou compact (NumPy seul, plus lent par ligne)')
+    parser.add_argument('--checkpoint', type=str, default=None, help='Chemin du checkpoint d\'offset')
+    parser.add_argument('--seen-state', type=str, default=None, help='Chemin de la mémoire des couples (src_ip, dst_port) déjà vus')
+    parser.add_argument('--seen-ttl', type=int, default=DEFAULT_TTL, help='Durée de rétention (secondes) des couples déjà vus')
+    parser.add_argument('--window-state', type=str, default=None, help='Chemin de l\'état des fenêtres glissantes')
+    parser.add_argument('--ip-lists', type=str, default=None, help='Fichier des listes d\'autorisation / de blocage (CIDR et ports)')
+    parser.add_argument('--debug', action='store_true', help='Afficher les aperçus de débogage (colonnes, premières lignes...)')
+    args = parser.parse_args()
+    if args.debug:
+        set_debug(True)
+    daemon = SentinelDaemon(args.input, args.output, args.checkpoint, args.seen_state, args.seen_ttl, args.interval, args.ip_lists, args.window_state, args.save_interval, args.evaluator)
+    daemon.run()
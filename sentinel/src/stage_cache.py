@@ -0,0 +1,76 @@
+# stage_cache.py
+# Cache des étapes d'auto_main, indexé par le contenu des entrées (hachés SHA-256)
+#
+# Chaque étape a une clé calculée à partir des hachés de ses entrées, du code qui la produit et de ses
+# paramètres. Si la clé n'a pas changé et que les fichiers produits sont intacts, l'étape est ignorée.
+# Ce module n'importe ni pandas ni scikit-learn, pour qu'un ré-entraînement sans changement soit immédiat.
+
+import ast
+import hashlib
+import json
+import os
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def local_module_files(base_dir, module):
+    # Fichiers du module et de tous les modules de base_dir qu'il importe, directement ou non (analyse
+    # des instructions import, sans exécuter le code : pas d'import de pandas ni de scikit-learn ici)
+    files = []
+    pending = [module]
+    while pending:
+        path = os.path.join(base_dir, pending.pop() + '.py')
+        if path in files or not os.path.exists(path):
+            continue
+        files.append(path)
+        with open(path, 'r', encoding='utf-8') as f:
+            tree = ast.parse(f.read(), filename=path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                pending.extend(alias.name.split('.')[0] for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                pending.append(node.module.split('.')[0])
+    return sorted(files)
+
+def code_hashes(base_dir, module):
+    return {os.path.basename(path): file_sha256(path) for path in local_module_files(base_dir, module)}
+
+def stage_key(*parts):
+    # Clé d'étape : haché d'une sérialisation stable de toutes ses dépendances
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+def output_signature(path):
+    # Taille et date de modification : suffisant pour détecter un fichier produit remplacé ou supprimé
+    if not os.path.exists(path):
+        return None
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+class StageCache:
+    def __init__(self, manifest_path):
+        self.manifest_path = manifest_path
+        self.manifest = {}
+        if os.path.exists(manifest_path):
+            try:
+                with open(manifest_path, 'r') as f:
+                    self.manifest = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Cache des étapes illisible ({e}), toutes les étapes seront relancées.")
+
+    def is_fresh(self, stage, key, outputs):
+        entry = self.manifest.get(stage)
+        if entry is None or entry.get('key') != key:
+            return False
+        return all(output_signature(path) is not None and output_signature(path) == entry['outputs'].get(path) for path in outputs)
+
+    def record(self, stage, key, outputs):
+        self.manifest[stage] = {'key': key, 'outputs': {path: output_signature(path) for path in outputs}}
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
@@ -0,0 +1,180 @@
+# streaming.py
+# Pipeline par blocs (chunks) à mémoire bornée pour les très grosses captures
+#
+# Passe 1 : lecture des blocs et accumulation des agrégats globaux (comptages, IP sur le port 80)
+# Passe 2 : relecture des blocs et calcul des features à partir des agrégats finalisés
+# Les clés (IP, couples IP/port...) sont stockées sous forme de hachés 64 bits pour limiter la mémoire,
+# et les comptages sont plafonnés à 2 puisque seules les clés vues une seule fois nous intéressent.
+# Mémoire de la passe 1 : 9 octets par clé distincte et par table (17 avec une valeur), jusqu'à trois fois plus
+# pendant une fusion (voir KeyTable), plus un bloc ; elle ne dépend pas du nombre de lignes du fichier.
+
+import numpy as np
+import pandas as pd
+from preprocessing import clean_and_format, in_ipv4_network, ip_entropy, ipv4_columns
+from pcap_reader import is_pcap, iter_pcap_batches
+from windows import WINDOW_FEATURES, WindowState
+
+DEFAULT_CHUNKSIZE = 100000
+
+def hash_keys(df, cols):
+    return pd.util.hash_pandas_object(df[cols], index=False).to_numpy()
+
+# Taille minimale de l'attente d'une KeyTable avant fusion (nombre de hachés)
+COMPACT_MIN_KEYS = 1 << 20
+
+class KeyTable:
+    # Table triée de clés hachées, avec un comptage plafonné à 2 et, en option, une valeur par clé (celle de sa
+    # première occurrence). Les hachés de chaque bloc sont mis en attente et fusionnés en une fois (np.unique)
+    # quand l'attente atteint la taille de la table : le coût d'un bloc ne dépend plus de la taille de l'état
+    # (O(log n) amorti par ligne), et l'attente ne dépasse pas la taille de la table (ou COMPACT_MIN_KEYS) plus un bloc.
+    def __init__(self, with_values=False):
+        self.keys = np.array([], dtype=np.uint64)
+        self.counts = np.array([], dtype=np.uint8)
+        self.values = np.array([], dtype=np.uint64) if with_values else None
+        self.pending_keys = []
+        self.pending_values = []
+        self.pending_size = 0
+
+    def add(self, keys, values=None):
+        self.pending_keys.append(keys)
+        if self.values is not None:
+            self.pending_values.append(values)
+        self.pending_size += len(keys)
+        if self.pending_size >= max(COMPACT_MIN_KEYS, len(self.keys)):
+            self.compact()
+
+    def compact(self):
+        if not self.pending_keys:
+            return
+        keys, first, inverse = np.unique(np.concatenate([self.keys] + self.pending_keys), return_index=True, return_inverse=True)
+        weights = np.concatenate([self.counts, np.ones(self.pending_size, dtype=np.uint8)])
+        self.counts = np.minimum(np.bincount(inverse, weights=weights, minlength=len(keys)), 2).astype(np.uint8)
+        if self.values is not None:
+            # La table compactée précède l'attente, elle-même dans l'ordre des blocs : return_index donne la première occurrence
+            self.values = np.concatenate([self.values] + self.pending_values)[first]
+        self.keys = keys
+        self.pending_keys, self.pending_values, self.pending_size = [], [], 0
+
+    def positions(self, keys):
+        # Indices des clés dans la table et présence (à appeler après compact)
+        pos = np.minimum(np.searchsorted(self.keys, keys), max(len(self.keys) - 1, 0))
+        found = (self.keys[pos] == keys) if len(self.keys) else np.zeros(len(keys), dtype=bool)
+        return pos, found
+
+    def lookup_counts(self, keys):
+        pos, found = self.positions(keys)
+        return np.where(found, self.counts[pos] if len(self.keys) else 0, 0)
+
+def lookup_rare(table, df, cols):
+    # 1 si la clé n'a été vue qu'une fois sur l'ensemble du fichier (équivalent à is_rare_key)
+    missing = df[cols].isna().any(axis=1).to_numpy()
+    found = table.lookup_counts(hash_keys(df, cols))
+    return ((found < 2) | missing).astype(int)
+
+class StreamState:
+    def __init__(self):
+        self.src_counts = KeyTable()
+        self.src_port_counts = KeyTable()
+        self.src_dst_port_counts = KeyTable()
+        self.src_80 = KeyTable()
+        # Couples (src_ip, dst_ip) distincts sur le port 80, avec le haché de dst_ip en valeur
+        self.pairs_80 = KeyTable(with_values=True)
+        self.total_80 = 0
+        # Couples (src_ip, dst_port) vers 10.74.0.0/16, avec en valeur la position de leur première ligne
+        self.first_10_74 = KeyTable(with_values=True)
+        self.rows = 0
+        self.position = 0
+        self.dst_suspectes = None
+        self.ratio_80 = 0
+
+    def update(self, df):
+        # Passe 1 : accumulation des agrégats d'un bloc nettoyé
+        valid_src = df[df['src_ip'].notna()]
+        self.src_counts.add(hash_keys(valid_src, ['src_ip']))
+        valid = df[df[['src_ip', 'dst_port']].notna().all(axis=1)]
+        self.src_port_counts.add(hash_keys(valid, ['src_ip', 'dst_port']))
+        valid = df[df[['src_ip', 'dst_ip', 'dst_port']].notna().all(axis=1)]
+        self.src_dst_port_counts.add(hash_keys(valid, ['src_ip', 'dst_ip', 'dst_port']))
+        port80 = df[df['dst_port'] == 80]
+        self.total_80 += len(port80)
+        port80 = port80[port80['src_ip'].notna() & port80['dst_ip'].notna()]
+        self.src_80.add(hash_keys(port80, ['src_ip']))
+        self.pairs_80.add(hash_keys(port80, ['src_ip', 'dst_ip']), hash_keys(port80, ['dst_ip']))
+        mask_10_74 = in_ipv4_network(*ipv4_columns(df, 'dst_ip'), '10.74.0.0', 16)
+        rows = np.flatnonzero(mask_10_74).astype(np.uint64) + np.uint64(self.rows)
+        self.first_10_74.add(hash_keys(df[mask_10_74], ['src_ip', 'dst_port']), rows)
+        self.rows += len(df)
+
+    def finalize(self):
+        for table in (self.src_counts, self.src_port_counts, self.src_dst_port_counts, self.src_80, self.pairs_80, self.first_10_74):
+            table.compact()
+        # Seuil identique à extract_features : plus de 5 IP source distinctes vers une dst_ip sur le port 80
+        seuil = 5
+        dst, src_ip_count_by_dst = np.unique(self.pairs_80.values, return_counts=True)
+        self.dst_suspectes = dst[src_ip_count_by_dst > seuil]
+        self.ratio_80 = len(self.src_80.keys) / self.total_80 if self.total_80 > 0 else 0
+        self.pairs_80 = None
+        self.src_80 = None
+
+def extract_features_streaming(df, state, window_state, seen_store=None):
+    # Même jeu de colonnes, dans le même ordre, que preprocessing.extract_features
+    df['src_ip_entropy'] = ip_entropy(df['src_ip'])
+    df['dst_ip_entropy'] = ip_entropy(df['dst_ip'])
+    # Valeur du port de la ligne, comme dans extract_features (agrégats temporels : voir plus bas)
+    df['src_port_var'] = df['src_port']
+    df['dst_port_var'] = df['dst_port']
+    mask_port80 = (df['dst_port'] == 80).to_numpy()
+    df['is_ip_aleatoire_80'] = (mask_port80 & np.isin(hash_keys(df, ['dst_ip']), state.dst_suspectes)).astype(int)
+    df['ip_aleatoire_80'] = state.ratio_80
+    df['is_ip_aleatoire_port'] = lookup_rare(state.src_dst_port_counts, df, ['src_ip', 'dst_ip', 'dst_port'])
+    df['is_ip_source_unique'] = (lookup_rare(state.src_counts, df, ['src_ip']) & df['src_ip'].notna().to_numpy()).astype(int)
+    df['is_ip_source_rare_on_port'] = lookup_rare(state.src_port_counts, df, ['src_ip', 'dst_port'])
+    # Première apparition d'un couple (src_ip, dst_port) vers 10.74.0.0/16, en tenant compte des blocs précédents
+    mask_10_74 = in_ipv4_network(*ipv4_columns(df, 'dst_ip'), '10.74.0.0', 16)
+    # (la ligne est la première de sa clé si sa position est celle retenue en passe 1)
+    pos, found = state.first_10_74.positions(hash_keys(df[mask_10_74], ['src_ip', 'dst_port']))
+    rows = np.flatnonzero(mask_10_74).astype(np.uint64) + np.uint64(state.position)
+    first_seen = found & (state.first_10_74.values[pos] == rows) if len(rows) else np.zeros(0, dtype=bool)
+    state.position += len(df)
+    if seen_store is not None:
+        first_seen &= seen_store.check_and_add(df.loc[mask_10_74, 'src_ip'], df.loc[mask_10_74, 'dst_port'])
+    is_new = np.zeros(len(df), dtype=int)
+    is_new[mask_10_74] = first_seen
+    df['is_new_src_ip_on_port_10_74'] = is_new
+    # Fenêtres glissantes : l'état passe d'un bloc au suivant, les valeurs ne dépendent pas du découpage
+    if 'timestamp' in df.columns:
+        for name, values in window_state.update(df).items():
+            df[name] = values
+    else:
+        for name in WINDOW_FEATURES:
+            df[name] = 0
+    return df
+
+def iter_clean_chunks(sources, chunksize=DEFAULT_CHUNKSIZE):
+    # sources : liste de (chemin, label) ; label à None pour des logs non étiquetés
+    for path, label in sources:
+        # Les captures pcap / pcapng sont décodées directement, déjà au format de sortie de clean_and_format
+        chunks = iter_pcap_batches(path, chunksize) if is_pcap(path) else (clean_and_format(chunk) for chunk in pd.read_csv(path, chunksize=chunksize))
+        for chunk in chunks:
+            if label is not None:
+                chunk['label'] = label
+            yield chunk
+
+def collect_state(sources, chunksize=DEFAULT_CHUNKSIZE):
+    state = StreamState()
+    for chunk in iter_clean_chunks(sources, chunksize):
+        state.update(chunk)
+    state.finalize()
+    return state
+
+def stream_features(sources, chunksize=DEFAULT_CHUNKSIZE, seen_store=None, window_state=None):
+    # Générateur de blocs avec features, identiques à extract_features sur la concaténation des sources
+    state = collect_state(sources, chunksize)
+    if window_state is None:
+        window_state = WindowState()
+    for chunk in iter_clean_chunks(sources, chunksize):
+        yield extract_features_streaming(chunk, state, window_state, seen_store)
+
+def stream_preprocess(normal_path, malicious_path, chunksize=DEFAULT_CHUNKSIZE):
+    # Équivalent par blocs de preprocessing.preprocess
+    return stream_features([(normal_path, 0), (malicious_path, 1)], chunksize)
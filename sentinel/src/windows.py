@@ -0,0 +1,188 @@
+# windows.py
+# Agrégats sur fenêtre glissante en temps d'événement (timestamp des paquets), par compteurs à seaux
+#
+# Features calculées pour chaque ligne, sur les WINDOW_SECONDS secondes qui précèdent son timestamp (ligne comprise) :
+# - src_rate_window : paquets par seconde émis par l'IP source
+# - src_distinct_dst_ports_window : ports de destination distincts contactés par l'IP source (scan de ports)
+# - dst_distinct_src_window : IP source distinctes vers le couple (dst_ip, dst_port) (flood depuis des sources aléatoires)
+#
+# Le temps est découpé en seaux de BUCKET_SECONDS ; la fenêtre couvre les WINDOW_SECONDS / BUCKET_SECONDS derniers seaux.
+# Chaque table conserve des lignes (groupe, membre, seau, nombre de paquets) pour les seaux encore dans la fenêtre :
+# - par IP source, membre = port de destination
+# - par couple (dst_ip, dst_port), membre = IP source
+# Un lot est traité en une passe vectorisée : chaque ligne (état ou lot) "couvre" les lignes suivantes de son groupe
+# jusqu'à la sortie de son seau de la fenêtre (comptage de paquets) ou jusqu'à la prochaine occurrence du même membre
+# (comptage de membres distincts) ; les valeurs s'obtiennent par sommes cumulées de débuts et de fins de couverture.
+# Après chaque lot, les seaux sortis de la fenêtre sont évincés : la mémoire dépend du trafic récent, pas de l'historique.
+# Coût d'un lot : seules les lignes de l'état dont le groupe apparaît dans le lot sont triées avec lui ; le reste de
+# l'état n'est que parcouru (sélection par table de hachage, éviction), en temps linéaire sans tri.
+
+import os
+import numpy as np
+import pandas as pd
+from timestamps import MISSING, NS_PER_S
+
+WINDOW_SECONDS = 60
+BUCKET_SECONDS = 1
+DEFAULT_MAX_ENTRIES = 2000000
+WINDOW_FEATURES = ['src_rate_window', 'src_distinct_dst_ports_window', 'dst_distinct_src_window']
+# Mélange du port dans le haché de dst_ip (clé du couple (dst_ip, dst_port))
+PORT_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+def default_window_path(output_path):
+    return os.path.join(os.path.dirname(os.path.abspath(output_path)), 'window_state.npz')
+
+def hash_column(col):
+    # Haché 64 bits par valeur (calculé une fois par catégorie pour une colonne catégorielle)
+    return pd.util.hash_pandas_object(col, index=False).to_numpy(dtype=np.uint64)
+
+def event_buckets(timestamps, bucket_ns, fallback):
+    # Seau de chaque ligne ; un timestamp manquant prend le seau de la ligne valide précédente (ou de la première)
+    ts = np.asarray(timestamps, dtype=np.int64)
+    valid = ts != MISSING
+    buckets = np.where(valid, ts, 0) // bucket_ns
+    if not valid.all():
+        if not valid.any():
+            return np.full(len(ts), fallback, dtype=np.int64)
+        last_valid = np.maximum.accumulate(np.where(valid, np.arange(len(ts)), -1))
+        buckets = buckets[np.where(last_valid >= 0, last_valid, np.argmax(valid))]
+    return buckets
+
+def window_aggregate(groups, members, buckets, weights, n_buckets):
+    # Pour chaque ligne : paquets du groupe et membres distincts du groupe dans les n_buckets seaux se terminant
+    # à son seau, en ne comptant que les lignes qui la précèdent (ordre du seau, puis ordre d'arrivée).
+    # Retourne aussi les lignes agrégées par (groupe, membre, seau), pour l'état à conserver.
+    m = len(groups)
+    group_codes = pd.factorize(groups)[0].astype(np.int64)
+    unique_buckets = np.unique(buckets)
+    span = len(unique_buckets) + 1
+    key = group_codes * span + np.searchsorted(unique_buckets, buckets)
+    order = np.argsort(key, kind='stable')
+    key = key[order]
+    sorted_buckets = buckets[order]
+    sorted_weights = weights[order]
+    # Fin de couverture : première ligne du groupe dont le seau est au-delà de la fenêtre de la ligne
+    end = np.searchsorted(key, group_codes[order] * span + np.searchsorted(unique_buckets, sorted_buckets + n_buckets))
+    # Membres distincts : une occurrence couvre jusqu'à l'occurrence suivante du même (groupe, membre)
+    member_codes, member_uniques = pd.factorize(members)
+    pair = group_codes[order] * max(len(member_uniques), 1) + member_codes[order]
+    by_pair = np.argsort(pair, kind='stable')
+    same_pair = pair[by_pair[1:]] == pair[by_pair[:-1]]
+    next_pos = np.full(m, m, dtype=np.int64)
+    next_pos[by_pair[:-1][same_pair]] = by_pair[1:][same_pair]
+    stop = np.minimum(end, next_pos)
+    totals = np.empty(m, dtype=np.int64)
+    totals[order] = np.cumsum(sorted_weights) - np.cumsum(np.bincount(end, sorted_weights, minlength=m + 1)[:m]).astype(np.int64)
+    distinct = np.empty(m, dtype=np.int64)
+    distinct[order] = np.arange(1, m + 1) - np.cumsum(np.bincount(stop, minlength=m + 1)[:m])
+    # Agrégation par (groupe, membre, seau) : lignes consécutives dans l'ordre par couple
+    pair_buckets = sorted_buckets[by_pair]
+    run_start = np.ones(m, dtype=bool)
+    run_start[1:] = ~same_pair | (pair_buckets[1:] != pair_buckets[:-1])
+    starts = np.flatnonzero(run_start)
+    rows = order[by_pair[starts]]
+    counts = np.add.reduceat(sorted_weights[by_pair], starts) if m else sorted_weights
+    return totals, distinct, (groups[rows], members[rows], buckets[rows], counts)
+
+class WindowTable:
+    # Lignes (groupe, membre, seau, nombre de paquets) des seaux encore dans la fenêtre
+    def __init__(self):
+        self.groups = np.array([], dtype=np.uint64)
+        self.members = np.array([], dtype=np.uint64)
+        self.buckets = np.array([], dtype=np.int64)
+        self.counts = np.array([], dtype=np.int64)
+
+    def __len__(self):
+        return len(self.groups)
+
+    def update(self, groups, members, buckets, n_buckets, horizon, max_entries):
+        # Les lignes de l'état précèdent celles du lot ; retourne (paquets, membres distincts) pour les lignes du lot
+        # Seuls les groupes présents dans le lot sont agrégés, les autres lignes de l'état sont reprises telles quelles
+        touched = pd.Series(self.groups).isin(pd.unique(groups)).to_numpy()
+        n_state = int(touched.sum())
+        totals, distinct, rows = window_aggregate(
+            np.concatenate([self.groups[touched], groups]),
+            np.concatenate([self.members[touched], members]),
+            np.concatenate([self.buckets[touched], buckets]),
+            np.concatenate([self.counts[touched], np.ones(len(groups), dtype=np.int64)]),
+            n_buckets)
+        # Éviction des seaux sortis de la fenêtre, puis plafond en gardant les seaux les plus récents
+        untouched = ~touched & (self.buckets >= horizon)
+        keep = rows[2] >= horizon
+        self.groups, self.members, self.buckets, self.counts = (
+            np.concatenate([state[untouched], values[keep]])
+            for state, values in zip((self.groups, self.members, self.buckets, self.counts), rows))
+        if len(self.groups) > max_entries:
+            recent = np.argpartition(self.buckets, len(self.groups) - max_entries)[len(self.groups) - max_entries:]
+            recent.sort()
+            self.groups, self.members, self.buckets, self.counts = (values[recent] for values in (self.groups, self.members, self.buckets, self.counts))
+        return totals[n_state:], distinct[n_state:]
+
+class WindowState:
+    def __init__(self, window_seconds=WINDOW_SECONDS, bucket_seconds=BUCKET_SECONDS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.window_seconds = window_seconds
+        self.bucket_ns = int(bucket_seconds * NS_PER_S)
+        self.n_buckets = max(1, int(round(window_seconds / bucket_seconds)))
+        self.max_entries = max_entries
+        self.reset()
+
+    def reset(self):
+        # Dernier seau vu (temps d'événement), None tant qu'aucune ligne n'a été traitée
+        self.watermark = None
+        self.by_src = WindowTable()
+        self.by_dst = WindowTable()
+
+    @classmethod
+    def load(cls, path, window_seconds=WINDOW_SECONDS, bucket_seconds=BUCKET_SECONDS, max_entries=DEFAULT_MAX_ENTRIES):
+        state = cls(window_seconds, bucket_seconds, max_entries)
+        if os.path.exists(path):
+            try:
+                with np.load(path) as data:
+                    if int(data['bucket_ns']) == state.bucket_ns and int(data['n_buckets']) == state.n_buckets:
+                        state.watermark = int(data['watermark'])
+                        for name, table in (('src', state.by_src), ('dst', state.by_dst)):
+                            for field in ('groups', 'members', 'buckets', 'counts'):
+                                setattr(table, field, data[f'{name}_{field}'])
+            except (OSError, ValueError, KeyError) as e:
+                print(f"État des fenêtres illisible ({e}), on repart de zéro.")
+                state.reset()
+        return state
+
+    def save(self, path):
+        # Écriture atomique : fichier temporaire puis renommage
+        if self.watermark is None:
+            return
+        arrays = {'bucket_ns': self.bucket_ns, 'n_buckets': self.n_buckets, 'watermark': self.watermark}
+        for name, table in (('src', self.by_src), ('dst', self.by_dst)):
+            for field in ('groups', 'members', 'buckets', 'counts'):
+                arrays[f'{name}_{field}'] = getattr(table, field)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+
+    def __len__(self):
+        return len(self.by_src) + len(self.by_dst)
+
+    def update(self, df):
+        # Features de fenêtre des lignes du lot (dans leur ordre), puis mise à jour de l'état
+        if len(df) == 0:
+            return {name: np.zeros(0) for name in WINDOW_FEATURES}
+        buckets = event_buckets(df['timestamp'], self.bucket_ns, self.watermark if self.watermark is not None else 0)
+        latest = int(buckets.max())
+        if self.watermark is not None and latest < self.watermark - self.n_buckets + 1:
+            # Lot entièrement antérieur à la fenêtre en mémoire : nouvelle capture ou horloge remise à zéro
+            print("Timestamps antérieurs à la fenêtre en mémoire, agrégats de fenêtre remis à zéro.")
+            self.reset()
+        self.watermark = latest if self.watermark is None else max(self.watermark, latest)
+        horizon = self.watermark - self.n_buckets + 1
+        src = hash_column(df['src_ip'])
+        ports = df['dst_port'].to_numpy().astype(np.uint64)
+        dst = hash_column(df['dst_ip']) ^ (ports * PORT_MIX)
+        packets, distinct_ports = self.by_src.update(src, ports, buckets, self.n_buckets, horizon, self.max_entries)
+        _, distinct_src = self.by_dst.update(dst, src, buckets, self.n_buckets, horizon, self.max_entries)
+        return {
+            'src_rate_window': packets / self.window_seconds,
+            'src_distinct_dst_ports_window': distinct_ports,
+            'dst_distinct_src_window': distinct_src,
+        }
@@ -0,0 +1,10 @@
+# conftest.py
+# Les modules de sentinel/src s'importent entre eux par leur nom : ajout du dossier au chemin d'import
+
+import os
+import sys
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data'))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
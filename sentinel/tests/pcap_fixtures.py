@@ -0,0 +1,99 @@
+# pcap_fixtures.py
+# Génération de petites captures pcap / pcapng pour les tests de pcap_reader.py
+#
+# Les trames sont construites octet par octet (struct) : aucune dépendance à tshark ou scapy.
+# Les builders de couche renvoient des bytes qui s'emboîtent : ethernet(ipv4(tcp(...))).
+
+import socket
+import struct
+
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_IPV6 = 0x86DD
+ETHERTYPE_ARP = 0x0806
+
+def ip_bytes(address):
+    return socket.inet_aton(address)
+
+def tcp(src_port, dst_port):
+    # En-tête TCP minimal (20 octets, drapeau SYN)
+    return struct.pack('>HHIIBBHHH', src_port, dst_port, 0, 0, 5 << 4, 0x02, 65535, 0, 0)
+
+def udp(src_port, dst_port, payload=b''):
+    return struct.pack('>HHHH', src_port, dst_port, 8 + len(payload), 0) + payload
+
+def ipv4(src, dst, proto, payload, options=b'', fragment_offset=0):
+    # options : multiple de 4 octets, porté par l'IHL
+    ihl = 5 + len(options) // 4
+    header = struct.pack('>BBHHHBBH4s4s', 0x40 | ihl, 0, ihl * 4 + len(payload), 0, fragment_offset, 64, proto, 0,
+                         ip_bytes(src), ip_bytes(dst))
+    return header + options + payload
+
+def ipv4_tcp(src, dst, src_port, dst_port, options=b''):
+    return ipv4(src, dst, 6, tcp(src_port, dst_port), options)
+
+def ipv6_stub():
+    # En-tête IPv6 (40 octets) sans charge utile : la trame doit être écartée
+    return struct.pack('>IHBB', 6 << 28, 0, 59, 64) + bytes(16) + bytes(16)
+
+def arp_stub():
+    return struct.pack('>HHBBH', 1, ETHERTYPE_IPV4, 6, 4, 1) + bytes(20)
+
+def ethernet(payload, ethertype=ETHERTYPE_IPV4, vlans=()):
+    # vlans : liste de (TPID, VID), de l'extérieur vers l'intérieur (ex. QinQ : [(0x88A8, 100), (0x8100, 200)])
+    header = b'\x00\x11\x22\x33\x44\x55' + b'\x66\x77\x88\x99\xaa\xbb'
+    for tpid, vid in vlans:
+        header += struct.pack('>HH', tpid, vid)
+    return header + struct.pack('>H', ethertype) + payload
+
+def linux_sll(payload, ethertype=ETHERTYPE_IPV4):
+    # Linux cooked v1 : 16 octets, protocole en fin d'en-tête
+    return struct.pack('>HHH8sH', 0, 1, 6, bytes(8), ethertype) + payload
+
+def linux_sll2(payload, ethertype=ETHERTYPE_IPV4):
+    # Linux cooked v2 : 20 octets, protocole en tête
+    return struct.pack('>HHIHBB8s', ethertype, 0, 1, 1, 0, 6, bytes(8)) + payload
+
+def pcap_bytes(packets, linktype=1, endian='<', nanos=False, snaplen=65535):
+    # packets : liste de (timestamp en ns, trame) ; partie fractionnaire en µs ou en ns selon le magic
+    magic = 0xA1B23C4D if nanos else 0xA1B2C3D4
+    out = [struct.pack(endian + 'IHHiIII', magic, 2, 4, 0, 0, snaplen, linktype)]
+    for ts_ns, frame in packets:
+        seconds, frac = divmod(ts_ns, 1000000000)
+        if not nanos:
+            frac //= 1000
+        out.append(struct.pack(endian + 'IIII', seconds, frac, len(frame), len(frame)) + frame)
+    return b''.join(out)
+
+def pcapng_block(block_type, body, endian='<'):
+    body += bytes(-len(body) % 4)
+    length = 12 + len(body)
+    return struct.pack(endian + 'II', block_type, length) + body + struct.pack(endian + 'I', length)
+
+def pcapng_options(options, endian):
+    # options : liste de (code, valeur bytes), terminée par opt_endofopt
+    if not options:
+        return b''
+    encoded = b''
+    for code, value in options:
+        encoded += struct.pack(endian + 'HH', code, len(value)) + value + bytes(-len(value) % 4)
+    return encoded + struct.pack(endian + 'HH', 0, 0)
+
+def pcapng_bytes(interfaces, packets, endian='<'):
+    # interfaces : liste de (linktype, if_tsresol ou None) ; packets : liste de (interface, timestamp en unités, trame)
+    # Un paquet dont l'interface vaut None est écrit en bloc simplifié (SPB, sans timestamp)
+    out = [pcapng_block(0x0A0D0D0A, struct.pack(endian + 'IHHq', 0x1A2B3C4D, 1, 0, -1), endian)]
+    for linktype, tsresol in interfaces:
+        options = [(9, bytes([tsresol]))] if tsresol is not None else []
+        out.append(pcapng_block(1, struct.pack(endian + 'HHI', linktype, 0, 65535) + pcapng_options(options, endian), endian))
+    for iface, ts_units, frame in packets:
+        if iface is None:
+            out.append(pcapng_block(3, struct.pack(endian + 'I', len(frame)) + frame, endian))
+        else:
+            body = struct.pack(endian + 'IIIII', iface, ts_units >> 32, ts_units & 0xFFFFFFFF, len(frame), len(frame)) + frame
+            out.append(pcapng_block(6, body, endian))
+    return b''.join(out)
+
+def write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+    return str(path)
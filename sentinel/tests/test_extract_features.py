@@ -0,0 +1,129 @@
+# test_extract_features.py
+# Équivalence entre extract_features (vectorisé) et l'implémentation ligne à ligne d'origine
+
+import os
+from collections import Counter
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+from conftest import DATA_DIR
+from preprocessing import clean_and_format, extract_features, load_dataset
+
+FEATURES = ['src_ip_entropy', 'dst_ip_entropy', 'src_port_var', 'dst_port_var', 'is_ip_aleatoire_80',
+            'ip_aleatoire_80', 'is_ip_aleatoire_port', 'is_ip_source_unique', 'is_ip_source_rare_on_port',
+            'is_new_src_ip_on_port_10_74']
+
+# --- Implémentation de référence (preprocessing.py avant vectorisation), sans les affichages ---
+
+def reference_clean_and_format(df):
+    df = df.rename(columns={
+        'ip.src': 'src_ip', 'ip.dst': 'dst_ip', 'tcp.srcport': 'src_port', 'tcp.dstport': 'dst_port',
+        'ip.proto': 'proto', 'frame.time': 'timestamp', 'Source': 'src_ip', 'Destination': 'dst_ip',
+        'Protocol': 'proto', 'Time': 'timestamp'})
+    for col in ['src_ip', 'dst_ip']:
+        if col not in df.columns:
+            df[col] = None
+    df = df.dropna(subset=['src_ip', 'dst_ip'])
+    for port_col in ['src_port', 'dst_port']:
+        if port_col not in df.columns:
+            df[port_col] = 0
+        df[port_col] = pd.to_numeric(df[port_col], errors='coerce').fillna(0).astype(int)
+    return df
+
+def reference_entropy(ip):
+    counts = Counter(ip)
+    probs = [c / len(ip) for c in counts.values()]
+    return -sum(p * np.log2(p) for p in probs)
+
+def reference_extract_features(df):
+    df['src_ip_entropy'] = df['src_ip'].astype(str).apply(lambda ip: 0 if pd.isna(ip) else reference_entropy(ip))
+    df['dst_ip_entropy'] = df['dst_ip'].astype(str).apply(lambda ip: 0 if pd.isna(ip) else reference_entropy(ip))
+    df['src_port_var'] = df['src_port']
+    df['dst_port_var'] = df['dst_port']
+    mask_port80 = df['dst_port'] == 80
+    src_ip_count_by_dst = df[mask_port80].groupby('dst_ip')['src_ip'].nunique()
+    dst_ip_suspectes = src_ip_count_by_dst[src_ip_count_by_dst > 5].index
+    df['is_ip_aleatoire_80'] = df.apply(
+        lambda row: 1 if row['dst_port'] == 80 and row['dst_ip'] in dst_ip_suspectes else 0, axis=1)
+    total_80 = mask_port80.sum()
+    df['ip_aleatoire_80'] = df[mask_port80]['src_ip'].nunique() / total_80 if total_80 > 0 else 0
+    src_dst_port_counts = df.groupby(['src_ip', 'dst_ip', 'dst_port']).size()
+    df['is_ip_aleatoire_port'] = df.apply(
+        lambda row: 1 if src_dst_port_counts.get((row['src_ip'], row['dst_ip'], row['dst_port']), 0) < 2 else 0, axis=1)
+    src_ip_counts = df['src_ip'].value_counts()
+    unique_src_ips = src_ip_counts[src_ip_counts == 1].index
+    df['is_ip_source_unique'] = df['src_ip'].apply(lambda ip: 1 if ip in unique_src_ips else 0)
+    src_ip_port_counts = df.groupby(['src_ip', 'dst_port']).size()
+    df['is_ip_source_rare_on_port'] = df.apply(
+        lambda row: 1 if src_ip_port_counts.get((row['src_ip'], row['dst_port']), 0) < 2 else 0, axis=1)
+    def is_10_74(ip):
+        parts = str(ip).split('.')
+        return len(parts) == 4 and parts[0] == '10' and parts[1] == '74'
+    mask_10_74 = df['dst_ip'].apply(is_10_74)
+    seen = set()
+    def is_new_src(row):
+        key = (row['src_ip'], row['dst_port'])
+        if not mask_10_74.loc[row.name] or key in seen:
+            return 0
+        seen.add(key)
+        return 1
+    df['is_new_src_ip_on_port_10_74'] = df.apply(is_new_src, axis=1)
+    return df
+
+def reference_load_dataset(normal_path, malicious_path):
+    malicious = reference_clean_and_format(pd.read_csv(malicious_path))
+    malicious['label'] = 1
+    normal = reference_clean_and_format(pd.read_csv(normal_path))
+    normal['label'] = 0
+    return pd.concat([normal, malicious], ignore_index=True)
+
+def assert_same_features(actual, expected):
+    # Mêmes valeurs, ligne à ligne ; les types diffèrent (ports en uint16 après clean_and_format)
+    assert_frame_equal(actual[FEATURES].reset_index(drop=True), expected[FEATURES].reset_index(drop=True), check_dtype=False)
+
+# --- Tests ---
+
+@pytest.mark.skipif(not os.path.exists(os.path.join(DATA_DIR, 'malicious.csv')), reason='jeux de données absents')
+def test_bundled_datasets():
+    normal_path = os.path.join(DATA_DIR, 'normal.csv')
+    malicious_path = os.path.join(DATA_DIR, 'malicious.csv')
+    expected = reference_extract_features(reference_load_dataset(normal_path, malicious_path))
+    actual = extract_features(load_dataset(normal_path, malicious_path))
+    assert len(actual) == len(expected) > 0
+    assert_same_features(actual, expected)
+
+def edge_case_frame():
+    # Ports manquants, clés dupliquées, flood du port 80, destinations 10.74.x.x, adresses non IPv4
+    sources = [f'203.0.113.{i}' for i in range(7)]
+    return pd.DataFrame({
+        'Source': sources + ['10.74.1.1', '10.74.1.1', '10.74.1.1', '192.168.0.5', 'aa:bb:cc:dd:ee:ff', None, '10.74.1.2'],
+        'Destination': ['10.74.0.80'] * 7 + ['10.74.2.2', '10.74.2.2', '8.8.8.8', '10.74.2.2', 'Broadcast', '10.74.2.2', None],
+        'tcp.srcport': [40000 + i for i in range(7)] + [1234, np.nan, 1234, 5555, np.nan, 1, 2],
+        'tcp.dstport': [80] * 7 + [443, 443, np.nan, np.nan, np.nan, 443, 443],
+    })
+
+def test_edge_cases():
+    raw = edge_case_frame()
+    expected = reference_extract_features(reference_clean_and_format(raw.copy()))
+    actual = extract_features(clean_and_format(raw.copy()))
+    assert_same_features(actual, expected)
+    # Le flood du port 80 (7 sources vers 10.74.0.80) et le couple dupliqué sont bien détectés
+    assert actual['is_ip_aleatoire_80'].sum() == 7
+    assert actual['is_ip_aleatoire_port'].tolist()[7:9] == [0, 0]
+
+def test_duplicated_key_first_seen_only():
+    raw = pd.DataFrame({'Source': ['10.0.0.1'] * 3, 'Destination': ['10.74.5.5'] * 3,
+                        'tcp.srcport': [1, 2, 3], 'tcp.dstport': [22, 22, 22]})
+    expected = reference_extract_features(reference_clean_and_format(raw.copy()))
+    actual = extract_features(clean_and_format(raw.copy()))
+    assert_same_features(actual, expected)
+    assert actual['is_new_src_ip_on_port_10_74'].tolist() == [1, 0, 0]
+
+def test_empty_frame():
+    # L'implémentation d'origine échoue sur un lot vide ; la version vectorisée renvoie toutes les colonnes
+    raw = pd.DataFrame({'Source': pd.Series([], dtype=object), 'Destination': pd.Series([], dtype=object),
+                        'tcp.srcport': pd.Series([], dtype=float), 'tcp.dstport': pd.Series([], dtype=float)})
+    actual = extract_features(clean_and_format(raw))
+    assert len(actual) == 0
+    assert set(FEATURES).issubset(actual.columns)
@@ -0,0 +1,88 @@
+# test_forest_inference.py
+# Forêt compacte : prédictions identiques à scikit-learn, avec les deux méthodes d'évaluation et sur plusieurs lots
+
+import os
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from conftest import DATA_DIR
+from forest_inference import MAX_BATCH_ROWS, CompactForest, export_forest, load_compact_forest
+
+PREPROCESSED = os.path.join(DATA_DIR, 'preprocessed.csv')
+pytestmark = pytest.mark.skipif(not os.path.exists(PREPROCESSED), reason='jeu de données absent')
+
+def feature_names():
+    with open(os.path.join(DATA_DIR, 'features.txt'), 'r') as f:
+        return [line.strip() for line in f.readlines()]
+
+@pytest.fixture(scope='module')
+def samples():
+    df = pd.read_csv(PREPROCESSED)
+    # Lignes des deux classes, en nombre non multiple de la taille des lots
+    sample = pd.concat([df[df['label'] == 0].head(700), df[df['label'] == 1].head(300)], ignore_index=True)
+    return sample[feature_names()], sample['label']
+
+def bundled_model():
+    return joblib.load(os.path.join(DATA_DIR, 'rf_model.joblib'))
+
+def deep_model(X, y):
+    # Étiquettes mélangées : arbres profonds de plus de 64 feuilles (plusieurs mots de masques par arbre)
+    noisy = np.random.default_rng(0).permutation(y.to_numpy())
+    return RandomForestClassifier(n_estimators=5, random_state=0).fit(X, noisy)
+
+def exported(model, tmp_path):
+    model_path = str(tmp_path / 'rf_model.joblib')
+    joblib.dump(model, model_path)
+    export_forest(model, str(tmp_path / 'rf_model.forest'), model_path)
+    return model_path, load_compact_forest(model_path)
+
+def assert_same_predictions(model, forest, X):
+    assert np.array_equal(forest.predict_proba(X), model.predict_proba(X))
+    assert np.array_equal(forest.predict(X), model.predict(X))
+
+@pytest.mark.parametrize('use_bitmask', [True, False])
+@pytest.mark.parametrize('which', ['bundled', 'deep'])
+def test_matches_sklearn(tmp_path, samples, use_bitmask, which):
+    X, y = samples
+    model = bundled_model() if which == 'bundled' else deep_model(X, y)
+    _, forest = exported(model, tmp_path)
+    forest.use_bitmask = use_bitmask
+    assert len(X) > MAX_BATCH_ROWS
+    assert_same_predictions(model, forest, X)
+
+@pytest.mark.parametrize('batch_rows', [1, 7, MAX_BATCH_ROWS])
+def test_batch_boundaries(tmp_path, samples, batch_rows):
+    X, y = samples
+    model = deep_model(X, y)
+    _, forest = exported(model, tmp_path)
+    assert len(forest.multi_word_trees) > 0
+    for use_bitmask in (True, False):
+        forest.use_bitmask, forest.batch_rows = use_bitmask, batch_rows
+        assert_same_predictions(model, forest, X.head(3 * batch_rows + 1))
+
+def test_evaluators_agree_on_leaves(tmp_path, samples):
+    X, y = samples
+    _, forest = exported(deep_model(X, y), tmp_path)
+    XT = forest.to_matrix(X.head(MAX_BATCH_ROWS))
+    assert np.array_equal(forest.leaf_indices(XT), forest.walk_leaf_indices(XT))
+
+def test_stale_or_missing_artifact(tmp_path, samples):
+    X, y = samples
+    model_path, forest = exported(bundled_model(), tmp_path)
+    assert isinstance(forest, CompactForest)
+    # Modèle joblib réentraîné sans réexport : l'artefact est ignoré
+    joblib.dump(deep_model(X, y), model_path)
+    assert load_compact_forest(model_path) is None
+    assert load_compact_forest(str(tmp_path / 'absent.joblib')) is None
+
+def test_evaluator_selection():
+    from export_results import COMPACT_MAX_ROWS, load_model, resolve_evaluator
+    # Forêt compacte pour un petit lot ponctuel seulement ; scikit-learn pour le démon, le mode parallèle et par blocs
+    assert resolve_evaluator('auto', COMPACT_MAX_ROWS - 1) == 'compact'
+    assert resolve_evaluator('auto', COMPACT_MAX_ROWS) == 'sklearn'
+    assert resolve_evaluator('auto') == 'sklearn'
+    assert resolve_evaluator('compact', 10 ** 9) == 'compact'
+    assert not isinstance(load_model(None)[0], CompactForest)
+    assert isinstance(load_model(None, 'compact')[0], CompactForest)
@@ -0,0 +1,68 @@
+# test_incremental.py
+# Lecture incrémentale : reprise à l'offset, ligne en cours d'écriture, rotation et copytruncate sans perte
+
+import os
+import shutil
+from incremental import read_new_logs, save_checkpoint
+
+HEADER = 'frame.time,ip.src,ip.dst,tcp.srcport,tcp.dstport\n'
+
+def rows(first, count):
+    return ''.join(f'"Jul 10, 2025 10:00:{i % 60:02d}.{i:09d} CEST",10.0.0.{i % 250},10.74.0.1,{40000 + i},80\n'
+                   for i in range(first, first + count))
+
+def write(path, text, mode='w'):
+    with open(path, mode) as f:
+        f.write(text)
+
+def read(capture, checkpoint):
+    # Lecture puis sauvegarde du checkpoint, comme après un export réussi ; retourne les ports source lus
+    df, state = read_new_logs(capture, checkpoint)
+    save_checkpoint(checkpoint, state)
+    return df['tcp.srcport'].tolist() if len(df) else []
+
+def test_resume_and_partial_line(tmp_path):
+    capture, checkpoint = str(tmp_path / 'capture.csv'), str(tmp_path / 'capture.offset.json')
+    write(capture, HEADER + rows(0, 3) + '"Jul 10, 2025 10:00')
+    assert read(capture, checkpoint) == [40000, 40001, 40002]
+    # La ligne incomplète n'est lue qu'une fois terminée
+    write(capture, ':03.000000003 CEST",10.0.0.3,10.74.0.1,40003,80\n' + rows(4, 1), 'a')
+    assert read(capture, checkpoint) == [40003, 40004]
+    assert read(capture, checkpoint) == []
+
+def test_rotation_drains_renamed_file(tmp_path):
+    capture, checkpoint = str(tmp_path / 'capture.csv'), str(tmp_path / 'capture.offset.json')
+    write(capture, HEADER + rows(0, 2))
+    assert read(capture, checkpoint) == [40000, 40001]
+    # Lignes écrites après la dernière lecture, puis rotation par renommage (logrotate sans copytruncate)
+    write(capture, rows(2, 2), 'a')
+    os.rename(capture, capture + '.1')
+    write(capture, HEADER + rows(10, 2))
+    assert read(capture, checkpoint) == [40002, 40003, 40010, 40011]
+    assert read(capture, checkpoint) == []
+
+def test_copytruncate_refilled_past_old_size(tmp_path):
+    capture, checkpoint = str(tmp_path / 'capture.csv'), str(tmp_path / 'capture.offset.json')
+    write(capture, HEADER + rows(0, 2))
+    assert read(capture, checkpoint) == [40000, 40001]
+    write(capture, rows(2, 1), 'a')
+    # copytruncate : copie, troncature sur place (même inode), puis nouvelles lignes au-delà de l'ancienne taille
+    shutil.copyfile(capture, capture + '.1')
+    write(capture, HEADER + rows(20, 6))
+    assert read(capture, checkpoint) == [40002] + list(range(40020, 40026))
+
+def test_rotated_file_missing(tmp_path):
+    capture, checkpoint = str(tmp_path / 'capture.csv'), str(tmp_path / 'capture.offset.json')
+    write(capture, HEADER + rows(0, 2))
+    assert read(capture, checkpoint) == [40000, 40001]
+    os.remove(capture)
+    write(capture, HEADER + rows(5, 1))
+    assert read(capture, checkpoint) == [40005]
+
+def test_legacy_checkpoint_without_fingerprint(tmp_path):
+    capture, checkpoint = str(tmp_path / 'capture.csv'), str(tmp_path / 'capture.offset.json')
+    write(capture, HEADER + rows(0, 2))
+    st = os.stat(capture)
+    save_checkpoint(checkpoint, {'inode': st.st_ino, 'dev': st.st_dev, 'size': st.st_size, 'offset': st.st_size})
+    write(capture, rows(2, 1), 'a')
+    assert read(capture, checkpoint) == [40002]
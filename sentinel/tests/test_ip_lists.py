@@ -0,0 +1,87 @@
+# test_ip_lists.py
+# Listes d'autorisation / de blocage : intervalles CIDR (bornes, chevauchements), plages de ports, priorité du blocage
+
+import numpy as np
+import pandas as pd
+import pytest
+from ip_lists import DEFAULT_RULES, CidrIndex, IpLists, parse_cidr, parse_ports
+from preprocessing import clean_and_format, ipv4_to_int
+
+def lists(*rules):
+    return IpLists(list(enumerate(rules, 1)))
+
+def frame(src_ips, dst_ports=None):
+    dst_ports = dst_ports if dst_ports is not None else [443] * len(src_ips)
+    return pd.DataFrame({'src_ip': src_ips, 'dst_ip': ['10.0.0.1'] * len(src_ips), 'dst_port': dst_ports})
+
+def contains(index, addresses):
+    values = np.array([ipv4_to_int(a) for a in addresses], dtype=np.uint32)
+    return index.contains(values, np.ones(len(values), dtype=bool)).tolist()
+
+@pytest.mark.parametrize('text, expected', [('10.74.0.0/16', ('10.74.0.0', '10.74.255.255')),
+                                            ('10.74.16.1', ('10.74.16.1', '10.74.16.1')),
+                                            ('10.74.16.1/24', ('10.74.16.0', '10.74.16.255')),
+                                            ('0.0.0.0/0', ('0.0.0.0', '255.255.255.255'))])
+def test_parse_cidr(text, expected):
+    assert parse_cidr(text) == tuple(ipv4_to_int(a) for a in expected)
+
+@pytest.mark.parametrize('text', ['10.74.0.0/33', '10.74.0/16', 'host/8'])
+def test_parse_cidr_invalid(text):
+    with pytest.raises(ValueError):
+        parse_cidr(text)
+
+def test_cidr_boundaries():
+    index = CidrIndex([parse_cidr('192.168.1.0/24')])
+    assert contains(index, ['192.168.0.255', '192.168.1.0', '192.168.1.255', '192.168.2.0']) == [False, True, True, False]
+
+def test_cidr_overlapping_and_adjacent_merged():
+    # /24 inclus dans le /16, deux /25 adjacents, un intervalle isolé
+    index = CidrIndex([parse_cidr(c) for c in ['10.1.2.0/24', '10.1.0.0/16', '172.16.0.0/25', '172.16.0.128/25', '8.8.8.8']])
+    assert index.starts.tolist() == [ipv4_to_int('8.8.8.8'), ipv4_to_int('10.1.0.0'), ipv4_to_int('172.16.0.0')]
+    assert index.ends.tolist() == [ipv4_to_int('8.8.8.8'), ipv4_to_int('10.1.255.255'), ipv4_to_int('172.16.0.255')]
+    assert contains(index, ['8.8.8.7', '8.8.8.8', '8.8.8.9', '10.0.255.255', '10.1.2.3', '10.2.0.0',
+                            '172.16.0.127', '172.16.0.128', '172.16.1.0']) == [False, True, False, False, True, False, True, True, False]
+
+def test_cidr_extremes():
+    index = CidrIndex([parse_cidr('0.0.0.0/32'), parse_cidr('255.255.255.255')])
+    assert contains(index, ['0.0.0.0', '0.0.0.1', '255.255.255.254', '255.255.255.255']) == [True, False, False, True]
+    assert contains(CidrIndex([]), ['10.0.0.1']) == [False]
+
+def test_port_ranges_boundaries_and_overlap():
+    ip_lists = lists('allow port 6000-6010', 'allow port 6005-6020', 'allow port 0', 'allow port 65535', 'deny port 6015')
+    ports = [5999, 6000, 6010, 6011, 6015, 6020, 6021, 0, 65535]
+    allowed, denied = ip_lists.match(frame(['192.0.2.1'] * len(ports), ports))
+    assert allowed.tolist() == [False, True, True, True, False, True, False, True, True]
+    assert denied.tolist() == [False, False, False, False, True, False, False, False, False]
+
+@pytest.mark.parametrize('text', ['6010-6000', '65536', '-1', 'http'])
+def test_parse_ports_invalid(text):
+    with pytest.raises(ValueError):
+        parse_ports(text)
+
+def test_deny_wins_and_non_ipv4_ignored():
+    ip_lists = lists('allow 10.74.0.0/16', 'deny 10.74.5.0/24', 'allow port 5353')
+    df = clean_and_format(frame(['10.74.1.1', '10.74.5.9', 'aa:bb:cc:dd:ee:ff', '192.0.2.1', '10.74.5.1'],
+                                [443, 443, 443, 443, 5353]))
+    allowed, denied = ip_lists.match(df)
+    assert allowed.tolist() == [True, False, False, False, False]
+    assert denied.tolist() == [False, True, False, False, True]
+
+def test_typed_and_text_columns_agree():
+    ip_lists = lists('deny 198.51.100.0/24', 'allow 10.0.0.0/8')
+    raw = frame(['198.51.100.7', '10.9.9.9', 'Broadcast', '198.51.101.0'])
+    typed = clean_and_format(raw.copy())
+    assert 'src_ip_v4' in typed.columns
+    assert [m.tolist() for m in ip_lists.match(typed)] == [m.tolist() for m in ip_lists.match(raw)]
+
+def test_invalid_rules_skipped(capsys):
+    ip_lists = lists('# commentaire', '', 'allow', 'permit 10.0.0.0/8', 'deny port 70000', 'deny 10.0.0.0/8 # interne')
+    assert 'Règle ignorée (ligne 3)' in capsys.readouterr().out
+    allowed, denied = ip_lists.match(frame(['10.1.1.1']))
+    assert denied.tolist() == [True]
+    assert len(ip_lists.allow_cidrs.starts) == 0 and not ip_lists.ports['deny'].any()
+
+def test_default_rules_without_file(tmp_path):
+    ip_lists = IpLists.load(str(tmp_path / 'absent.txt'))
+    assert DEFAULT_RULES == ['allow 10.74.0.0/16']
+    assert ip_lists.match(frame(['10.74.3.3', '10.75.0.0']))[0].tolist() == [True, False]
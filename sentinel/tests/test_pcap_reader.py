@@ -0,0 +1,139 @@
+# test_pcap_reader.py
+# Lecture directe des captures : formats pcap / pcapng, couches liaison, trames écartées, fichiers tronqués
+
+import numpy as np
+import pytest
+from pcap_fixtures import (ETHERTYPE_ARP, ETHERTYPE_IPV6, arp_stub, ethernet, ipv4, ipv4_tcp, ipv6_stub, linux_sll,
+                           linux_sll2, pcap_bytes, pcapng_bytes, udp, write)
+from pcap_reader import (LINKTYPE_IPV4, LINKTYPE_LINUX_SLL, LINKTYPE_LINUX_SLL2, LINKTYPE_RAW, is_pcap,
+                         iter_pcap_batches, read_pcap)
+
+# 2024-01-02 03:04:05 UTC, avec une partie fractionnaire non multiple de la microseconde
+TS_NS = 1704164645 * 1000000000 + 123456789
+
+def flows(df):
+    return list(zip(df['src_ip'].astype(str), df['dst_ip'].astype(str), df['src_port'].tolist(), df['dst_port'].tolist()))
+
+def three_packets(link=ethernet):
+    return [(TS_NS, link(ipv4_tcp('10.0.0.1', '10.74.0.1', 40000, 80))),
+            (TS_NS + 1000, link(ipv4_tcp('10.0.0.2', '10.74.0.2', 40001, 443))),
+            (TS_NS + 2000, link(ipv4_tcp('10.0.0.3', '10.74.0.3', 40002, 22)))]
+
+EXPECTED_FLOWS = [('10.0.0.1', '10.74.0.1', 40000, 80), ('10.0.0.2', '10.74.0.2', 40001, 443),
+                  ('10.0.0.3', '10.74.0.3', 40002, 22)]
+
+@pytest.mark.parametrize('endian', ['<', '>'])
+@pytest.mark.parametrize('nanos', [False, True])
+def test_pcap_endianness_and_resolution(tmp_path, endian, nanos):
+    path = write(tmp_path / 'capture.pcap', pcap_bytes(three_packets(), endian=endian, nanos=nanos))
+    assert is_pcap(path)
+    df = read_pcap(path)
+    assert flows(df) == EXPECTED_FLOWS
+    # Fraction en µs : les nanosecondes au-delà de la microseconde sont perdues à l'écriture
+    first = TS_NS if nanos else TS_NS // 1000 * 1000
+    assert df['timestamp'].tolist() == [first, first + 1000, first + 2000]
+    assert df['timestamp'].dtype == np.int64
+    assert df['proto'].astype(float).tolist() == [6.0] * 3
+    assert df['src_ip_v4'].tolist() == [0x0A000001, 0x0A000002, 0x0A000003]
+
+def test_frame_numbers_match_tshark(tmp_path):
+    # Numérotation à partir de 1 (colonne No. de tshark), trous laissés par les trames écartées, y compris entre lots
+    packets = three_packets()
+    packets.insert(1, (TS_NS, ethernet(arp_stub(), ETHERTYPE_ARP)))
+    path = write(tmp_path / 'capture.pcap', pcap_bytes(packets))
+    assert read_pcap(path).index.tolist() == [1, 3, 4]
+    batches = list(iter_pcap_batches(path, batch_size=2))
+    assert [batch.index.tolist() for batch in batches] == [[1], [3, 4]]
+    assert read_pcap(path, batch_size=2).index.tolist() == [1, 3, 4]
+
+@pytest.mark.parametrize('endian', ['<', '>'])
+@pytest.mark.parametrize('tsresol, units_per_s', [(None, 10 ** 6), (6, 10 ** 6), (9, 10 ** 9), (3, 10 ** 3), (0x80 | 10, 1024)])
+def test_pcapng_if_tsresol(tmp_path, endian, tsresol, units_per_s):
+    seconds = TS_NS // 1000000000
+    units = seconds * units_per_s + units_per_s // 2
+    packets = [(0, units, ethernet(ipv4_tcp('10.0.0.1', '10.74.0.1', 40000, 80)))]
+    path = write(tmp_path / 'capture.pcapng', pcapng_bytes([(1, tsresol)], packets, endian))
+    assert is_pcap(path)
+    df = read_pcap(path)
+    assert flows(df) == EXPECTED_FLOWS[:1]
+    assert df['timestamp'].tolist() == [seconds * 1000000000 + 500000000]
+
+def test_pcapng_interfaces_and_simple_packets(tmp_path):
+    # Deux interfaces de types de lien différents ; le bloc simplifié (SPB) n'a pas de timestamp
+    packets = [(0, 10, ethernet(ipv4_tcp('10.0.0.1', '10.74.0.1', 40000, 80))),
+               (1, 2000, ipv4_tcp('10.0.0.2', '10.74.0.2', 40001, 443)),
+               (None, None, ethernet(ipv4_tcp('10.0.0.3', '10.74.0.3', 40002, 22)))]
+    path = write(tmp_path / 'capture.pcapng', pcapng_bytes([(1, None), (LINKTYPE_RAW, 9)], packets))
+    df = read_pcap(path)
+    assert flows(df) == EXPECTED_FLOWS
+    assert df['timestamp'].tolist() == [10000, 2000, 0]
+
+@pytest.mark.parametrize('vlans', [[(0x8100, 10)], [(0x88A8, 100), (0x8100, 200)], [(0x8100, 100), (0x8100, 200)]])
+def test_vlan_and_qinq(tmp_path, vlans):
+    packets = [(TS_NS, ethernet(ipv4_tcp('10.0.0.1', '10.74.0.1', 40000, 80), vlans=vlans))]
+    df = read_pcap(write(tmp_path / 'capture.pcap', pcap_bytes(packets)))
+    assert flows(df) == EXPECTED_FLOWS[:1]
+
+@pytest.mark.parametrize('linktype, link', [(LINKTYPE_LINUX_SLL, linux_sll), (LINKTYPE_LINUX_SLL2, linux_sll2),
+                                            (LINKTYPE_RAW, lambda payload: payload), (LINKTYPE_IPV4, lambda payload: payload)])
+def test_link_layers(tmp_path, linktype, link):
+    df = read_pcap(write(tmp_path / 'capture.pcap', pcap_bytes(three_packets(link), linktype=linktype)))
+    assert flows(df) == EXPECTED_FLOWS
+
+def test_cooked_non_ipv4_dropped(tmp_path):
+    packets = [(TS_NS, linux_sll(ipv6_stub(), ETHERTYPE_IPV6)), (TS_NS, linux_sll(ipv4_tcp('10.0.0.1', '10.74.0.1', 40000, 80)))]
+    df = read_pcap(write(tmp_path / 'capture.pcap', pcap_bytes(packets, linktype=LINKTYPE_LINUX_SLL)))
+    assert flows(df) == EXPECTED_FLOWS[:1]
+    assert df.index.tolist() == [2]
+
+def test_ip_options(tmp_path):
+    # IHL = 7 (8 octets d'options) : les ports sont lus après les options
+    options = b'\x94\x04\x00\x00' + b'\x01\x01\x01\x00'
+    packets = [(TS_NS, ethernet(ipv4_tcp('10.0.0.1', '10.74.0.1', 40000, 80, options=options)))]
+    df = read_pcap(write(tmp_path / 'capture.pcap', pcap_bytes(packets)))
+    assert flows(df) == EXPECTED_FLOWS[:1]
+
+def test_non_tcp_and_non_ipv4(tmp_path):
+    # UDP et ICMP gardés avec des ports à 0 (comme tcp.srcport vide) ; ARP et IPv6 écartés ; fragment non initial sans ports
+    packets = [(TS_NS, ethernet(ipv4('10.0.0.1', '8.8.8.8', 17, udp(5353, 53)))),
+               (TS_NS, ethernet(arp_stub(), ETHERTYPE_ARP)),
+               (TS_NS, ethernet(ipv4('10.0.0.2', '10.74.0.2', 1, b'\x08\x00\x00\x00\x00\x00\x00\x00'))),
+               (TS_NS, ethernet(ipv6_stub(), ETHERTYPE_IPV6)),
+               (TS_NS, ethernet(ipv4('10.0.0.3', '10.74.0.3', 6, b'\x9c\x40\x00\x50' + bytes(16), fragment_offset=185)))]
+    df = read_pcap(write(tmp_path / 'capture.pcap', pcap_bytes(packets)))
+    assert flows(df) == [('10.0.0.1', '8.8.8.8', 0, 0), ('10.0.0.2', '10.74.0.2', 0, 0), ('10.0.0.3', '10.74.0.3', 0, 0)]
+    assert df['proto'].astype(float).tolist() == [17.0, 1.0, 6.0]
+    assert df.index.tolist() == [1, 3, 5]
+
+def test_truncated_ip_header_dropped(tmp_path):
+    # Trame capturée trop courte pour contenir l'en-tête IPv4 (snaplen)
+    frame = ethernet(ipv4_tcp('10.0.0.1', '10.74.0.1', 40000, 80))[:14 + 12]
+    packets = [(TS_NS, frame)] + three_packets()[1:]
+    df = read_pcap(write(tmp_path / 'capture.pcap', pcap_bytes(packets)))
+    assert flows(df) == EXPECTED_FLOWS[1:]
+
+def test_truncated_trailing_record(tmp_path):
+    # Capture en cours d'écriture : le dernier enregistrement incomplet est ignoré
+    data = pcap_bytes(three_packets())
+    path = write(tmp_path / 'capture.pcap', data[:-10])
+    assert flows(read_pcap(path)) == EXPECTED_FLOWS[:2]
+    # En-tête d'enregistrement lui-même coupé
+    last_record = len(three_packets()[-1][1]) + 16
+    path = write(tmp_path / 'header.pcap', data[:len(data) - last_record + 8])
+    assert flows(read_pcap(path)) == EXPECTED_FLOWS[:2]
+
+def test_truncated_trailing_pcapng_block(tmp_path):
+    packets = [(0, ts_ns // 1000, frame) for ts_ns, frame in three_packets()]
+    data = pcapng_bytes([(1, None)], packets)
+    path = write(tmp_path / 'capture.pcapng', data[:-6])
+    assert flows(read_pcap(path)) == EXPECTED_FLOWS[:2]
+
+def test_empty_and_foreign_files(tmp_path):
+    empty = write(tmp_path / 'empty.pcap', b'')
+    assert not is_pcap(empty)
+    assert list(iter_pcap_batches(empty)) == []
+    header_only = write(tmp_path / 'header.pcap', pcap_bytes([]))
+    df = read_pcap(header_only)
+    assert len(df) == 0
+    assert 'src_ip_v4' in df.columns
+    assert not is_pcap(write(tmp_path / 'capture.csv', b'No.,Time,Source\n'))
@@ -0,0 +1,90 @@
+# test_result_store.py
+# Stockage des résultats : partitions par jour, dédoublonnage sur DEDUP_DAYS, migration de l'ancien format,
+# lien symbolique vers la partition du jour, fusion du journal dans l'index trié
+
+import datetime
+import os
+import numpy as np
+import pandas as pd
+import result_store
+from result_store import (DEDUP_DAYS, append_results, index_path, in_recent_index, partition_path,
+                          sorted_index_path)
+
+DAY = datetime.date(2025, 7, 10)
+
+def batch(first, count):
+    return pd.DataFrame({'timestamp': [f'2025-07-10T08:00:{i:02d}Z' for i in range(first, first + count)],
+                         'src_ip': [f'10.0.0.{i}' for i in range(first, first + count)],
+                         'anomalie': [i % 2 for i in range(first, first + count)],
+                         'export_timestamp': ['2025-07-10 10:00:00'] * count})
+
+def read(path):
+    return pd.read_csv(path, dtype=str, keep_default_na=False)
+
+def test_daily_partition_and_view(tmp_path):
+    output = str(tmp_path / 'final_result.csv')
+    assert append_results(batch(0, 3), output, today=DAY) == 3
+    assert append_results(batch(3, 2), output, today=DAY) == 2
+    partition = partition_path(output, DAY.isoformat())
+    assert partition == str(tmp_path / 'final_result-2025-07-10.csv')
+    assert read(partition)['src_ip'].tolist() == [f'10.0.0.{i}' for i in range(5)]
+    # La vue suit la partition du jour
+    assert os.path.islink(output) and os.readlink(output) == 'final_result-2025-07-10.csv'
+    next_day = DAY + datetime.timedelta(days=1)
+    assert append_results(batch(5, 1), output, today=next_day) == 1
+    assert os.readlink(output) == 'final_result-2025-07-11.csv'
+    assert len(read(output)) == 1
+
+def test_dedup_ignores_export_timestamp(tmp_path):
+    output = str(tmp_path / 'final_result.csv')
+    append_results(batch(0, 3), output, today=DAY)
+    again = batch(0, 4)
+    again['export_timestamp'] = '2025-07-10 11:00:00'
+    assert append_results(again, output, today=DAY) == 1
+    assert len(read(output)) == 4
+
+def test_dedup_window(tmp_path):
+    output = str(tmp_path / 'final_result.csv')
+    append_results(batch(0, 2), output, today=DAY)
+    # Encore dans la fenêtre de dédoublonnage le lendemain
+    assert append_results(batch(0, 2), output, today=DAY + datetime.timedelta(days=DEDUP_DAYS - 1)) == 0
+    # Hors fenêtre : les lignes sont de nouveau exportées
+    assert append_results(batch(0, 2), output, today=DAY + datetime.timedelta(days=DEDUP_DAYS)) == 2
+
+def test_legacy_migration(tmp_path):
+    output = str(tmp_path / 'final_result.csv')
+    batch(0, 3).to_csv(output, index=False)
+    assert append_results(batch(1, 3), output, today=DAY) == 1
+    assert read(str(tmp_path / 'final_result-legacy.csv'))['src_ip'].tolist() == ['10.0.0.0', '10.0.0.1', '10.0.0.2']
+    assert os.path.islink(output)
+    assert read(output)['src_ip'].tolist() == ['10.0.0.3']
+
+def test_missing_and_extra_columns(tmp_path):
+    output = str(tmp_path / 'final_result.csv')
+    append_results(batch(0, 1), output, today=DAY)
+    extra = batch(1, 1).drop(columns=['anomalie'])
+    extra['other'] = 'x'
+    assert append_results(extra, output, today=DAY) == 1
+    assert read(output).columns.tolist() == ['timestamp', 'src_ip', 'anomalie', 'export_timestamp']
+    assert read(output)['anomalie'].tolist() == ['0', '']
+
+def test_index_compaction(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_store, 'INDEX_DELTA_MAX', 4)
+    output = str(tmp_path / 'final_result.csv')
+    day = DAY.isoformat()
+    for first in range(0, 12, 3):
+        append_results(batch(first, 3), output, today=DAY)
+    # Fusion avant la recherche dès que le journal dépasse la limite : au 3e lot (6 hachés), pas au 4e (3 hachés)
+    keys = np.fromfile(sorted_index_path(output, day), dtype=np.uint64)
+    assert len(keys) == 6 and (keys[1:] > keys[:-1]).all()
+    assert len(np.fromfile(index_path(output, day), dtype=np.uint64)) == 6
+    # Hachés trouvés, qu'ils soient dans le journal ou dans l'index trié
+    assert append_results(batch(0, 13), output, today=DAY) == 1
+    assert len(read(output)) == 13
+
+def test_in_recent_index(tmp_path):
+    output = str(tmp_path / 'final_result.csv')
+    hashes = np.array([5, 1, 9], dtype=np.uint64)
+    assert not in_recent_index(output, DAY, hashes).any()
+    result_store.append_index(output, DAY.isoformat(), np.array([9, 1], dtype=np.uint64))
+    assert in_recent_index(output, DAY, hashes).tolist() == [False, True, True]
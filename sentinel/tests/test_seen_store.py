@@ -0,0 +1,76 @@
+# test_seen_store.py
+# Mémoire des couples (src_ip, dst_port) déjà vus : codage des clés, TTL, nombre maximum de couples, sauvegarde
+
+import numpy as np
+from seen_store import HASH_FLAG, SeenSnapshot, SeenStore, pack_keys
+
+NOW = 1752136731
+
+def test_pack_ipv4_exact():
+    keys = pack_keys(['10.74.0.1', '255.255.255.255', '0.0.0.0'], [80, 65535, 0])
+    assert keys.tolist() == [(0x0A4A0001 << 16) | 80, (0xFFFFFFFF << 16) | 0xFFFF, 0]
+    assert not (keys & HASH_FLAG).any()
+
+def test_pack_other_addresses_hashed():
+    keys = pack_keys(['aa:bb:cc:dd:ee:ff', 'Broadcast', 'aa:bb:cc:dd:ee:ff', '10.0.0.1'], [80, 80, 443, 80])
+    assert (keys[:3] & HASH_FLAG).all()
+    assert keys[0] != keys[2]
+    assert not keys[3] & HASH_FLAG
+
+def test_pack_missing_ports():
+    # Port manquant ou illisible compté comme 0, comme dans clean_and_format
+    assert pack_keys(['10.0.0.1', '10.0.0.1'], [None, 'x']).tolist() == [0x0A000001 << 16] * 2
+
+def test_check_and_add():
+    store = SeenStore()
+    # Dans un même lot, les doublons sont tous nouveaux : la première apparition est gérée par l'appelant
+    assert store.check_and_add(['10.0.0.1', '10.0.0.2', '10.0.0.1'], [22, 22, 22], now=NOW).tolist() == [True, True, True]
+    assert len(store) == 2
+    assert store.check_and_add(['10.0.0.1', '10.0.0.1'], [22, 443], now=NOW + 1).tolist() == [False, True]
+    assert (store.keys[1:] > store.keys[:-1]).all()
+
+def test_ttl_eviction_and_refresh():
+    store = SeenStore(ttl=100)
+    store.check_and_add(['10.0.0.1', '10.0.0.2'], [22, 22], now=NOW)
+    # Revu avant l'expiration : date rafraîchie
+    store.check_and_add(['10.0.0.1'], [22], now=NOW + 80)
+    store.evict(now=NOW + 150)
+    assert store.contains(pack_keys(['10.0.0.1', '10.0.0.2'], [22, 22])).tolist() == [True, False]
+    # Encore présent exactement au TTL, évincé juste après
+    store.evict(now=NOW + 180)
+    assert len(store) == 1
+    store.evict(now=NOW + 181)
+    assert len(store) == 0
+
+def test_max_entries_keeps_most_recent():
+    store = SeenStore(max_entries=3)
+    for i in range(5):
+        store.check_and_add([f'10.0.0.{i}'], [80], now=NOW + i)
+    assert len(store) == 3
+    assert store.contains(pack_keys([f'10.0.0.{i}' for i in range(5)], [80] * 5)).tolist() == [False, False, True, True, True]
+    assert store.last_seen.tolist() == [NOW + 2, NOW + 3, NOW + 4]
+
+def test_save_load(tmp_path):
+    path = str(tmp_path / 'seen_src_port.npz')
+    store = SeenStore()
+    store.check_and_add(['10.0.0.1', 'Broadcast'], [22, 80], now=NOW)
+    store.save(path)
+    loaded = SeenStore.load(path, ttl=10 ** 10)
+    assert loaded.keys.tolist() == store.keys.tolist()
+    assert loaded.last_seen.tolist() == store.last_seen.tolist()
+    # Le TTL est appliqué au chargement
+    assert len(SeenStore.load(path, ttl=60)) == 0
+
+def test_unreadable_file(tmp_path):
+    path = tmp_path / 'seen_src_port.npz'
+    path.write_bytes(b'pas un npz')
+    assert len(SeenStore.load(str(path))) == 0
+
+def test_snapshot_does_not_modify_store():
+    store = SeenStore()
+    store.check_and_add(['10.0.0.1'], [22], now=NOW)
+    snapshot = SeenSnapshot(store)
+    assert snapshot.check_and_add(['10.0.0.1', '10.0.0.2'], [22, 22]).tolist() == [False, True]
+    assert len(store) == 1
+    store.add(snapshot.keys(), now=NOW)
+    assert len(store) == 2
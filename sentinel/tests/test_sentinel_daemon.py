@@ -0,0 +1,53 @@
+# test_sentinel_daemon.py
+# Démon : anomalies cumulées d'une scrutation à l'autre, état écrit par intervalle et à l'arrêt, reprise au checkpoint
+
+import os
+import pandas as pd
+import pytest
+from conftest import DATA_DIR
+
+CAPTURE = os.path.join(DATA_DIR, 'capture.csv')
+pytestmark = pytest.mark.skipif(not os.path.exists(os.path.join(DATA_DIR, 'rf_model.joblib')), reason='modèle absent')
+
+def make_daemon(tmp_path, save_interval):
+    from sentinel_daemon import SentinelDaemon
+    return SentinelDaemon(str(tmp_path / 'capture.csv'), str(tmp_path / 'final_result.csv'), interval=0,
+                          ip_lists_path=str(tmp_path / 'ip_lists.txt'), save_interval=save_interval)
+
+def split_capture(tmp_path):
+    with open(CAPTURE, 'r') as f:
+        lines = f.readlines()
+    half = len(lines) // 2
+    with open(tmp_path / 'capture.csv', 'w') as f:
+        f.writelines(lines[:half])
+    return lines[half:]
+
+def state_files(tmp_path):
+    return [name for name in ('capture.offset.json', 'seen_src_port.npz', 'window_state.npz') if (tmp_path / name).exists()]
+
+def test_polls_accumulate_and_state_saved_on_stop(tmp_path):
+    rest = split_capture(tmp_path)
+    daemon = make_daemon(tmp_path, save_interval=3600)
+    first = daemon.process_new_logs()
+    anomalies_first = len(pd.read_csv(tmp_path / 'anomalies_only.csv'))
+    with open(tmp_path / 'capture.csv', 'a') as f:
+        f.writelines(rest)
+    second = daemon.process_new_logs()
+    assert first > 0 and second > 0
+    # Les anomalies de la première scrutation sont conservées
+    assert len(pd.read_csv(tmp_path / 'anomalies_only.csv')) > anomalies_first > 0
+    # Rien n'est écrit avant l'intervalle de sauvegarde...
+    assert state_files(tmp_path) == []
+    # ... ni pendant une scrutation sans nouvelle ligne
+    assert daemon.process_new_logs() == 0
+    assert state_files(tmp_path) == []
+    # Écriture à l'arrêt (fin de run() après SIGTERM), puis reprise sans relire les lignes déjà analysées
+    daemon.save_state()
+    assert state_files(tmp_path) == ['capture.offset.json', 'seen_src_port.npz', 'window_state.npz']
+    assert make_daemon(tmp_path, save_interval=3600).process_new_logs() == 0
+
+def test_state_saved_every_poll_with_zero_interval(tmp_path):
+    split_capture(tmp_path)
+    daemon = make_daemon(tmp_path, save_interval=0)
+    assert daemon.process_new_logs() > 0
+    assert state_files(tmp_path) == ['capture.offset.json', 'seen_src_port.npz', 'window_state.npz']
@@ -0,0 +1,53 @@
+# test_streaming.py
+# Pipeline par blocs : features identiques à extract_features sur le fichier entier, quel que soit le découpage
+
+import os
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+from conftest import DATA_DIR
+from preprocessing import clean_and_format, extract_features, load_dataset
+from streaming import stream_features, stream_preprocess
+from test_extract_features import FEATURES, edge_case_frame
+from windows import WINDOW_FEATURES
+
+COLUMNS = FEATURES + WINDOW_FEATURES
+
+def streamed(sources, chunksize):
+    return pd.concat(list(stream_features(sources, chunksize)), ignore_index=True)
+
+def assert_same_columns(actual, expected, columns):
+    assert_frame_equal(actual[columns].reset_index(drop=True), expected[columns].reset_index(drop=True), check_dtype=False)
+
+@pytest.mark.parametrize('chunksize', [1, 3, 7, 100])
+def test_edge_cases(tmp_path, chunksize):
+    path = str(tmp_path / 'edge.csv')
+    edge_case_frame().to_csv(path, index=False)
+    expected = extract_features(clean_and_format(pd.read_csv(path)))
+    assert_same_columns(streamed([(path, None)], chunksize), expected, FEATURES)
+
+@pytest.mark.parametrize('chunksize', [997, 5000, 100000])
+def test_capture(chunksize):
+    path = os.path.join(DATA_DIR, 'capture.csv')
+    expected = extract_features(clean_and_format(pd.read_csv(path)))
+    actual = streamed([(path, None)], chunksize)
+    assert len(actual) == len(expected) > 0
+    assert_same_columns(actual, expected, COLUMNS)
+
+@pytest.mark.skipif(not os.path.exists(os.path.join(DATA_DIR, 'malicious.csv')), reason='jeux de données absents')
+@pytest.mark.parametrize('chunksize', [4096, 100000])
+def test_bundled_datasets(chunksize):
+    # Les deux fichiers se suivent comme dans load_dataset : les agrégats et la première apparition sont globaux
+    normal_path = os.path.join(DATA_DIR, 'normal.csv')
+    malicious_path = os.path.join(DATA_DIR, 'malicious.csv')
+    expected = extract_features(load_dataset(normal_path, malicious_path))
+    actual = pd.concat(list(stream_preprocess(normal_path, malicious_path, chunksize)), ignore_index=True)
+    assert_same_columns(actual, expected, FEATURES + ['label'])
+
+def test_compaction_between_chunks(monkeypatch):
+    # Fusions fréquentes des tables (attente minimale réduite) : mêmes résultats qu'avec une seule fusion finale
+    import streaming
+    monkeypatch.setattr(streaming, 'COMPACT_MIN_KEYS', 16)
+    path = os.path.join(DATA_DIR, 'capture.csv')
+    expected = extract_features(clean_and_format(pd.read_csv(path)))
+    assert_same_columns(streamed([(path, None)], 500), expected, FEATURES)
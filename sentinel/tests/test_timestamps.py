@@ -0,0 +1,36 @@
+# test_timestamps.py
+# Normalisation des timestamps en nanosecondes UTC : formats, fraction de seconde, signe, valeurs manquantes
+
+import numpy as np
+import pandas as pd
+import pytest
+from timestamps import MISSING, format_timestamps, normalize_timestamps
+
+def test_wireshark_text():
+    series = pd.Series(['Jul 10, 2025 10:38:51.554784702 CEST', 'Jul  1, 2025 23:59:59.5 CET', 'Dec 31, 2024 23:00:00 UTC', None])
+    assert normalize_timestamps(series).tolist() == [1752136731554784702, 1751410799500000000, 1735686000000000000, MISSING]
+
+def test_fraction_lengths_mixed():
+    # Positions du '.' et nombres de chiffres différents dans une même colonne
+    series = pd.Series(['10.5', '100.25', '7', '3.000000001', '2.1234567891'])
+    assert normalize_timestamps(series).tolist() == [10500000000, 100250000000, 7000000000, 3000000001, 2123456789]
+
+@pytest.mark.parametrize('text, expected', [('-1.5', -1500000000), ('-0.25', -250000000), ('-0.000000001', -1),
+                                            ('-2', -2000000000), ('1.5', 1500000000)])
+def test_negative_text_seconds(text, expected):
+    # La fraction prend le signe de la valeur entière, y compris quand la partie entière vaut -0
+    assert normalize_timestamps(pd.Series([text])).tolist() == [expected]
+
+def test_negative_numeric_seconds():
+    series = pd.Series([-1.5, -0.25, 0.005568023, np.nan])
+    assert normalize_timestamps(series).tolist() == [-1500000000, -250000000, 5568023, MISSING]
+
+def test_iso_roundtrip():
+    series = pd.Series(['2025-07-10T10:38:51.554784702+02:00', '2025-07-10 08:38:51.5Z'])
+    values = normalize_timestamps(series)
+    assert values.tolist() == [1752136731554784702, 1752136731500000000]
+    assert normalize_timestamps(pd.Series(format_timestamps(values))).tolist() == values.tolist()
+
+def test_unreadable_values():
+    series = pd.Series(['Jul 10, 2025 10:00:00.1 XYZ', 'Jul 10, 2025 10:00:00.1 UTC'])
+    assert normalize_timestamps(series).tolist() == [MISSING, 1752141600100000000]
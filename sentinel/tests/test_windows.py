@@ -0,0 +1,103 @@
+# test_windows.py
+# Fenêtres glissantes : comparaison à un calcul ligne à ligne, indépendance du découpage en lots et de la
+# sauvegarde, éviction des seaux sortis de la fenêtre, plafond du nombre de lignes de l'état
+
+import numpy as np
+import pandas as pd
+import pytest
+from timestamps import MISSING
+from windows import WINDOW_FEATURES, WindowState, event_buckets
+
+NS = 10 ** 9
+WINDOW = 5
+
+def traffic(n, seconds=30, seed=0, ordered=True):
+    rng = np.random.default_rng(seed)
+    ts = rng.integers(0, seconds * NS, n)
+    if ordered:
+        ts = np.sort(ts)
+    return pd.DataFrame({'timestamp': ts,
+                         'src_ip': [f'10.0.0.{i}' for i in rng.integers(0, 6, n)],
+                         'dst_ip': [f'10.74.0.{i}' for i in rng.integers(0, 3, n)],
+                         'dst_port': rng.choice([22, 80, 443, 8080], n).astype(np.uint16)})
+
+def reference(df, window_seconds=WINDOW):
+    # Ligne j comptée pour la ligne i si son seau est dans les window_seconds seaux se terminant à celui de i,
+    # et s'il est antérieur, ou identique avec une arrivée au plus tard avec i
+    buckets = (df['timestamp'] // NS).tolist()
+    rows = list(zip(buckets, df['src_ip'], df['dst_ip'], df['dst_port']))
+    out = {name: [] for name in WINDOW_FEATURES}
+    for i, (b, src, dst, port) in enumerate(rows):
+        before = [r for j, r in enumerate(rows) if b - window_seconds < r[0] <= b and (r[0] < b or j <= i)]
+        from_src = [r for r in before if r[1] == src]
+        out['src_rate_window'].append(len(from_src) / window_seconds)
+        out['src_distinct_dst_ports_window'].append(len({r[3] for r in from_src}))
+        out['dst_distinct_src_window'].append(len({r[1] for r in before if r[2] == dst and r[3] == port}))
+    return out
+
+def as_lists(values):
+    return {name: np.asarray(values[name]).tolist() for name in WINDOW_FEATURES}
+
+def run_in_batches(df, sizes, path=None, **kwargs):
+    state = WindowState(window_seconds=WINDOW, **kwargs)
+    out = {name: [] for name in WINDOW_FEATURES}
+    start = 0
+    for size in sizes + [len(df)]:
+        part = df.iloc[start:start + size]
+        start += len(part)
+        if len(part) == 0:
+            continue
+        for name, values in state.update(part.reset_index(drop=True)).items():
+            out[name].extend(np.asarray(values).tolist())
+        if path is not None:
+            state.save(path)
+            state = WindowState.load(path, window_seconds=WINDOW, **kwargs)
+    return out, state
+
+@pytest.mark.parametrize('ordered', [True, False])
+def test_matches_reference(ordered):
+    # Dans un même lot, l'ordre d'arrivée peut différer de l'ordre des timestamps
+    df = traffic(300, ordered=ordered, seed=1)
+    assert as_lists(WindowState(window_seconds=WINDOW).update(df)) == reference(df)
+
+@pytest.mark.parametrize('sizes', [[1, 1, 1], [17, 50, 3], [100]])
+def test_split_batches_and_save_load(tmp_path, sizes):
+    df = traffic(400, seed=2)
+    expected = reference(df)
+    assert as_lists(run_in_batches(df, sizes)[0]) == expected
+    assert as_lists(run_in_batches(df, sizes, str(tmp_path / 'window_state.npz'))[0]) == expected
+
+def test_eviction_keeps_only_window_buckets():
+    df = traffic(500, seconds=40, seed=3)
+    _, state = run_in_batches(df, [100, 100, 100, 100])
+    horizon = state.watermark - state.n_buckets + 1
+    assert state.watermark == int(df['timestamp'].max() // NS)
+    recent = df[df['timestamp'] // NS >= horizon]
+    for table, cols in ((state.by_src, ['src_ip', 'dst_port']), (state.by_dst, ['dst_ip', 'dst_port', 'src_ip'])):
+        assert table.buckets.min() >= horizon
+        # Une ligne par (groupe, membre, seau) du trafic encore dans la fenêtre, et le total des paquets conservé
+        assert len(table) == len(recent.assign(bucket=recent['timestamp'] // NS).drop_duplicates(cols + ['bucket']))
+        assert table.counts.sum() == len(recent)
+
+def test_max_entries_keeps_most_recent_buckets():
+    df = traffic(500, seconds=40, seed=4)
+    _, full = run_in_batches(df, [250])
+    _, capped = run_in_batches(df, [250], max_entries=20)
+    for table, reference_table in ((capped.by_src, full.by_src), (capped.by_dst, full.by_dst)):
+        assert len(table) == 20
+        # Les lignes gardées sont celles des seaux les plus récents
+        assert table.buckets.min() >= np.sort(reference_table.buckets)[-20]
+
+def test_reset_on_older_batch():
+    state = WindowState(window_seconds=WINDOW)
+    late = traffic(50, seed=5)
+    late['timestamp'] += 3600 * NS
+    state.update(late)
+    early = traffic(50, seed=6)
+    assert as_lists(state.update(early)) == reference(early)
+    assert state.watermark == int(early['timestamp'].max() // NS)
+
+def test_missing_timestamps_take_previous_bucket():
+    ts = np.array([MISSING, 2 * NS, MISSING, 7 * NS + 5, MISSING], dtype=np.int64)
+    assert event_buckets(ts, NS, 0).tolist() == [2, 2, 2, 7, 7]
+    assert event_buckets(np.full(2, MISSING, dtype=np.int64), NS, 9).tolist() == [9, 9]